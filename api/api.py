@@ -1,12 +1,32 @@
-from fastapi import FastAPI, Query, HTTPException
+import json
+from contextlib import ExitStack
+from typing import List
+
+from fastapi import FastAPI, Query, Header, HTTPException
+from fastapi.responses import StreamingResponse, PlainTextResponse, Response
 from emotionplot.data import get_novel, clean_gutenberg_text
-from emotionplot.preprocessing import preprocessing, chunk_by_sentences
-from emotionplot.model import predict_emotions
-from emotionplot.gcs_utils import generate_novel_id, upload_to_gcs, download_from_gcs_if_exists
-from nltk.tokenize import sent_tokenize
+from emotionplot.preprocessing import preprocessing, split_sentences, chunk_by_sentences
+from emotionplot.backends import BACKENDS
+from emotionplot.params import INFERENCE_BACKEND, ENABLE_PROFILING
+from emotionplot.pipeline import (
+    run_emotion_pipeline, iter_emotion_pipeline, get_emotion_matrix, get_encoded_result, get_word_frequency_index,
+    SCORING_MODES
+)
+from emotionplot.formats import RESPONSE_FORMATS, negotiate_format
+from emotionplot.plot_word_cloud import get_wordcloud_renderer, frequencies_key
+from emotionplot.scheduler import get_inference_scheduler, SchedulerBusy
+from emotionplot.aggregation import emotion_arcs, DOWNSAMPLING_METHODS
+from emotionplot.jobs import JobManager
+from emotionplot.gcs_utils import generate_novel_id
+from emotionplot.cache import get_result_cache
+from emotionplot.chunk_cache import get_chunk_cache
+from emotionplot.metrics import (
+    registry as metrics_registry, request_timings, server_timing, profile as profile_request, PROFILERS
+)
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
+jobs = JobManager()
 
 @app.get("/")
 def root():
@@ -66,7 +86,7 @@ def chunk_text(
 
     try:
         preprocessed = preprocessing(text)
-        sentences = sent_tokenize(preprocessed)
+        sentences = split_sentences(preprocessed)
         total_sentences = len(sentences)
 
         # Avoid division by zero
@@ -75,7 +95,7 @@ def chunk_text(
 
         sentences_per_chunk = max(1, total_sentences // num_chunks)
 
-        df = chunk_by_sentences(preprocessed, sentences_per_chunk)
+        df = chunk_by_sentences(preprocessed, sentences_per_chunk, sentences=sentences)
 
         return {
             "num_chunks": num_chunks,
@@ -111,14 +131,14 @@ def extract_and_chunk(
 
         # Step 2: Preprocess and split into sentences
         preprocessed = preprocessing(clean_text)
-        sentences = sent_tokenize(preprocessed)
+        sentences = split_sentences(preprocessed)
         total_sentences = len(sentences)
 
         if total_sentences == 0:
             raise ValueError("The input text contains no sentences.")
 
         # Step 3: Chunk it
-        df = chunk_by_sentences(preprocessed, sentences_per_chunk)
+        df = chunk_by_sentences(preprocessed, sentences_per_chunk, sentences=sentences)
         num_chunks = len(df)
 
         return {
@@ -138,61 +158,271 @@ def extract_and_chunk(
 def full_emotion_pipeline(
     url: str = Query(..., description="Project Gutenberg novel URL"),
     sentences_per_chunk: int = Query(3, ge=1, le=7),
-    model: str = Query("accurate", enum=["fast", "accurate"], description="Choose 'fast' or 'accurate' model")
+    model: str = Query("accurate", enum=["fast", "accurate", "cascade"], description="Choose 'fast', 'accurate' or 'cascade' (fast model, accurate model where it is unsure)"),
+    backend: str = Query(None, enum=BACKENDS, description="Inference backend (defaults to the server configuration)"),
+    tokens_per_chunk: int = Query(None, ge=16, le=512, description="Pack sentences up to this many model tokens per chunk instead of using sentences_per_chunk"),
+    overlap_sentences: int = Query(0, ge=0, le=3, description="Sentences shared by consecutive chunks when tokens_per_chunk is set"),
+    scoring: str = Query("chunk", enum=SCORING_MODES, description="'chunk' scores each chunk; 'sentence-mean' derives chunk scores from stored sentence scores"),
+    timings: bool = Query(False, description="Add a per-stage timing breakdown to the response"),
+    profile: str = Query(None, enum=PROFILERS, description="Profile this request (requires ENABLE_PROFILING)"),
+    response_format: str = Query(None, alias="format", enum=list(RESPONSE_FORMATS), description="Response format (overrides the Accept header)"),
+    accept: str = Header(None)
 ):
     """    Runs the full emotion analysis pipeline on a novel from Project Gutenberg.
     Args:
         url (str): The URL to the Project Gutenberg novel.
         sentences_per_chunk (int): Number of sentences per chunk, must be between 1 and 7.
-        model (str): The model to use for emotion prediction, either 'fast' or 'accurate'.
+        model (str): The model to use for emotion prediction, 'fast', 'accurate' or 'cascade'. 'cascade'
+            runs the fast model on every chunk and the accurate model only where the fast model's top-1
+            probability or top-1/top-2 margin is low; the response reports the "escalated_fraction".
+        backend (str): The inference backend, 'torch', 'int8' or 'onnx'. Defaults to INFERENCE_BACKEND.
+        tokens_per_chunk (int): If set, chunks hold as many sentences as fit in this many model
+            tokens (long sentences are split), so no chunk is truncated by the model.
+        overlap_sentences (int): Sentences repeated at the start of the next chunk in token mode.
+        scoring (str): 'chunk' runs the model on each chunk; 'sentence-mean' averages the stored
+            sentence scores of the book, so re-chunking an analyzed book needs no inference.
+        timings (bool): Add a "timings" entry with the seconds spent per stage and the
+            request's counters (sentences, chunks, tokens, cache lookups...).
+        profile (str): Run the request under 'cprofile' or the 'torch' profiler and add
+            the path of the written profile as "profile". Only allowed if ENABLE_PROFILING is set.
+        format (str): 'json' (default), 'compact' (label table once, then label IDs, float16-precision
+            scores and character offsets of each chunk instead of its text) or 'msgpack' (the compact
+            result in MessagePack, arrays as raw buffers). Without it, the Accept header decides
+            (application/json, application/vnd.emotionplot.compact+json, application/msgpack).
     Raises:
-        HTTPException: If there is an error during the pipeline execution.
+        HTTPException: If there is an error during the pipeline execution (400), 406 if the Accept
+            header allows no supported format, or 503 if the inference scheduler's queue is full
+            (INFERENCE_SCHEDULER).
     Returns:
-        dict: A dictionary containing the status, model used, book URL, sentences per chunk, number of chunks, and the predicted emotions.
+        Response: The result in the negotiated format: the status, model used, book URL, sentences
+        per chunk, number of chunks, and the predicted emotions. Cached results are sent as stored.
+        With timings or profile, JSON responses embed them; other formats report them in the
+        Server-Timing and X-Profile headers.
     """
+    if profile and not ENABLE_PROFILING:
+        raise HTTPException(status_code=403, detail="Profiling is disabled on this server (ENABLE_PROFILING=0)")
     try:
-        print("Step 0: Check for cached results...")
-        novel_id = generate_novel_id(url)
-        blob_name = f"emotion_results/{novel_id}_model={model}_spc={sentences_per_chunk}.json"
-        bucket_name = "emotionplot-results"
-
-        # Optional: return cached result
-        cached_result = download_from_gcs_if_exists(bucket_name, blob_name)
-        if cached_result:
-            print("Found cached result in GCS. Returning.")
-            return cached_result
-
-        # Step 1: Getting novel
-        print("Step 1: Getting novel...")
-        raw_text = get_novel(url)
+        # An unknown ?format= raises ValueError (400); an Accept header matching no format is a 406
+        response_format = negotiate_format(accept, response_format)
+        if response_format is None:
+            raise HTTPException(status_code=406, detail=f"Acceptable media types: {list(RESPONSE_FORMATS.values())}")
+        # JSON with timings or a profile is built as a dict; everything else is sent as encoded bytes
+        embed = response_format == "json" and (timings or profile)
+        with ExitStack() as stack:
+            breakdown = stack.enter_context(request_timings())
+            profiled = stack.enter_context(profile_request(profile, name="analyze")) if profile else None
+            if embed:
+                result = run_emotion_pipeline(url, sentences_per_chunk, model, backend,
+                                              tokens_per_chunk=tokens_per_chunk, overlap_sentences=overlap_sentences,
+                                              scoring=scoring)
+            else:
+                data = get_encoded_result(url, sentences_per_chunk, model, backend, tokens_per_chunk=tokens_per_chunk,
+                                          overlap_sentences=overlap_sentences, scoring=scoring,
+                                          response_format=response_format)
+    except HTTPException:
+        raise
+    except SchedulerBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        print("Step 2: Preprocessing...")
-        clean_text = clean_gutenberg_text(raw_text)
-        preprocessed = preprocessing(clean_text)
+    if embed:
+        if timings:
+            result["timings"] = breakdown
+        if profile:
+            result["profile"] = profiled["path"]
+        return result
 
-        print("Step 3: Chunking...")
-        sentences = sent_tokenize(preprocessed)
-        if not sentences:
-            raise ValueError("No sentences found.")
-        df_chunks = chunk_by_sentences(preprocessed, sentences_per_chunk)
+    headers = {"Vary": "Accept"}
+    if timings:
+        headers["Server-Timing"] = server_timing(breakdown)
+    if profile:
+        headers["X-Profile"] = profiled["path"]
+    return Response(content=data, media_type=RESPONSE_FORMATS[response_format], headers=headers)
 
-        print("Step 4: Predicting emotions...")
-        df_with_preds = predict_emotions(df_chunks, top_k=3, model_type=model)
 
-        response_data = {
-            "status": "success",
-            "model_used": model,
-            "book_url": url,
-            "sentences_per_chunk": sentences_per_chunk,
-            "num_chunks": len(df_with_preds),
-            "emotions": df_with_preds[["chunk", "Predicted_Emotion", "Top_3_Emotions"]].to_dict(orient="records")
-        }
-
-        print("Step 5: Saving result to GCS...")
-        upload_to_gcs(response_data, bucket_name, blob_name)
+@app.get("/analyze/arcs")
+def emotion_arcs_endpoint(
+    url: str = Query(..., description="Project Gutenberg novel URL"),
+    sentences_per_chunk: int = Query(3, ge=1, le=7),
+    model: str = Query("accurate", enum=["fast", "accurate", "cascade"], description="Choose 'fast', 'accurate' or 'cascade' (fast model, accurate model where it is unsure)"),
+    backend: str = Query(None, enum=BACKENDS, description="Inference backend (defaults to the server configuration)"),
+    tokens_per_chunk: int = Query(None, ge=16, le=512, description="Pack sentences up to this many model tokens per chunk instead of using sentences_per_chunk"),
+    overlap_sentences: int = Query(0, ge=0, le=3, description="Sentences shared by consecutive chunks when tokens_per_chunk is set"),
+    scoring: str = Query("chunk", enum=SCORING_MODES, description="'chunk' scores each chunk; 'sentence-mean' derives chunk scores from stored sentence scores"),
+    bins: int = Query(200, ge=2, le=5000, description="Points per emotion series"),
+    smoothing: int = Query(0, ge=0, le=1000, description="Centered rolling mean window, in chunks (0 = none)"),
+    method: str = Query("bin", enum=DOWNSAMPLING_METHODS, description="'bin' averages consecutive chunks; 'lttb' keeps representative points"),
+    emotions: List[str] = Query(None, description="Emotions to return (default: all)"),
+    exclude_neutral: bool = Query(False, description="Leave out the 'neutral' series")
+):
+    """    Returns the emotion arcs of a novel as compact per-emotion arrays, ready to plot.
+    The analysis is run first if needed (same parameters as /analyze/).
+    Args:
+        url (str): The URL to the Project Gutenberg novel.
+        bins (int): Number of points per emotion series.
+        smoothing (int): Rolling mean window applied to the chunk scores before downsampling.
+        method (str): 'bin' (mean of consecutive chunks, shared x) or 'lttb' (Largest-Triangle-Three-Buckets
+            selection, one x array per emotion).
+        emotions (list[str]): Emotions to return; exclude_neutral drops 'neutral'.
+        Other arguments: see /analyze/.
+    Raises:
+        HTTPException: If there is an error during the pipeline execution or the aggregation.
+    Returns:
+        dict: The book URL, model, 'labels', 'num_chunks', 'x' (chunk index), 'position' (0-1 in the text)
+        and 'values' (one series per label).
+    """
+    try:
+        matrix = get_emotion_matrix(url, sentences_per_chunk, model, backend, tokens_per_chunk=tokens_per_chunk,
+                                    overlap_sentences=overlap_sentences, scoring=scoring)
+        arcs = emotion_arcs(matrix["probs"], matrix["labels"], matrix["offsets"], bins=bins, smoothing=smoothing,
+                            method=method, emotions=emotions, exclude_neutral=exclude_neutral)
+    except SchedulerBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"book_url": url, "model_used": model, "backend": matrix.get("backend"), **arcs}
 
-        print("Done. Returning fresh result.")
-        return response_data
 
+@app.get("/wordcloud")
+def wordcloud_endpoint(
+    url: str = Query(..., description="Project Gutenberg novel URL"),
+    start: float = Query(0.0, ge=0.0, le=1.0, description="Start of the range, as a position in the text (0 to 1)"),
+    end: float = Query(1.0, ge=0.0, le=1.0, description="End of the range, as a position in the text (0 to 1)"),
+    width: int = Query(400, ge=50, le=2000),
+    height: int = Query(400, ge=50, le=2000),
+    max_words: int = Query(200, ge=1, le=1000)
+):
+    """    Returns a PNG word cloud of the NRC lexicon emotion words in a range of a novel.
+    The words of the book are indexed once per process, and rendered images are cached
+    by a hash of their word frequencies, so any range is served cheaply.
+    Args:
+        url (str): The URL to the Project Gutenberg novel.
+        start (float): Start of the range, as a fraction of the text (matches 'position' in /analyze/arcs).
+        end (float): End of the range, as a fraction of the text.
+        width (int), height (int), max_words (int): Rendering options.
+    Raises:
+        HTTPException: If the range is empty or the book cannot be processed.
+    Returns:
+        Response: The image/png word cloud, with an ETag identifying its content.
+    """
+    if end <= start:
+        raise HTTPException(status_code=400, detail="end must be greater than start")
+    try:
+        index = get_word_frequency_index(url)
+        frequencies = index.frequencies(*index.sentence_range(start, end))
+        options = {"width": width, "height": height, "max_words": max_words}
+        image = get_wordcloud_renderer().render(frequencies, options)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    etag = frequencies_key(frequencies, options).split("/")[-1].removesuffix(".png")
+    return Response(content=image, media_type="image/png", headers={"ETag": f'"{etag}"'})
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    """    Returns hit, miss and latency counters of the result, chunk and word cloud caches,
+    and the queue of the inference scheduler.
+    Returns:
+        dict: Per-tier hits, misses, hit rate and mean lookup latency in milliseconds
+        for the result cache and the word cloud image cache, the hit rate of the chunk
+        probability cache, and per-model pending rows and mean batch size of the inference
+        scheduler (None when INFERENCE_SCHEDULER is off).
+    """
+    scheduler = get_inference_scheduler()
+    return {"results": get_result_cache().stats(), "chunks": get_chunk_cache().stats(),
+            "wordclouds": get_wordcloud_renderer().cache.stats(),
+            "scheduler": scheduler.stats() if scheduler is not None else None}
+
+
+@app.get("/metrics")
+def metrics():
+    """    Exposes the pipeline metrics in the Prometheus text format.
+    Returns:
+        PlainTextResponse: Stage durations, bytes fetched, sentences, chunks, tokens,
+        padded tokens, batch sizes, cache lookups and model load times of this process.
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/analyze/stream/")
+def stream_emotion_pipeline(
+    url: str = Query(..., description="Project Gutenberg novel URL"),
+    sentences_per_chunk: int = Query(3, ge=1, le=7),
+    model: str = Query("accurate", enum=["fast", "accurate", "cascade"], description="Choose 'fast', 'accurate' or 'cascade' (fast model, accurate model where it is unsure)"),
+    backend: str = Query(None, enum=BACKENDS, description="Inference backend (defaults to the server configuration)"),
+    tokens_per_chunk: int = Query(None, ge=16, le=512, description="Pack sentences up to this many model tokens per chunk instead of using sentences_per_chunk"),
+    overlap_sentences: int = Query(0, ge=0, le=3, description="Sentences shared by consecutive chunks when tokens_per_chunk is set")
+):
+    """    Runs the full emotion analysis pipeline and streams the predictions as NDJSON.
+    Args:
+        url (str): The URL to the Project Gutenberg novel.
+        sentences_per_chunk (int): Number of sentences per chunk, must be between 1 and 7.
+        model (str): The model to use for emotion prediction: 'fast', 'accurate' or 'cascade'.
+        backend (str): The inference backend, 'torch', 'int8' or 'onnx'. Defaults to INFERENCE_BACKEND.
+        tokens_per_chunk (int): If set, chunks hold as many sentences as fit in this many model
+            tokens (long sentences are split), so no chunk is truncated by the model.
+        overlap_sentences (int): Sentences repeated at the start of the next chunk in token mode.
+    Returns:
+        StreamingResponse: One JSON object per line: a header, then the rows of each
+        scored window of chunks as they are computed, then a done message (holding the
+        "escalated_fraction" of a cascade) or an error message.
+    """
+    def ndjson():
+        try:
+            for message in iter_emotion_pipeline(url, sentences_per_chunk, model, backend,
+                                                 tokens_per_chunk=tokens_per_chunk,
+                                                 overlap_sentences=overlap_sentences):
+                yield json.dumps(message) + "\n"
+        except Exception as e:
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+@app.post("/analyze/jobs")
+def submit_emotion_job(
+    url: str = Query(..., description="Project Gutenberg novel URL"),
+    sentences_per_chunk: int = Query(3, ge=1, le=7),
+    model: str = Query("accurate", enum=["fast", "accurate", "cascade"], description="Choose 'fast', 'accurate' or 'cascade' (fast model, accurate model where it is unsure)"),
+    backend: str = Query(None, enum=BACKENDS, description="Inference backend (defaults to the server configuration)"),
+    tokens_per_chunk: int = Query(None, ge=16, le=512, description="Pack sentences up to this many model tokens per chunk instead of using sentences_per_chunk"),
+    overlap_sentences: int = Query(0, ge=0, le=3, description="Sentences shared by consecutive chunks when tokens_per_chunk is set"),
+    scoring: str = Query("chunk", enum=SCORING_MODES, description="'chunk' scores each chunk; 'sentence-mean' derives chunk scores from stored sentence scores")
+):
+    """    Submits the full emotion analysis pipeline as a background job.
+    Identical requests that are already queued or running share the same job.
+    Args:
+        url (str): The URL to the Project Gutenberg novel.
+        sentences_per_chunk (int): Number of sentences per chunk, must be between 1 and 7.
+        model (str): The model to use for emotion prediction: 'fast', 'accurate' or 'cascade'.
+        backend (str): The inference backend, 'torch', 'int8' or 'onnx'. Defaults to INFERENCE_BACKEND.
+        tokens_per_chunk (int): If set, chunks hold as many sentences as fit in this many model
+            tokens (long sentences are split), so no chunk is truncated by the model.
+        overlap_sentences (int): Sentences repeated at the start of the next chunk in token mode.
+        scoring (str): 'chunk' or 'sentence-mean', see GET /analyze/.
+    Returns:
+        dict: The job ID and its current status, to poll with GET /analyze/jobs/{job_id}.
+    """
+    backend = backend or INFERENCE_BACKEND
+    key = (generate_novel_id(url), sentences_per_chunk, model, backend, tokens_per_chunk, overlap_sentences, scoring)
+    job = jobs.submit(key, run_emotion_pipeline, url=url, sentences_per_chunk=sentences_per_chunk,
+                      model=model, backend=backend, tokens_per_chunk=tokens_per_chunk,
+                      overlap_sentences=overlap_sentences, scoring=scoring)
+    return {"job_id": job.id, "status": job.status}
+
+
+@app.get("/analyze/jobs/{job_id}")
+def get_emotion_job(job_id: str):
+    """    Returns the status, per-stage progress and, once done, the result of a job.
+    Args:
+        job_id (str): The ID returned by POST /analyze/jobs.
+    Raises:
+        HTTPException: If the job is unknown or has expired.
+    Returns:
+        dict: The job status, current stage, progress per stage, error and result.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
@@ -0,0 +1,142 @@
+import numpy as np
+
+# "bin": mean (or sum) of consecutive chunks; "lttb": Largest-Triangle-Three-Buckets point selection
+DOWNSAMPLING_METHODS = ["bin", "lttb"]
+
+
+def bin_edges(num_rows, num_bins=None, group_size=None):
+    """
+    Returns the start row of each bin, either for `num_bins` bins of (almost) equal
+    size or for consecutive groups of `group_size` rows.
+    """
+    if group_size:
+        return np.arange(0, num_rows, group_size)
+    num_bins = max(1, min(num_bins or num_rows, num_rows))
+    return np.unique(np.linspace(0, num_rows, num_bins, endpoint=False).astype(np.int64))
+
+
+def bin_series(values, edges, reduce="mean"):
+    """
+    Reduces consecutive rows of a (num_rows, num_series) matrix into bins.
+    Args:
+        values (np.ndarray): The matrix (e.g. probabilities of each chunk).
+        edges (np.ndarray): Start row of each bin, from bin_edges.
+        reduce (str): "mean" or "sum" of the rows of each bin.
+    Returns:
+        np.ndarray: (len(edges), num_series) binned values.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.zeros((0, values.shape[1] if values.ndim == 2 else 0))
+    sums = np.add.reduceat(values, edges, axis=0)
+    if reduce == "sum":
+        return sums
+    if reduce != "mean":
+        raise ValueError(f"Invalid reduce: {reduce}. Choose from: ['mean', 'sum']")
+    sizes = np.diff(np.append(edges, len(values)))
+    return sums / sizes[:, None]
+
+
+def rolling_mean(values, window):
+    """
+    Centered rolling mean over the rows of a matrix; windows are truncated at both
+    ends (so the output has the same length and no edge bias towards zero).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if window <= 1 or len(values) == 0:
+        return values
+    cumsum = np.concatenate([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    rows = np.arange(len(values))
+    lo = np.clip(rows - window // 2, 0, len(values))
+    hi = np.clip(rows - window // 2 + window, 0, len(values))
+    return (cumsum[hi] - cumsum[lo]) / (hi - lo)[:, None]
+
+
+def lttb_indices(y, num_points):
+    """
+    Selects `num_points` rows of a series with the Largest-Triangle-Three-Buckets
+    algorithm, which keeps the peaks and troughs a plot would show.
+
+    The first and last points are kept; each bucket in between contributes the point
+    forming the largest triangle with the previously selected point and the mean of
+    the next bucket.
+    Args:
+        y (np.ndarray): The series, of shape (num_rows,).
+        num_points (int): Number of points to keep.
+    Returns:
+        np.ndarray: Sorted indices of the selected rows.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if num_points >= n or num_points < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64)
+    edges = np.linspace(1, n - 1, num_points - 1).astype(np.int64)
+    selected = np.empty(num_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(num_points - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        avg_x, avg_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def emotion_arcs(probs, labels, offsets=None, bins=200, smoothing=0, method="bin", emotions=None,
+                 exclude_neutral=False, decimals=4):
+    """
+    Builds compact per-emotion series for plotting the emotion arc of a book.
+
+    Works on the whole probability matrix at once: optional centered rolling mean
+    over `smoothing` chunks, then either mean-binning to `bins` points or LTTB
+    selection of `bins` points per emotion.
+    Args:
+        probs (np.ndarray): (num_chunks, num_labels) probability matrix.
+        labels (list[str]): Emotion of each column.
+        offsets (np.ndarray, optional): (num_chunks, 2) character offsets of the chunks,
+            used to report the position of each point in the text (0 to 1).
+        bins (int): Number of points per series.
+        smoothing (int): Rolling window, in chunks (0 or 1 = none).
+        method (str): One of DOWNSAMPLING_METHODS.
+        emotions (list[str], optional): Emotions to return (default: all).
+        exclude_neutral (bool): Drop the "neutral" series.
+        decimals (int): Rounding of the returned values.
+    Returns:
+        dict: "labels", "num_chunks", and for "bin" a shared "x" (first chunk of each
+            bin), "position" and a "values" list of one series per label; for "lttb",
+            "x", "position" and "values" hold one list per label.
+    """
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Invalid method: {method}. Choose from: {DOWNSAMPLING_METHODS}")
+    labels = list(labels)
+    selected = [label for label in labels
+                if (emotions is None or label in emotions) and not (exclude_neutral and label == "neutral")]
+    unknown = set(emotions or []) - set(labels)
+    if unknown:
+        raise ValueError(f"Unknown emotions: {sorted(unknown)}")
+
+    columns = [labels.index(label) for label in selected]
+    values = rolling_mean(np.asarray(probs)[:, columns], smoothing)
+    num_chunks = len(values)
+    if offsets is not None and num_chunks:
+        starts = np.asarray(offsets)[:, 0]
+        positions = starts / max(int(np.asarray(offsets)[-1, 1]), 1)
+    else:
+        positions = np.arange(num_chunks) / max(num_chunks, 1)
+
+    arcs = {"labels": selected, "num_chunks": num_chunks, "method": method, "smoothing": smoothing}
+    if method == "bin":
+        edges = bin_edges(num_chunks, bins) if num_chunks else np.zeros(0, dtype=np.int64)
+        arcs["x"] = edges.tolist()
+        arcs["position"] = np.round(positions[edges], decimals).tolist()
+        arcs["values"] = np.round(bin_series(values, edges).T, decimals).tolist()
+    else:
+        indices = [lttb_indices(values[:, j], bins) for j in range(len(selected))]
+        arcs["x"] = [idx.tolist() for idx in indices]
+        arcs["position"] = [np.round(positions[idx], decimals).tolist() for idx in indices]
+        arcs["values"] = [np.round(values[idx, j], decimals).tolist() for j, idx in enumerate(indices)]
+    return arcs
@@ -0,0 +1,132 @@
+import gzip
+import json
+import os
+import shutil
+from threading import get_ident
+
+import numpy as np
+import pandas as pd
+
+
+def save_emotion_matrix(directory, probs, labels, offsets, meta=None, text=None):
+    """
+    Saves the probability matrix of a book as memory-mappable .npy files.
+
+    Writes probs.npy (float32, num_chunks x num_labels), offsets.npy (int64,
+    num_chunks x 2 character offsets of each chunk) and meta.json (labels and
+    any extra metadata), plus text.txt.gz if the chunked text is given.
+    Args:
+        directory (str): Destination directory, created if needed.
+        probs (np.ndarray): Probabilities of shape (num_chunks, num_labels).
+        labels (list[str]): Emotion name of each column of `probs`.
+        offsets (array-like): (start, end) character offsets of each chunk.
+        meta (dict, optional): Extra metadata (book URL, model, chunking...).
+        text (str, optional): The text the offsets refer to.
+    """
+    probs = np.asarray(probs, dtype=np.float32)
+    offsets = np.asarray(offsets, dtype=np.int64).reshape(-1, 2)
+    if len(offsets) != len(probs):
+        raise ValueError(f"Got {len(offsets)} offsets for {len(probs)} probability rows")
+
+    os.makedirs(directory, exist_ok=True)
+
+    def write_array(array):
+        def write(path):
+            with open(path, "wb") as f:
+                np.save(f, array)
+        return write
+
+    def write_meta(path):
+        with open(path, "w") as f:
+            json.dump({**(meta or {}), "labels": list(labels)}, f)
+
+    def write_text(path):
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            f.write(text)
+
+    # Files are replaced, never rewritten in place: readers may have the previous ones memory-mapped.
+    # meta.json is written last, so an artifact is complete once it exists.
+    _save_atomic(os.path.join(directory, "probs.npy"), write_array(probs))
+    _save_atomic(os.path.join(directory, "offsets.npy"), write_array(offsets))
+    if text is not None:
+        _save_atomic(os.path.join(directory, "text.txt.gz"), write_text)
+    _save_atomic(os.path.join(directory, "meta.json"), write_meta)
+
+
+def _save_atomic(path, write):
+    tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_emotion_matrix(directory, mmap_mode="r"):
+    """
+    Loads an artifact written by save_emotion_matrix.
+    Args:
+        directory (str): The artifact directory.
+        mmap_mode (str, optional): np.load memory-map mode; None reads into memory.
+    Returns:
+        dict: 'probs' and 'offsets' arrays, 'labels' and the other metadata.
+    """
+    with open(os.path.join(directory, "meta.json")) as f:
+        artifact = json.load(f)
+    artifact["probs"] = np.load(os.path.join(directory, "probs.npy"), mmap_mode=mmap_mode)
+    artifact["offsets"] = np.load(os.path.join(directory, "offsets.npy"), mmap_mode=mmap_mode)
+    return artifact
+
+
+def _entry_size(entry):
+    if not entry.is_dir(follow_symlinks=False):
+        return entry.stat(follow_symlinks=False).st_size
+    return sum(os.path.getsize(os.path.join(dirpath, name))
+               for dirpath, _, names in os.walk(entry.path) for name in names)
+
+
+def prune_store(root, max_bytes):
+    """
+    Bounds the size of a local store whose entries are the files or directories
+    directly under `root` (artifacts, book intermediates, raw texts).
+
+    Once the entries take more than `max_bytes`, the least recently modified ones
+    are removed until they take at most 90% of it. Removing a file that a reader
+    has memory-mapped is safe: the mapping keeps the data until it is closed.
+    Returns:
+        int: The number of entries removed.
+    """
+    entries = []
+    try:
+        for entry in os.scandir(root):
+            if entry.name.endswith(".tmp"):
+                continue
+            try:
+                entries.append((entry.stat(follow_symlinks=False).st_mtime, _entry_size(entry), entry))
+            except FileNotFoundError:
+                pass
+    except FileNotFoundError:
+        return 0
+
+    size = sum(entry_size for _, entry_size, _ in entries)
+    if size <= max_bytes:
+        return 0
+    removed = 0
+    for _, entry_size, entry in sorted(entries, key=lambda e: e[0]):
+        if size <= 0.9 * max_bytes:
+            break
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+        size -= entry_size
+        removed += 1
+    return removed
+
+
+def probs_to_frame(probs, labels):
+    """
+    Wraps a probability matrix in a DataFrame with one score column per emotion,
+    as expected by graph.plot_stacked_emotions.
+    """
+    return pd.DataFrame(np.asarray(probs), columns=list(labels))
@@ -0,0 +1,128 @@
+import os
+from threading import get_ident
+
+import torch
+from transformers import AutoConfig, AutoTokenizer, AutoModelForSequenceClassification
+from transformers.modeling_outputs import SequenceClassifierOutput
+
+from emotionplot.params import MODELS_DIR
+
+# "torch": fp32 PyTorch, "int8": PyTorch dynamic int8 quantization (CPU), "onnx": ONNX Runtime (CPU)
+BACKENDS = ["torch", "int8", "onnx"]
+
+
+class OnnxSequenceClassifier:
+    """
+    Runs an exported sequence classification model with ONNX Runtime.
+
+    Mimics the parts of the transformers model interface used by predict_probs:
+    `config`, `to`, `eval` and a call returning an output with `.logits`.
+    """
+
+    def __init__(self, path, config):
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("The 'onnx' backend requires onnxruntime: pip install onnxruntime") from e
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [i.name for i in self.session.get_inputs()]
+        self.config = config
+
+    def to(self, device):
+        return self
+
+    def eval(self):
+        return self
+
+    def __call__(self, **inputs):
+        feed = {name: inputs[name].cpu().numpy() for name in self.input_names}
+        logits = self.session.run(["logits"], feed)[0]
+        return SequenceClassifierOutput(logits=torch.from_numpy(logits))
+
+
+def onnx_path(model_name):
+    """Returns the path where the ONNX export of a Hugging Face model is stored."""
+    return os.path.join(MODELS_DIR, "onnx", model_name.replace("/", "__") + ".onnx")
+
+
+def export_onnx(model_name, path):
+    """
+    Exports a Hugging Face sequence classification model to ONNX.
+    Args:
+        model_name (str): Hugging Face model name.
+        path (str): Destination .onnx file.
+    """
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    export_model_onnx(model, tokenizer, path)
+
+
+def export_model_onnx(model, tokenizer, path):
+    """
+    Exports an in-memory sequence classification model to ONNX.
+
+    The graph is written to a temporary file that replaces `path` once complete, so
+    that concurrent exports (e.g. of several inference workers) and crashed ones
+    never leave a partial file where load_model would read it.
+    Args:
+        model: The model, in eval mode.
+        tokenizer: Its tokenizer, used to build the tracing inputs.
+        path (str): Destination .onnx file.
+    """
+    dummy = tokenizer(["an example sentence to trace the graph."], return_tensors="pt")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path.removesuffix('.onnx')}.{os.getpid()}.{get_ident()}.tmp.onnx"
+    try:
+        _export(model, dummy, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _export(model, dummy, path):
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            (dummy["input_ids"], dummy["attention_mask"]),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"},
+            },
+            opset_version=14,
+        )
+
+
+def load_model(model_name, backend="torch", device=torch.device("cpu")):
+    """
+    Loads a GoEmotions classifier for the given inference backend.
+    Args:
+        model_name (str): Hugging Face model name.
+        backend (str): One of BACKENDS.
+        device (torch.device): Device for the "torch" backend; the others run on CPU.
+    Returns:
+        A model in eval mode, callable with tokenizer outputs and returning `.logits`.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid backend: {backend}. Choose from: {BACKENDS}")
+
+    if backend == "onnx":
+        path = onnx_path(model_name)
+        if not os.path.exists(path):
+            print(f"[backends] Exporting {model_name} to {path}")
+            export_onnx(model_name, path)
+        return OnnxSequenceClassifier(path, AutoConfig.from_pretrained(model_name))
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_name).eval()
+    if backend == "int8":
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model.to(device)
@@ -0,0 +1,214 @@
+"""
+Batch emotion analysis of a corpus of books.
+
+Fetching, cleaning and chunking run in a thread pool while inference runs in a
+process pool, so the next books are prepared while the current one is scored.
+Each book is written as a probability matrix artifact (see emotionplot.artifacts)
+under OUT/<book>/, completed books are checkpointed in OUT/progress.jsonl so an
+interrupted run resumes where it stopped, and OUT/summary.csv lists the mean
+score of every emotion per book.
+
+Usage:
+    python -m emotionplot.batch 1342 84 https://www.gutenberg.org/ebooks/1661 --out outputs/corpus
+    python -m emotionplot.batch @book_ids.txt --model fast --workers 4 --threads-per-worker 2
+    python -m emotionplot.batch rawdata/mirror/ --out outputs/corpus
+"""
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from emotionplot.artifacts import save_emotion_matrix
+from emotionplot.data import clean_gutenberg_text
+from emotionplot.fetch import fetch_novel, normalize_book_id
+from emotionplot.gcs_utils import generate_novel_id
+from emotionplot.ingest import iter_source_paths
+from emotionplot.model import get_id2label
+from emotionplot.preprocessing import preprocessing, split_sentences, chunk_by_sentences
+from emotionplot.workers import InferencePool
+
+
+def source_key(source):
+    """
+    Returns the output key of a source: its Gutenberg book ID, or else its file or
+    URL name followed by a hash of the full source (absolute path or URL, see
+    generate_novel_id), so that files with the same name in different directories
+    never share outputs or checkpoint entries.
+    """
+    if os.path.exists(source):
+        name, full = os.path.splitext(os.path.basename(source))[0], os.path.abspath(source)
+    else:
+        book_id = normalize_book_id(source)
+        if book_id:
+            return book_id
+        name, full = os.path.basename(urlparse(source).path.rstrip("/")), source
+    name = re.sub(r"[^\w.-]+", "_", name).strip("._")[:48] or "source"
+    return f"{name}-{generate_novel_id(full)[:10]}"
+
+
+def expand_sources(args):
+    """
+    Expands command line sources into (key, source) pairs (see source_key).
+
+    A source is a Gutenberg book ID or URL, a local .txt file, a directory of .txt
+    files, or @FILE listing one source per line.
+    """
+    sources = []
+    for arg in args:
+        if arg.startswith("@"):
+            with open(arg[1:]) as f:
+                sources.extend(expand_sources([line.strip() for line in f if line.strip()]))
+        elif os.path.exists(arg):
+            for path in iter_source_paths(arg):
+                sources.append((source_key(path), path))
+        else:
+            sources.append((source_key(arg), arg))
+    return sources
+
+
+def prepare_book(source, sentences_per_chunk):
+    """Reads, cleans, preprocesses and chunks one book (I/O-bound stage)."""
+    if os.path.exists(source):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            raw_text = f.read()
+    else:
+        raw_text = fetch_novel(source)
+
+    preprocessed = preprocessing(clean_gutenberg_text(raw_text))
+    sentences = split_sentences(preprocessed)
+    return preprocessed, chunk_by_sentences(preprocessed, sentences_per_chunk, sentences=sentences)
+
+
+def load_checkpoint(out_dir):
+    """Returns the progress records of the books already completed in `out_dir`."""
+    path = os.path.join(out_dir, "progress.jsonl")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return {record["book"]: record for record in records}
+
+
+def write_summary(out_dir, records, labels):
+    rows = []
+    for record in records:
+        probs = np.load(os.path.join(out_dir, record["book"], "probs.npy"), mmap_mode="r")
+        means = probs.mean(axis=0) if len(probs) else np.zeros(len(labels))
+        rows.append({
+            "book": record["book"],
+            "source": record["source"],
+            "num_chunks": record["num_chunks"],
+            "dominant_emotion": labels[int(np.argmax(means))],
+            **{label: float(score) for label, score in zip(labels, means)},
+        })
+    pd.DataFrame(rows).to_csv(os.path.join(out_dir, "summary.csv"), index=False)
+
+
+def run_batch(sources, out_dir, sentences_per_chunk=3, model="accurate", backend=None,
+              workers=2, threads_per_worker=0, io_workers=4):
+    """
+    Scores every book in `sources` and writes one artifact per book plus a corpus summary.
+    Args:
+        sources (list[tuple[str, str]]): (key, source) pairs from expand_sources.
+        out_dir (str): Output directory.
+        sentences_per_chunk (int): Number of sentences per chunk.
+        model (str): The model to use, either 'fast' or 'accurate'.
+        backend (str, optional): The inference backend. Defaults to INFERENCE_BACKEND.
+        workers (int): Inference worker processes.
+        threads_per_worker (int): Torch threads per worker (0 = split the cores evenly).
+        io_workers (int): Threads fetching and chunking books ahead of inference.
+    Returns:
+        dict: Number of books and chunks processed, elapsed seconds, books/hour and chunks/sec.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    done = load_checkpoint(out_dir)
+    todo = [(key, source) for key, source in sources if key not in done]
+    print(f"[batch] {len(sources)} books, {len(done)} already done, {len(todo)} to go")
+
+    id2label = get_id2label(model)
+    labels = [id2label[i] for i in range(len(id2label))]
+    pool = InferencePool(workers, threads_per_worker, preload=(model,), backend=backend)
+
+    start = time.perf_counter()
+    num_books = num_chunks = 0
+    with ThreadPoolExecutor(max_workers=io_workers) as io_pool, \
+            open(os.path.join(out_dir, "progress.jsonl"), "a") as progress:
+        # Keep a bounded number of books prepared ahead of inference
+        pending = []
+        queue = iter(todo)
+        for key, source in queue:
+            pending.append((key, source, io_pool.submit(prepare_book, source, sentences_per_chunk)))
+            if len(pending) >= 2 * io_workers:
+                break
+
+        while pending:
+            key, source, future = pending.pop(0)
+            for next_key, next_source in queue:
+                pending.append((next_key, next_source, io_pool.submit(prepare_book, next_source, sentences_per_chunk)))
+                break
+
+            try:
+                text, df = future.result()
+                book_start = time.perf_counter()
+                probs = pool.predict_probs(df["chunk"].tolist(), model, backend=backend).numpy()
+            except Exception as e:
+                print(f"[batch] {key}: failed ({e})")
+                continue
+
+            save_emotion_matrix(
+                os.path.join(out_dir, key), probs, labels, df[["start", "end"]].to_numpy(),
+                meta={"source": source, "model": model, "backend": backend,
+                      "sentences_per_chunk": sentences_per_chunk},
+                text=text,
+            )
+            record = {"book": key, "source": source, "num_chunks": len(df),
+                      "inference_s": time.perf_counter() - book_start}
+            progress.write(json.dumps(record) + "\n")
+            progress.flush()
+            done[key] = record
+
+            num_books += 1
+            num_chunks += len(df)
+            elapsed = time.perf_counter() - start
+            print(f"[batch] {key}: {len(df)} chunks  "
+                  f"({3600 * num_books / elapsed:.1f} books/hour, {num_chunks / elapsed:.1f} chunks/sec)")
+
+    pool.shutdown()
+    write_summary(out_dir, [done[key] for key, _ in sources if key in done], labels)
+
+    elapsed = time.perf_counter() - start
+    return {
+        "books": num_books,
+        "chunks": num_chunks,
+        "seconds": elapsed,
+        "books_per_hour": 3600 * num_books / elapsed if elapsed else 0.0,
+        "chunks_per_sec": num_chunks / elapsed if elapsed else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sources", nargs="+", help="Book IDs, URLs, .txt files, directories or @FILE lists")
+    parser.add_argument("--out", default="outputs/corpus")
+    parser.add_argument("--sentences-per-chunk", type=int, default=3)
+    parser.add_argument("--model", default="accurate", choices=["fast", "accurate"])
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads-per-worker", type=int, default=0)
+    parser.add_argument("--io-workers", type=int, default=4)
+    args = parser.parse_args()
+
+    stats = run_batch(expand_sources(args.sources), args.out, args.sentences_per_chunk, args.model,
+                      args.backend, args.workers, args.threads_per_worker, args.io_workers)
+    print(f"[batch] {stats['books']} books, {stats['chunks']} chunks in {stats['seconds']:.0f}s: "
+          f"{stats['books_per_hour']:.1f} books/hour, {stats['chunks_per_sec']:.1f} chunks/sec")
+
+
+if __name__ == "__main__":
+    main()
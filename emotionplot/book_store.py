@@ -0,0 +1,143 @@
+import gzip
+import os
+from threading import Lock, get_ident
+
+import numpy as np
+
+from emotionplot.artifacts import prune_store
+from emotionplot.gcs_utils import generate_novel_id
+from emotionplot.params import BOOK_STORE_DIR, BOOK_STORE_MAX_BYTES, SEGMENTER
+
+
+def book_key(url, segmenter=SEGMENTER):
+    """Returns the key of a book's intermediate results (they depend on the sentence segmenter)."""
+    return f"{generate_novel_id(url)}_{segmenter}"
+
+
+def _save_atomic(path, write):
+    tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+class BookStore:
+    """
+    Local store of the intermediate results of each analyzed book, so that a
+    re-analysis with other chunking parameters skips the download, cleaning and
+    sentence splitting, and can derive chunk scores from stored sentence scores.
+
+    Each book has a directory holding:
+      - text.txt.gz: the preprocessed text,
+      - sentences.npy: (num_sentences, 2) int64 character spans of its sentences,
+      - sentence_probs_MODEL_BACKEND.npy: float16 probabilities of each sentence.
+
+    Beyond `max_bytes`, the least recently used books are removed (see
+    artifacts.prune_store).
+    """
+
+    def __init__(self, root=BOOK_STORE_DIR, max_bytes=BOOK_STORE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _prune(self):
+        if self.max_bytes:
+            prune_store(self.root, self.max_bytes)
+
+    def _dir(self, key):
+        return os.path.join(self.root, key)
+
+    def load_text(self, key):
+        """Returns (preprocessed text, sentence spans), or None if the book is not stored."""
+        directory = self._dir(key)
+        try:
+            with gzip.open(os.path.join(directory, "text.txt.gz"), "rt", encoding="utf-8") as f:
+                text = f.read()
+            offsets = np.load(os.path.join(directory, "sentences.npy"))
+            # Marks the book as recently used for pruning
+            os.utime(directory)
+        except FileNotFoundError:
+            return None
+        return text, offsets
+
+    def save_text(self, key, text, offsets):
+        directory = self._dir(key)
+        os.makedirs(directory, exist_ok=True)
+
+        def write_text(path):
+            with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as f:
+                f.write(text)
+
+        def write_offsets(path):
+            with open(path, "wb") as f:
+                np.save(f, np.asarray(offsets, dtype=np.int64).reshape(-1, 2))
+
+        # Offsets are written last: load_text only succeeds once both files exist
+        _save_atomic(os.path.join(directory, "text.txt.gz"), write_text)
+        _save_atomic(os.path.join(directory, "sentences.npy"), write_offsets)
+        self._prune()
+
+    def _probs_path(self, key, model, backend):
+        return os.path.join(self._dir(key), f"sentence_probs_{model}_{backend}.npy")
+
+    def load_sentence_probs(self, key, model, backend):
+        """Returns the (num_sentences, num_labels) sentence probabilities, or None."""
+        try:
+            return np.load(self._probs_path(key, model, backend))
+        except FileNotFoundError:
+            return None
+
+    def save_sentence_probs(self, key, model, backend, probs):
+        os.makedirs(self._dir(key), exist_ok=True)
+
+        def write(path):
+            with open(path, "wb") as f:
+                np.save(f, np.asarray(probs, dtype=np.float16))
+
+        _save_atomic(self._probs_path(key, model, backend), write)
+        self._prune()
+
+
+def aggregate_sentence_probs(sentence_spans, sentence_probs, chunk_spans):
+    """
+    Derives chunk probabilities from sentence probabilities: each chunk gets the mean
+    of the sentences it overlaps, weighted by their length in characters.
+
+    Chunks only need character spans, so any chunking (sentences or tokens per chunk,
+    with or without overlap) is derived from the same sentence scores.
+    Args:
+        sentence_spans (array-like): (num_sentences, 2) sorted sentence spans.
+        sentence_probs (array-like): (num_sentences, num_labels) probabilities.
+        chunk_spans (array-like): (num_chunks, 2) chunk spans in the same text.
+    Returns:
+        np.ndarray: (num_chunks, num_labels) float32 probabilities.
+    """
+    sentence_spans = np.asarray(sentence_spans, dtype=np.int64).reshape(-1, 2)
+    chunk_spans = np.asarray(chunk_spans, dtype=np.int64).reshape(-1, 2)
+    weights = np.maximum(sentence_spans[:, 1] - sentence_spans[:, 0], 1).astype(np.float64)
+
+    # Prefix sums make every chunk mean O(1)
+    weighted = np.zeros((len(weights) + 1, sentence_probs.shape[1]))
+    np.cumsum(weights[:, None] * np.asarray(sentence_probs, dtype=np.float64), axis=0, out=weighted[1:])
+    total_weight = np.concatenate([[0.0], np.cumsum(weights)])
+
+    # Sentences i with end > chunk start and start < chunk end
+    first = np.searchsorted(sentence_spans[:, 1], chunk_spans[:, 0], side="right")
+    last = np.searchsorted(sentence_spans[:, 0], chunk_spans[:, 1], side="left")
+    last = np.maximum(last, first + 1).clip(max=len(weights))
+    first = first.clip(max=len(weights) - 1)
+
+    sums = weighted[last] - weighted[first]
+    return (sums / (total_weight[last] - total_weight[first])[:, None]).astype(np.float32)
+
+
+_book_store = None
+_book_store_lock = Lock()
+
+
+def get_book_store():
+    """Returns the process-wide BookStore, or None if BOOK_STORE_DIR is empty."""
+    global _book_store
+    with _book_store_lock:
+        if _book_store is None and BOOK_STORE_DIR:
+            _book_store = BookStore(BOOK_STORE_DIR)
+        return _book_store
@@ -0,0 +1,249 @@
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock, get_ident
+
+from emotionplot.metrics import inc
+from emotionplot.gcs_utils import BUCKET_NAME, upload_bytes_to_gcs, download_bytes_from_gcs
+from emotionplot.params import (
+    RESULT_CACHE_MEMORY_BYTES, RESULT_CACHE_DIR, RESULT_CACHE_DISK_BYTES,
+    RESULT_CACHE_REMOTE, RESULT_CACHE_FS_ROOT
+)
+
+
+# Bytes an OrderedDict entry costs besides its key and value objects (hash table slot and linked list node)
+ENTRY_OVERHEAD_BYTES = 100
+
+
+class MemoryCache:
+    """
+    In-process LRU cache of bytes values, bounded by their total size. Entries are
+    counted with their key and object overhead, which dominate for small values
+    such as chunk probability vectors.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_bytes=RESULT_CACHE_MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._items.get(key)
+            if data is not None:
+                self._items.move_to_end(key)
+            return data
+
+    @staticmethod
+    def _entry_size(key, data):
+        return sys.getsizeof(key) + sys.getsizeof(data) + ENTRY_OVERHEAD_BYTES
+
+    def put(self, key, data):
+        entry_size = self._entry_size(key, data)
+        if entry_size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self.size -= self._entry_size(key, self._items.pop(key))
+            self._items[key] = data
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                evicted_key, evicted = self._items.popitem(last=False)
+                self.size -= self._entry_size(evicted_key, evicted)
+
+
+class DiskCache:
+    """Local on-disk cache of bytes values; the oldest files are removed beyond `max_bytes`."""
+
+    name = "disk"
+
+    def __init__(self, directory, max_bytes=RESULT_CACHE_DISK_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.size = sum(e.stat().st_size for e in self._entries())
+        # Guards size accounting, replacing files and eviction
+        self._lock = Lock()
+
+    def _entries(self):
+        return [e for e in os.scandir(self.directory) if e.is_file() and not e.name.endswith(".tmp")]
+
+    def _path(self, key):
+        return os.path.join(self.directory, sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            try:
+                previous = os.stat(path).st_size
+            except FileNotFoundError:
+                previous = 0
+            os.replace(tmp_path, path)
+            self.size += len(data) - previous
+            if self.size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Rescan only when over the limit, and free a tenth of the space at once
+        entries = []
+        for entry in self._entries():
+            try:
+                entries.append((entry.stat().st_mtime, entry.stat().st_size, entry.path))
+            except FileNotFoundError:
+                pass
+        self.size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self.size <= 0.9 * self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+
+class ObjectStore:
+    """Interface of a remote object store holding bytes values under string keys."""
+
+    name = "remote"
+
+    def get(self, key):
+        """Returns the stored bytes, or None if the key does not exist."""
+        raise NotImplementedError
+
+    def put(self, key, data):
+        raise NotImplementedError
+
+
+class GCSStore(ObjectStore):
+    """Google Cloud Storage bucket, accessed through the shared storage client."""
+
+    def __init__(self, bucket_name=BUCKET_NAME):
+        self.bucket_name = bucket_name
+
+    def get(self, key):
+        return download_bytes_from_gcs(self.bucket_name, key)
+
+    def put(self, key, data):
+        upload_bytes_to_gcs(data, self.bucket_name, key)
+
+
+class FilesystemStore(ObjectStore):
+    """Stand-in for a remote object store that keeps each key as a file under `root`."""
+
+    def __init__(self, root=RESULT_CACHE_FS_ROOT):
+        self.root = root
+
+    def get(self, key):
+        try:
+            with open(os.path.join(self.root, key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, data):
+        # Written aside and renamed, so that a concurrent get never reads a partial value
+        path = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class TieredCache:
+    """
+    Looks keys up in each tier in order (fastest first) and writes through to all tiers.
+
+    A hit in a slower tier is copied into the faster tiers before it is returned.
+    Hits, misses and time spent are counted per tier, and exported as
+    emotionplot_cache_lookups_total{cache=name} metrics.
+    """
+
+    def __init__(self, tiers, name="result"):
+        self.tiers = list(tiers)
+        self.name = name
+        self._stats = {tier.name: {"hits": 0, "misses": 0, "seconds": 0.0} for tier in self.tiers}
+        self._lock = Lock()
+
+    def _record(self, tier, hit, seconds):
+        with self._lock:
+            stats = self._stats[tier.name]
+            stats["hits" if hit else "misses"] += 1
+            stats["seconds"] += seconds
+        inc("emotionplot_cache_lookups_total", cache=self.name, tier=tier.name, result="hit" if hit else "miss")
+
+    def get(self, key):
+        for i, tier in enumerate(self.tiers):
+            start = time.perf_counter()
+            data = tier.get(key)
+            self._record(tier, data is not None, time.perf_counter() - start)
+            if data is not None:
+                for faster in self.tiers[:i]:
+                    faster.put(key, data)
+                return data
+        return None
+
+    def put(self, key, data):
+        for tier in self.tiers:
+            tier.put(key, data)
+
+    def get_json(self, key):
+        data = self.get(key)
+        return json.loads(data) if data is not None else None
+
+    def put_json(self, key, value):
+        self.put(key, json.dumps(value).encode())
+
+    def stats(self):
+        """Returns hits, misses, hit rate and mean lookup latency (ms) for each tier."""
+        with self._lock:
+            report = {}
+            for name, stats in self._stats.items():
+                lookups = stats["hits"] + stats["misses"]
+                report[name] = {
+                    "hits": stats["hits"],
+                    "misses": stats["misses"],
+                    "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+                    "mean_latency_ms": 1000 * stats["seconds"] / lookups if lookups else 0.0,
+                }
+            return report
+
+
+_result_cache = None
+_result_cache_lock = Lock()
+
+
+def get_result_cache():
+    """Returns the process-wide analysis result cache configured in emotionplot.params."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is not None:
+            return _result_cache
+        tiers = [MemoryCache(RESULT_CACHE_MEMORY_BYTES)]
+        if RESULT_CACHE_DIR:
+            tiers.append(DiskCache(RESULT_CACHE_DIR, RESULT_CACHE_DISK_BYTES))
+        if RESULT_CACHE_REMOTE == "gcs":
+            tiers.append(GCSStore(BUCKET_NAME))
+        elif RESULT_CACHE_REMOTE == "fs":
+            tiers.append(FilesystemStore(RESULT_CACHE_FS_ROOT))
+        elif RESULT_CACHE_REMOTE != "none":
+            raise ValueError(f"Invalid RESULT_CACHE_REMOTE: {RESULT_CACHE_REMOTE}. Choose from: ['gcs', 'fs', 'none']")
+        _result_cache = TieredCache(tiers)
+        return _result_cache
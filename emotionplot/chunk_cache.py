@@ -0,0 +1,91 @@
+from hashlib import sha1
+from threading import Lock
+
+import numpy as np
+
+from emotionplot.cache import MemoryCache, DiskCache, TieredCache
+from emotionplot.model import registry
+from emotionplot.params import CHUNK_CACHE_MEMORY_BYTES, CHUNK_CACHE_DIR
+
+
+class ChunkProbCache:
+    """
+    Content-addressed cache of chunk probability vectors.
+
+    Keys are a hash of the model name (as registered, so stand-in models do not
+    share entries with the real ones), the inference backend and the exact chunk
+    text, so a chunk is scored once whatever book, URL or chunking produced it.
+    Vectors are stored as float16 bytes.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+
+    @staticmethod
+    def key(model_type, backend, text):
+        return sha1(f"{registry.model_names[model_type]}\0{backend}\0{text}".encode()).hexdigest()
+
+    def lookup(self, texts, model_type, backend):
+        """
+        Looks up the probability vector of each text.
+        Args:
+            texts (list[str]): Chunk texts.
+            model_type (str): Model type ("fast" or "accurate").
+            backend (str): Inference backend.
+        Returns:
+            tuple[np.ndarray | None, list[int]]: A float32 matrix with the cached rows
+                filled in (None if nothing was cached), and the indices of the texts
+                that were not cached.
+        """
+        probs = None
+        missing = []
+        for i, text in enumerate(texts):
+            data = self.store.get(self.key(model_type, backend, text))
+            if data is None:
+                missing.append(i)
+                continue
+            row = np.frombuffer(data, dtype=np.float16)
+            if probs is None:
+                probs = np.zeros((len(texts), len(row)), dtype=np.float32)
+            probs[i] = row
+
+        with self._lock:
+            self.hits += len(texts) - len(missing)
+            self.misses += len(missing)
+        return probs, missing
+
+    def store_many(self, texts, model_type, backend, probs):
+        """Stores one probability vector (a row of `probs`) per text."""
+        rows = np.asarray(probs, dtype=np.float16)
+        for text, row in zip(texts, rows):
+            self.store.put(self.key(model_type, backend, text), row.tobytes())
+
+    def stats(self):
+        """Returns hits, misses and hit rate since startup, plus per-tier counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "tiers": self.store.stats(),
+            }
+
+
+_chunk_cache = None
+_chunk_cache_lock = Lock()
+
+
+def get_chunk_cache():
+    """Returns the process-wide chunk probability cache configured in emotionplot.params."""
+    global _chunk_cache
+    with _chunk_cache_lock:
+        if _chunk_cache is None:
+            tiers = [MemoryCache(CHUNK_CACHE_MEMORY_BYTES)]
+            if CHUNK_CACHE_DIR:
+                tiers.append(DiskCache(CHUNK_CACHE_DIR))
+            _chunk_cache = ChunkProbCache(TieredCache(tiers, name="chunk"))
+        return _chunk_cache
@@ -1,27 +1,31 @@
-import pandas as pd
-from nrclex import NRCLex
+from emotionplot.lexicon import analyze_sentences
 
-def extract_emotional_words(df, sentence_column="Sentence"):
+
+def extract_emotional_words(df, sentence_column="Sentence", tokenizer="nltk", workers=0):
     """
-    Extracts emotional words from the specified column in a DataFrame using NRCLex.
+    Extracts emotional words from the specified column in a DataFrame using the NRC lexicon.
+
+    All sentences are analyzed in one batch (see emotionplot.lexicon), with the same
+    output as the installed nrclex's affect_list for each of them (NRCLex(sentence)
+    in 3.x, NRCLex().load_raw_text(sentence) with lemmas in 4.x).
 
     Parameters:
     - df (pd.DataFrame): DataFrame containing sentences.
     - sentence_column (str): Column name containing sentences (default: 'Sentence').
+    - tokenizer (str): One of lexicon.LEXICON_TOKENIZERS ("nltk" matches NRCLex exactly).
+    - workers (int): Worker processes for large corpora (0 = in-process).
 
     Returns:
-    - pd.DataFrame: Updated DataFrame with a new 'words' column containing emotional words.
+    - pd.DataFrame: Updated DataFrame with a new 'words' column containing emotional words
+      and an 'affect_words' column with the lexicon words found in each sentence.
     """
-    # Function to extract emotional words from a sentence
-    def extract_emotional_words(sentence):
-        emotion_obj = NRCLex(str(sentence))  # Process sentence with NRCLex
-        return " ".join(emotion_obj.affect_list)  # Extract emotional words
+    result = analyze_sentences(df[sentence_column].tolist(), tokenizer=tokenizer, workers=workers)
 
-    # Apply extraction to each sentence
-    df["words"] = df[sentence_column].apply(extract_emotional_words)
+    df["words"] = [" ".join(affects) for affects in result["affect_lists"]]
+    df["affect_words"] = [" ".join(words) for words in result["affect_words"]]
 
     return df
 
 # Example usage:
-# df = extract_emotional_words_from_df(df)
+# df = extract_emotional_words(df)
 # print(df.head())
@@ -0,0 +1,199 @@
+import gzip
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from hashlib import sha1
+from threading import get_ident
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from emotionplot.artifacts import prune_store
+from emotionplot.metrics import inc
+from emotionplot.params import RAW_TEXT_DIR, RAW_TEXT_MAX_BYTES, GUTENBERG_MIRROR_DIR, FETCH_TIMEOUT, FETCH_OFFLINE
+
+# Gutenberg URL forms that carry a book ID: /ebooks/<id>, /cache/epub/<id>/..., /files/<id>/...
+_BOOK_ID_PATTERNS = [
+    re.compile(r"gutenberg\.org/ebooks/(\d+)"),
+    re.compile(r"gutenberg\.org/cache/epub/(\d+)/"),
+    re.compile(r"gutenberg\.org/files/(\d+)/"),
+]
+
+
+def normalize_book_id(url_or_id):
+    """
+    Extracts the Project Gutenberg book ID from a URL or a bare ID.
+    Args:
+        url_or_id (str | int): A Gutenberg URL (any common form) or a book ID.
+    Returns:
+        str or None: The book ID as a string, or None if it cannot be determined.
+    """
+    value = str(url_or_id).strip()
+    if value.isdigit():
+        return str(int(value))
+    for pattern in _BOOK_ID_PATTERNS:
+        match = pattern.search(value)
+        if match:
+            return str(int(match.group(1)))
+    return None
+
+
+def gutenberg_text_url(url: str) -> str:
+    """
+    Converts an HTML-style Gutenberg book URL (.../ebooks/<id>) or a bare book ID
+    to its raw .txt URL. Other URLs are returned unchanged.
+    """
+    if "gutenberg.org/ebooks/" in url or url.strip().isdigit():
+        book_id = url.rstrip("/").split("/")[-1].strip()
+        url = f"https://www.gutenberg.org/cache/epub/{book_id}/pg{book_id}.txt"
+    return url
+
+
+@lru_cache(maxsize=1)
+def get_session():
+    """Returns a requests session shared by all fetches, with pooled connections and retries."""
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def response_text(resp):
+    """Returns the text of a response, extracting it from the markup for HTML pages."""
+    if "html" in resp.headers.get("Content-Type", ""):
+        return BeautifulSoup(resp.content, "html.parser").get_text()
+    return resp.text
+
+
+class RawTextStore:
+    """
+    Local store of downloaded raw texts, gzip-compressed and keyed by Gutenberg book ID
+    and source URL (the HTML and plain text versions of a book are stored apart).
+
+    Next to each <id>-<url hash>.txt.gz, a .json file keeps the source URL and the
+    ETag and Last-Modified headers used to revalidate the text. Beyond `max_bytes`,
+    the least recently written texts are removed (see artifacts.prune_store).
+    """
+
+    def __init__(self, root=RAW_TEXT_DIR, max_bytes=RAW_TEXT_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    def _paths(self, book_id, source_url):
+        stem = os.path.join(self.root, f"{book_id}-{sha1(source_url.encode()).hexdigest()[:12]}")
+        return f"{stem}.txt.gz", f"{stem}.json"
+
+    def get(self, book_id, source_url):
+        """Returns (text, metadata) for a stored book, or None (also if the stored files are incomplete or corrupt)."""
+        text_path, meta_path = self._paths(book_id, source_url)
+        try:
+            with gzip.open(text_path, "rt", encoding="utf-8") as f:
+                text = f.read()
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, EOFError, ValueError):
+            return None
+        return (text, meta) if meta.get("url") == source_url else None
+
+    def put(self, book_id, source_url, text, meta):
+        os.makedirs(self.root, exist_ok=True)
+        text_path, meta_path = self._paths(book_id, source_url)
+        suffix = f"{os.getpid()}.{get_ident()}.tmp"
+        with gzip.open(f"{text_path}.{suffix}", "wt", encoding="utf-8") as f:
+            f.write(text)
+        with open(f"{meta_path}.{suffix}", "w") as f:
+            json.dump({**meta, "url": source_url}, f)
+        os.replace(f"{text_path}.{suffix}", text_path)
+        os.replace(f"{meta_path}.{suffix}", meta_path)
+        if self.max_bytes:
+            prune_store(self.root, self.max_bytes)
+
+
+def read_from_mirror(book_id, mirror_dir=GUTENBERG_MIRROR_DIR):
+    """
+    Looks a book up in a local Gutenberg mirror directory.
+
+    Tries <id>.txt, pg<id>.txt, <id>-0.txt, <id>/pg<id>.txt and <id>/<id>-0.txt,
+    each also gzip-compressed (.gz).
+    Returns:
+        str or None: The raw text, or None if the book is not in the mirror.
+    """
+    if not mirror_dir or book_id is None:
+        return None
+    names = [f"{book_id}.txt", f"pg{book_id}.txt", f"{book_id}-0.txt",
+             os.path.join(book_id, f"pg{book_id}.txt"), os.path.join(book_id, f"{book_id}-0.txt")]
+    for name in names:
+        for path, opener in [(os.path.join(mirror_dir, name), open),
+                             (os.path.join(mirror_dir, name + ".gz"), gzip.open)]:
+            if os.path.exists(path):
+                with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+                    return f.read()
+    return None
+
+
+_default_store = RawTextStore(RAW_TEXT_DIR) if RAW_TEXT_DIR else None
+
+
+def fetch_novel(url, store=_default_store, mirror_dir=GUTENBERG_MIRROR_DIR, offline=FETCH_OFFLINE,
+                timeout=FETCH_TIMEOUT):
+    """
+    Returns the raw text of a book, from a local mirror, the local store or the network.
+
+    Stored texts are revalidated with If-None-Match / If-Modified-Since, so an
+    unchanged book costs a 304 response instead of a full download. If the network
+    fails, a stored copy is returned instead.
+    Args:
+        url (str): Project Gutenberg URL (any form) or book ID.
+        store (RawTextStore, optional): Local store of raw texts; None disables it.
+        mirror_dir (str, optional): Local Gutenberg mirror directory, checked first.
+        offline (bool): Never use the network; raise if the book is not available locally.
+        timeout (float): Connection and read timeout, in seconds.
+    Returns:
+        str: The raw text of the novel.
+    """
+    book_id = normalize_book_id(url)
+
+    text = read_from_mirror(book_id, mirror_dir)
+    if text is not None:
+        return text
+
+    source_url = gutenberg_text_url(url)
+    stored = store.get(book_id, source_url) if store is not None and book_id else None
+    if offline:
+        if stored is None:
+            raise LookupError(f"Book {book_id or url} is not available offline")
+        return stored[0]
+
+    headers = {}
+    if stored is not None:
+        if stored[1].get("etag"):
+            headers["If-None-Match"] = stored[1]["etag"]
+        if stored[1].get("last_modified"):
+            headers["If-Modified-Since"] = stored[1]["last_modified"]
+
+    try:
+        resp = get_session().get(source_url, headers=headers, timeout=timeout)
+        if resp.status_code == 304 and stored is not None:
+            return stored[0]
+        resp.raise_for_status()
+    except requests.RequestException:
+        if stored is not None:
+            print(f"[fetch_novel] Network error, using stored copy of book {book_id}")
+            return stored[0]
+        raise
+
+    inc("emotionplot_fetch_bytes_total", len(resp.content))
+    text = response_text(resp)
+    if store is not None and book_id:
+        store.put(book_id, source_url, text, {
+            "etag": resp.headers.get("ETag"),
+            "last_modified": resp.headers.get("Last-Modified"),
+            "fetched_at": time.time(),
+        })
+    return text
@@ -0,0 +1,139 @@
+import json
+
+import numpy as np
+
+from emotionplot.model import top_k_indices
+
+# Response formats of /analyze/ and their media types:
+#   - json: the full result, with the text and a dict of top-3 scores of every chunk,
+#   - compact: JSON with the label table once, then label IDs, scores and character
+#     offsets of each chunk instead of its text,
+#   - msgpack: the compact result in MessagePack, with the arrays as raw little-endian
+#     buffers (decode_msgpack reads them with np.frombuffer, without copying).
+RESPONSE_FORMATS = {
+    "json": "application/json",
+    "compact": "application/vnd.emotionplot.compact+json",
+    "msgpack": "application/msgpack",
+}
+_MEDIA_TYPE_FORMATS = {
+    **{media_type: name for name, media_type in RESPONSE_FORMATS.items()},
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+}
+
+# dtype of each array of the msgpack format
+MSGPACK_DTYPES = {"offsets": "<i4", "top_ids": "u1", "top_scores": "<f2"}
+
+
+def negotiate_format(accept=None, requested=None):
+    """
+    Picks the response format from an explicit `requested` format name, or else from an
+    HTTP Accept header (highest q-value first; JSON when there is no preference).
+    Returns:
+        str | None: A key of RESPONSE_FORMATS, or None if the Accept header allows none.
+    """
+    if requested:
+        if requested not in RESPONSE_FORMATS:
+            raise ValueError(f"Invalid format: {requested}. Choose from: {list(RESPONSE_FORMATS)}")
+        return requested
+    if not accept:
+        return "json"
+
+    candidates = []
+    for position, item in enumerate(accept.split(",")):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        if media_type.lower() in _MEDIA_TYPE_FORMATS:
+            candidates.append((-quality, position, _MEDIA_TYPE_FORMATS[media_type.lower()]))
+        elif media_type in ("*/*", "application/*"):
+            candidates.append((-quality, position, "json"))
+    return min(candidates)[2] if candidates else None
+
+
+def encoded_blob_name(blob_name, response_format):
+    """Returns the cache key of a result (see pipeline.result_blob_name) encoded in `response_format`."""
+    if response_format == "json":
+        return blob_name
+    suffix = {"compact": ".compact.json", "msgpack": ".msgpack"}[response_format]
+    return blob_name.removesuffix(".json") + suffix
+
+
+def _compact_arrays(probs, offsets, top_k):
+    indices, scores = top_k_indices(np.asarray(probs, dtype=np.float32), top_k)
+    return {
+        "offsets": np.asarray(offsets).reshape(-1, 2).astype(MSGPACK_DTYPES["offsets"]),
+        "top_ids": indices.astype(MSGPACK_DTYPES["top_ids"]),
+        "top_scores": scores.astype(MSGPACK_DTYPES["top_scores"]),
+    }
+
+
+def encode_compact(header, probs, labels, offsets, top_k=3):
+    """
+    Encodes a result as compact JSON: the response header, 'labels' (the label table),
+    and per chunk its 'offsets' [start, end] in the preprocessed text, 'top_ids'
+    (indices into 'labels', best first) and 'top_scores' (float16 precision).
+    Returns:
+        bytes: The UTF-8 JSON document.
+    """
+    arrays = _compact_arrays(probs, offsets, top_k)
+    payload = {
+        **header,
+        "format": "compact",
+        "labels": list(labels),
+        "offsets": arrays["offsets"].tolist(),
+        "top_ids": arrays["top_ids"].tolist(),
+        # float16 keeps about 3 significant digits; the rounding drops float32 noise from the text
+        "top_scores": np.round(arrays["top_scores"].astype(np.float64), 4).tolist(),
+    }
+    return json.dumps(payload, separators=(",", ":")).encode()
+
+
+def encode_msgpack(header, probs, labels, offsets, top_k=3):
+    """
+    Encodes a result as MessagePack: the response header and 'labels', then the
+    'offsets' (num_chunks x 2), 'top_ids' (num_chunks x top_k) and 'top_scores'
+    (num_chunks x top_k) arrays as raw buffers, typed by MSGPACK_DTYPES.
+    Returns:
+        bytes: The MessagePack document.
+    """
+    import msgpack
+
+    arrays = _compact_arrays(probs, offsets, top_k)
+    payload = {
+        **header,
+        "format": "msgpack",
+        "labels": list(labels),
+        "top_k": top_k,
+        "dtypes": MSGPACK_DTYPES,
+        **{name: array.tobytes() for name, array in arrays.items()},
+    }
+    return msgpack.packb(payload, use_bin_type=True)
+
+
+def decode_msgpack(data):
+    """Decodes encode_msgpack output; the arrays are NumPy views of `data`."""
+    import msgpack
+
+    payload = msgpack.unpackb(data, raw=False)
+    num_chunks, top_k = payload["num_chunks"], payload["top_k"]
+    shapes = {"offsets": (num_chunks, 2), "top_ids": (num_chunks, top_k), "top_scores": (num_chunks, top_k)}
+    for name, dtype in payload["dtypes"].items():
+        payload[name] = np.frombuffer(payload[name], dtype=dtype).reshape(shapes[name])
+    return payload
+
+
+def encode_result(response_format, header, probs, labels, offsets, top_k=3):
+    """Encodes a result in the compact or msgpack format (see RESPONSE_FORMATS)."""
+    if response_format == "compact":
+        return encode_compact(header, probs, labels, offsets, top_k)
+    if response_format == "msgpack":
+        return encode_msgpack(header, probs, labels, offsets, top_k)
+    raise ValueError(f"Invalid format: {response_format}. Choose from: ['compact', 'msgpack']")
@@ -1,5 +1,7 @@
 import json
+from functools import lru_cache
 from hashlib import md5
+from google.api_core.exceptions import NotFound
 from google.cloud import storage
 
 
@@ -15,6 +17,37 @@ def generate_novel_id(url: str) -> str:
     """
     return md5(url.encode()).hexdigest()
 
+@lru_cache(maxsize=1)
+def get_storage_client():
+    """Returns a Google Cloud Storage client shared by all calls in this process,
+    so its HTTP connection pool and credentials are reused."""
+    return storage.Client()
+
+def upload_bytes_to_gcs(data: bytes, bucket_name: str, blob_name: str, content_type="application/octet-stream"):
+    """Uploads raw bytes to Google Cloud Storage.
+    Args:
+        data (bytes): The content to upload.
+        bucket_name (str): The name of the GCS bucket.
+        blob_name (str): The name of the blob (file) in the bucket.
+        content_type (str): The content type stored with the blob.
+    """
+    blob = get_storage_client().bucket(bucket_name).blob(blob_name)
+    blob.upload_from_string(data, content_type=content_type)
+
+def download_bytes_from_gcs(bucket_name: str, blob_name: str):
+    """Downloads a blob from Google Cloud Storage in a single request.
+    Args:
+        bucket_name (str): The name of the GCS bucket.
+        blob_name (str): The name of the blob (file) in the bucket.
+    Returns:
+        bytes or None: The content of the blob, or None if it does not exist.
+    """
+    blob = get_storage_client().bucket(bucket_name).blob(blob_name)
+    try:
+        return blob.download_as_bytes()
+    except NotFound:
+        return None
+
 def upload_to_gcs(data: dict, bucket_name: str, blob_name: str):
     """Uploads a dictionary to Google Cloud Storage as a JSON file.
     Args:
@@ -25,10 +58,7 @@ def upload_to_gcs(data: dict, bucket_name: str, blob_name: str):
     if not isinstance(data, dict):
         raise TypeError("`data` must be a dictionary")
 
-    client = storage.Client()
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(blob_name)
-    blob.upload_from_string(json.dumps(data), content_type="application/json")
+    upload_bytes_to_gcs(json.dumps(data).encode(), bucket_name, blob_name, content_type="application/json")
 
 def download_from_gcs_if_exists(bucket_name: str, blob_name: str):
     """Downloads a JSON file from Google Cloud Storage if it exists.
@@ -41,10 +71,7 @@ def download_from_gcs_if_exists(bucket_name: str, blob_name: str):
     if not isinstance(bucket_name, str) or not isinstance(blob_name, str):
         raise TypeError("`bucket_name` and `blob_name` must be strings")
 
-    client = storage.Client()
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(blob_name)
-    if blob.exists():
-        content = blob.download_as_text()
-        return json.loads(content)
-    return None
+    content = download_bytes_from_gcs(bucket_name, blob_name)
+    if content is None:
+        return None
+    return json.loads(content)
@@ -1,85 +1,58 @@
 import plotly.graph_objects as go
 
-def plot_stacked_emotions(df, group_size=5, exclude_neutral=True):
+from emotionplot.aggregation import bin_edges, bin_series
+
+# Emotions shown by default; the others start hidden ("legendonly")
+DEFAULT_VISIBLE = ["anger", "joy", "disapproval", "fear", "surprise", "curiosity", "sadness"]
+
+# Order of the traces (must match the emotion names of the model)
+CUSTOM_ORDER = [
+    "anger", "joy", "disapproval", "fear", "surprise", "curiosity", "sadness",
+    "love", "gratitude", "pride", "relief", "amusement", "admiration", "approval",
+    "excitement", "optimism", "caring", "desire", "realization", "confusion",
+    "nervousness", "embarrassment", "annoyance", "disappointment", "remorse",
+    "disgust", "grief", "neutral",
+]
+
+
+def plot_emotion_arcs(arcs, title="Emotion Scores per Chunk", show=True):
     """
-    Plots a stacked bar chart of emotion scores from a DataFrame using Plotly.
+    Plots per-emotion series as returned by aggregation.emotion_arcs (and GET /analyze/arcs).
 
     Parameters:
-    - emotions_df (pd.DataFrame): A DataFrame containing emotion scores per chunk.
-    - group_size (int): Number of chunks to group together for aggregation.
-    - exclude_neutral (bool): Whether to exclude the "neutral" emotion from the plot.
+    - arcs (dict): 'labels', 'method', 'x' and 'values' arrays.
+    - title (str): Figure title.
+    - show (bool): Whether to show the figure.
 
     Returns:
-    - None (shows an interactive plot)
+    - go.Figure: The figure.
     """
-    # Select emotions to plot
-    emotions_to_plot = [
-        col for col in df.columns
-     #   if not (exclude_neutral and col.lower() == "neutral")
-    ]
-
-    # Group emotion scores
-    grouped = df[emotions_to_plot].groupby(df.index // group_size).sum()
-
-    template_to_select = ["plotly", "plotly_white", "plotly_dark", "ggplot2", "seaborn", "simple_white", "none"]
     template_selected = "plotly_white"
-
+    labels = arcs["labels"]
     fig = go.Figure()
 
-    default_visible = ["anger", "joy", "disapproval", "fear", "surprise", "curiosity", "sadness"]  # Emotions to show by default
-
-
-    # Your custom emotion order (must match column names in emotions_df)
-    custom_order = [
-        "anger", "joy", "disapproval", "fear", "surprise", "curiosity", "sadness"
-        'love',
-        'gratitude',
-        'pride',
-        'relief',
-        'amusement',
-        'admiration',
-        'approval',
-        'excitement',
-        'optimism',
-        'caring',
-        'desire',
-        'realization',
-        'confusion',
-        'nervousness',
-        'embarrassment',
-        'annoyance',
-        'disappointment',
-        'remorse',
-        'disgust',
-        'grief',
-        'neutral'
-    ]
-
-
-# Loop through custom order
-for emotion in custom_order:
-    if emotion in emotions_df.columns:
+    # Known emotions in custom order first, then any others
+    for emotion in [e for e in CUSTOM_ORDER if e in labels] + [e for e in labels if e not in CUSTOM_ORDER]:
+        j = labels.index(emotion)
+        x = arcs["x"] if arcs.get("method", "bin") == "bin" else arcs["x"][j]
         fig.add_trace(
             go.Scatter(
-                x=emotions_df.index,
-                y=emotions_df[emotion],
+                x=x,
+                y=arcs["values"][j],
                 mode='lines',
                 name=emotion,
-                customdata=df["chunk"],
                 hovertemplate=(
                     "<b>Chunk Index:</b> %{x}<br>" +
                     "<b>Emotion:</b> %{fullData.name}<br>" +
-                    "<b>Emotion Score:</b> %{y:.2f}<br>" +
-                    "<b>Text:</b> %{customdata}<extra></extra>"
+                    "<b>Emotion Score:</b> %{y:.2f}<extra></extra>"
                 ),
-                visible=True if emotion in default_visible else "legendonly"
+                visible=True if emotion in DEFAULT_VISIBLE else "legendonly"
             )
         )
 
     # Configure layout
     fig.update_layout(
-        barmode='stack',
-        title="Stacked Emotion Scores per Chunk",
+        title=title,
         xaxis=dict(
             title="Chunk Index",
             rangeslider=dict(visible=True),
@@ -94,4 +67,33 @@ for emotion in custom_order:
         template=template_selected
     )
 
-    fig.show(config={"scrollZoom": True})
+    if show:
+        fig.show(config={"scrollZoom": True})
+    return fig
+
+
+def plot_stacked_emotions(df, group_size=5, exclude_neutral=True):
+    """
+    Plots emotion scores from a DataFrame using Plotly, summed over groups of chunks.
+
+    Parameters:
+    - df (pd.DataFrame): A DataFrame containing emotion scores per chunk, one column
+      per emotion (see artifacts.probs_to_frame).
+    - group_size (int): Number of chunks to group together for aggregation.
+    - exclude_neutral (bool): Whether to exclude the "neutral" emotion from the plot.
+
+    Returns:
+    - go.Figure: The figure (also shown as an interactive plot).
+    """
+    # Select emotions to plot
+    emotions_to_plot = [
+        col for col in df.columns
+        if col in CUSTOM_ORDER and not (exclude_neutral and col.lower() == "neutral")
+    ]
+
+    # Group emotion scores (same result as df.groupby(df.index // group_size).sum())
+    edges = bin_edges(len(df), group_size=group_size)
+    grouped = bin_series(df[emotions_to_plot].to_numpy(), edges, reduce="sum")
+
+    arcs = {"labels": emotions_to_plot, "method": "bin", "x": edges.tolist(), "values": grouped.T.tolist()}
+    return plot_emotion_arcs(arcs, title="Stacked Emotion Scores per Chunk")
@@ -0,0 +1,184 @@
+import os
+import re
+from itertools import chain
+
+from emotionplot.data import START_MARKER, END_MARKER
+from emotionplot.fetch import gutenberg_text_url, get_session, response_text
+from emotionplot.normalization import iter_normalized_blocks
+from emotionplot.preprocessing import split_sentences
+
+# Characters read per block from a download or a file
+BLOCK_SIZE = 1 << 16
+
+# If no START marker appears within this many characters, the text is treated as
+# having no markers and streamed as a whole (like clean_gutenberg_text does)
+HEADER_LIMIT = 100_000
+
+# Normalized characters buffered before running the sentence splitter
+SENTENCE_BUFFER_CHARS = 1 << 16
+
+# Characters kept between blocks so that an END marker split across two blocks is found
+_MARKER_OVERLAP = 64
+
+
+def iter_source_paths(path):
+    """
+    Lists the text files of a local source.
+    Args:
+        path (str): A file, or a directory whose .txt files are used in name order.
+    Returns:
+        list[str]: Paths of the text files.
+    """
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name) for name in os.listdir(path)
+            if name.endswith(".txt") and os.path.isfile(os.path.join(path, name))
+        )
+    return [path]
+
+
+def iter_source_blocks(source, block_size=BLOCK_SIZE, timeout=30):
+    """
+    Reads a text from a URL or a local file in blocks, without holding it all in memory.
+
+    HTML pages cannot be parsed incrementally, so they are read and converted as a whole.
+    Args:
+        source (str): Project Gutenberg URL (HTML or .txt) or path to a local text file.
+        block_size (int): Characters per block.
+        timeout (float): Connection and read timeout for URLs, in seconds.
+    Yields:
+        str: Consecutive blocks of the raw text.
+    """
+    if not source.startswith(("http://", "https://")):
+        with open(source, encoding="utf-8", errors="replace") as f:
+            while block := f.read(block_size):
+                yield block
+        return
+
+    with get_session().get(gutenberg_text_url(source), stream=True, timeout=timeout) as resp:
+        resp.raise_for_status()
+        if "html" in resp.headers.get("Content-Type", ""):
+            yield response_text(resp)
+            return
+        resp.encoding = resp.encoding or "utf-8"
+        for block in resp.iter_content(chunk_size=block_size, decode_unicode=True):
+            if block:
+                yield block
+
+
+def iter_gutenberg_body(blocks, header_limit=HEADER_LIMIT):
+    """
+    Streams the part of a Gutenberg text between its START and END markers.
+
+    Works like clean_gutenberg_text on a stream: the START marker is searched for in
+    the first `header_limit` characters (if it is not there, the whole text is
+    streamed), then blocks are passed through until the END marker. Unlike
+    clean_gutenberg_text, a text with a START but no END marker keeps only the part
+    after START, since the end of the stream cannot be known in advance.
+    Args:
+        blocks (iterable[str]): Consecutive blocks of the raw text.
+        header_limit (int): Characters searched for the START marker.
+    Yields:
+        str: Consecutive blocks of the main content.
+    """
+    start_marker = re.compile(START_MARKER, re.IGNORECASE)
+    end_marker = re.compile(END_MARKER, re.IGNORECASE)
+    blocks = iter(blocks)
+
+    buffer = ""
+    for block in blocks:
+        buffer = (buffer + block) if buffer else block.lstrip("\ufeff")
+        match = start_marker.search(buffer)
+        if match:
+            buffer = buffer[match.end():]
+            break
+        if len(buffer) > header_limit:
+            yield buffer
+            yield from blocks
+            return
+    else:
+        if buffer:
+            yield buffer
+        return
+
+    for block in chain([""], blocks):
+        buffer += block
+        match = end_marker.search(buffer)
+        if match:
+            if match.start():
+                yield buffer[:match.start()]
+            return
+        if len(buffer) > _MARKER_OVERLAP:
+            yield buffer[:-_MARKER_OVERLAP]
+            buffer = buffer[-_MARKER_OVERLAP:]
+    if buffer:
+        yield buffer
+
+
+def iter_sentences(pieces, min_chars=SENTENCE_BUFFER_CHARS):
+    """
+    Splits a stream of normalized text pieces into sentences.
+
+    Pieces are joined with single spaces and buffered until `min_chars` characters are
+    available; all sentences but the last (possibly incomplete) one are then yielded,
+    and the last one is kept for the next round.
+    Args:
+        pieces (iterable[str]): Normalized text, e.g. from iter_normalized_blocks.
+        min_chars (int): Minimum buffered characters before splitting.
+    Yields:
+        str: Sentences, in order.
+    """
+    buffer = ""
+    threshold = min_chars
+    for piece in pieces:
+        buffer = f"{buffer} {piece}" if buffer else piece
+        if len(buffer) < threshold:
+            continue
+        sentences = split_sentences(buffer)
+        if len(sentences) > 1:
+            yield from sentences[:-1]
+            buffer = sentences[-1]
+        # A very long sentence is not re-split on every piece
+        threshold = len(buffer) + min_chars
+    if buffer:
+        yield from split_sentences(buffer)
+
+
+def iter_chunks(sentences, sentences_per_chunk=3):
+    """Groups a stream of sentences into chunks of `sentences_per_chunk` sentences."""
+    group = []
+    for sentence in sentences:
+        group.append(sentence)
+        if len(group) == sentences_per_chunk:
+            yield " ".join(group)
+            group = []
+    if group:
+        yield " ".join(group)
+
+
+def iter_windows(items, size):
+    """Groups a stream of items into lists of `size` items (the last one may be shorter)."""
+    window = []
+    for item in items:
+        window.append(item)
+        if len(window) == size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def stream_chunks(source, sentences_per_chunk=3, block_size=BLOCK_SIZE):
+    """
+    Streaming equivalent of get_novel -> clean_gutenberg_text -> preprocessing ->
+    chunk_by_sentences, with memory use independent of the size of the text.
+    Args:
+        source (str): Project Gutenberg URL or path to a local text file.
+        sentences_per_chunk (int): Number of sentences per chunk.
+        block_size (int): Characters read per block.
+    Yields:
+        str: Chunks of preprocessed text, in order.
+    """
+    blocks = iter_source_blocks(source, block_size)
+    normalized = iter_normalized_blocks(iter_gutenberg_body(blocks))
+    return iter_chunks(iter_sentences(normalized), sentences_per_chunk)
@@ -0,0 +1,103 @@
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+from emotionplot.params import JOB_WORKERS, MAX_FINISHED_JOBS
+
+
+class Job:
+    """State of one background pipeline run, updated by the scheduler thread."""
+
+    def __init__(self, key, params):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.params = params
+        self.status = "queued"
+        self.stage = None
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+
+    def update_progress(self, stage, done, total):
+        self.stage = stage
+        self.progress[stage] = {"done": done, "total": total}
+        self.updated_at = time.time()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "params": self.params,
+            "stage": self.stage,
+            "progress": dict(self.progress),
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class JobManager:
+    """
+    Runs pipeline jobs on a background thread pool.
+
+    Jobs are deduplicated by key: submitting a key that is already queued or
+    running returns the existing job instead of starting a second computation.
+    Finished jobs are kept for polling, up to `max_finished` of them.
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, max_finished=MAX_FINISHED_JOBS):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="emotionplot-job")
+        self.max_finished = max_finished
+        self._jobs = {}
+        self._in_flight = {}
+        self._finished = OrderedDict()
+        self._lock = Lock()
+
+    def submit(self, key, fn, **params):
+        """
+        Schedules fn(progress=..., **params) unless an identical job is in flight.
+        Args:
+            key (hashable): Deduplication key; identical keys share one job.
+            fn (callable): Pipeline function accepting a `progress` callback.
+            **params: Keyword arguments for fn, also reported in the job status.
+        Returns:
+            Job: The new or already running job.
+        """
+        with self._lock:
+            if key in self._in_flight:
+                return self._jobs[self._in_flight[key]]
+            job = Job(key, params)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job.id
+
+        self.executor.submit(self._run, job, fn, params)
+        return job
+
+    def get(self, job_id):
+        """Returns the job with this ID, or None if it is unknown or expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, fn, params):
+        job.status = "running"
+        try:
+            job.result = fn(progress=job.update_progress, **params)
+            status = "done"
+        except Exception as e:
+            job.error = str(e)
+            status = "failed"
+
+        # A job reported finished no longer holds its key, so resubmitting it starts a new run
+        with self._lock:
+            job.status = status
+            job.updated_at = time.time()
+            self._in_flight.pop(job.key, None)
+            self._finished[job.id] = job
+            while len(self._finished) > self.max_finished:
+                expired, _ = self._finished.popitem(last=False)
+                self._jobs.pop(expired, None)
@@ -0,0 +1,218 @@
+import json
+import os
+import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import chain
+
+import numpy as np
+
+from emotionplot.processes import process_context
+from emotionplot.segmentation import _ensure_punkt
+
+# Emotions of the NRC lexicon, in column order of the count matrices
+NRC_EMOTIONS = ["fear", "anger", "anticipation", "trust", "surprise", "positive", "negative", "sadness",
+                "disgust", "joy"]
+
+# "nltk": same tokens as TextBlob(text).words, which NRCLex uses (exact NRCLex output);
+# "regex": one regex pass over a whole batch of sentences (faster, approximate on contractions)
+LEXICON_TOKENIZERS = ["nltk", "regex"]
+
+_WORD = re.compile(r"\w+(?:[-.]\w+)*")
+
+_wordnet_checked = False
+
+
+def _ensure_wordnet():
+    """Downloads the WordNet data of the lemmatizer on first use if it is not installed."""
+    global _wordnet_checked
+    if _wordnet_checked:
+        return
+    import nltk
+
+    try:
+        nltk.data.find("corpora/wordnet")
+    except LookupError:
+        nltk.download("wordnet", quiet=True)
+    _wordnet_checked = True
+
+
+def load_nrc_lexicon(path=None):
+    """
+    Returns the NRC emotion lexicon as a dict of word -> list of emotions.
+    Args:
+        path (str, optional): JSON file to read. Defaults to the lexicon shipped with nrclex.
+    """
+    if path is None:
+        import nrclex
+        directory = os.path.dirname(nrclex.__file__)
+        # nrclex 3.x ships the lexicon next to the module, 4.x in a data package
+        candidates = [os.path.join(directory, "nrc_en.json"), os.path.join(directory, "data", "nrc_en.json")]
+        path = next((candidate for candidate in candidates if os.path.exists(candidate)), candidates[0])
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=1)
+def nrclex_lemmatizes():
+    """Whether the installed nrclex looks up word lemmas (4.x, NRCLex.load_raw_text) rather than words (3.x)."""
+    try:
+        from nrclex import NRCLex
+    except ImportError:
+        return False
+    return hasattr(NRCLex, "load_raw_text")
+
+
+@lru_cache(maxsize=100_000)
+def lemmatize(word):
+    """Same as textblob.Word(word).lemmatize(), cached per word."""
+    from nltk.stem import WordNetLemmatizer
+
+    return WordNetLemmatizer().lemmatize(word, "n")
+
+
+def textblob_words(text):
+    """Returns the tokens of TextBlob(text).words, without building TextBlob objects."""
+    from nltk.tokenize import sent_tokenize, word_tokenize
+
+    words = []
+    for sentence in sent_tokenize(text):
+        for token in word_tokenize(sentence):
+            # textblob.utils.strip_punc(token, all=False), keeping clitics such as "'s"
+            stripped = token.strip().strip(string.punctuation)
+            if stripped:
+                words.append(token if token.startswith("'") else stripped)
+    return words
+
+
+def regex_words(sentences):
+    """Tokenizes a batch of sentences with one regex pass over their concatenation."""
+    text = "\n".join(sentences)
+    starts = np.cumsum([0] + [len(s) + 1 for s in sentences[:-1]])
+    matches = list(_WORD.finditer(text))
+    owners = np.searchsorted(starts, [m.start() for m in matches], side="right") - 1
+    words = [[] for _ in sentences]
+    for owner, match in zip(owners.tolist(), matches):
+        words[owner].append(match.group())
+    return words
+
+
+class LexiconIndex:
+    """
+    The NRC lexicon indexed once for batch lookups.
+
+    Each word gets an integer ID, the tuple of its emotions (in lexicon order, as
+    NRCLex reports them), a bitmask of its emotions (bit i = self.emotions[i]) and a
+    row of per-emotion counts, so that the emotion counts of many sentences are
+    computed with a few NumPy operations.
+    """
+
+    def __init__(self, lexicon):
+        extra = sorted({e for emotions in lexicon.values() for e in emotions} - set(NRC_EMOTIONS))
+        self.emotions = NRC_EMOTIONS + extra
+        column = {emotion: i for i, emotion in enumerate(self.emotions)}
+
+        self.word_ids = {}
+        self.affects = []
+        self.matrix = np.zeros((len(lexicon), len(self.emotions)), dtype=np.int32)
+        for i, (word, emotions) in enumerate(lexicon.items()):
+            self.word_ids[word] = i
+            self.affects.append(tuple(emotions))
+            for emotion in emotions:
+                self.matrix[i, column[emotion]] += 1
+        self.masks = (self.matrix > 0).astype(np.int64) @ (1 << np.arange(len(self.emotions), dtype=np.int64))
+
+    def tokenize(self, sentences, tokenizer="nltk", lemmatized=False):
+        if tokenizer == "nltk":
+            _ensure_punkt()
+            words = [textblob_words(str(sentence)) for sentence in sentences]
+        elif tokenizer == "regex":
+            words = regex_words([str(sentence) for sentence in sentences])
+        else:
+            raise ValueError(f"Invalid tokenizer: {tokenizer}. Choose from: {LEXICON_TOKENIZERS}")
+        if lemmatized:
+            _ensure_wordnet()
+            words = [[lemmatize(word) for word in sentence_words] for sentence_words in words]
+        return words
+
+    def analyze(self, sentences, tokenizer="nltk", lemmatized=False):
+        """
+        Finds the emotion words of each sentence.
+        Args:
+            sentences (list[str]): Sentences to analyze.
+            tokenizer (str): One of LEXICON_TOKENIZERS.
+            lemmatized (bool): Look up the WordNet lemma of each word, as
+                NRCLex.load_raw_text does (nrclex >= 4); NRCLex(text) (nrclex 3) does not.
+        Returns:
+            dict: 'emotions' (column names), 'counts' ((num_sentences, num_emotions) int32
+                raw counts, NRCLex's raw_emotion_scores), 'masks' (int64 bitmask of the emotions
+                present in each sentence), 'affect_words' (the matched words of each
+                sentence) and 'affect_lists' (NRCLex's affect_list of each sentence).
+        """
+        word_ids = self.word_ids
+        ids, affect_words, bounds = [], [], [0]
+        for words in self.tokenize(sentences, tokenizer, lemmatized):
+            matched = [word for word in words if word in word_ids]
+            ids.extend(word_ids[word] for word in matched)
+            affect_words.append(matched)
+            bounds.append(len(ids))
+
+        ids = np.asarray(ids, dtype=np.int64)
+        bounds = np.asarray(bounds)
+        cumulative = np.zeros((len(ids) + 1, len(self.emotions)), dtype=np.int32)
+        np.cumsum(self.matrix[ids], axis=0, out=cumulative[1:])
+        counts = cumulative[bounds[1:]] - cumulative[bounds[:-1]]
+
+        affects = self.affects
+        return {
+            "emotions": self.emotions,
+            "counts": counts,
+            "masks": (counts > 0).astype(np.int64) @ (1 << np.arange(len(self.emotions), dtype=np.int64)),
+            "affect_words": affect_words,
+            "affect_lists": [list(chain.from_iterable(affects[i] for i in ids[start:end].tolist()))
+                             for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist())],
+        }
+
+
+@lru_cache(maxsize=1)
+def get_lexicon_index():
+    """Returns the NRC lexicon index, built once per process."""
+    return LexiconIndex(load_nrc_lexicon())
+
+
+def _analyze_batch(sentences, tokenizer, lemmatized):
+    return get_lexicon_index().analyze(sentences, tokenizer, lemmatized)
+
+
+def analyze_sentences(sentences, tokenizer="nltk", lemmatized=None, workers=0, batch_size=5000):
+    """
+    Finds the NRC emotion words of each sentence (see LexiconIndex.analyze).
+    Args:
+        sentences (list[str]): Sentences to analyze.
+        tokenizer (str): One of LEXICON_TOKENIZERS.
+        lemmatized (bool, optional): Look up word lemmas (see LexiconIndex.analyze).
+            Defaults to what the installed nrclex does (see nrclex_lemmatizes).
+        workers (int): Worker processes for large corpora (0 or 1 = in-process).
+        batch_size (int): Sentences per worker task.
+    Returns:
+        dict: See LexiconIndex.analyze.
+    """
+    sentences = list(sentences)
+    if lemmatized is None:
+        lemmatized = nrclex_lemmatizes()
+    if workers <= 1 or len(sentences) <= batch_size:
+        return get_lexicon_index().analyze(sentences, tokenizer, lemmatized)
+
+    batches = [sentences[i:i + batch_size] for i in range(0, len(sentences), batch_size)]
+    context = process_context(preload=["emotionplot.lexicon"])
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        results = list(executor.map(_analyze_batch, batches, [tokenizer] * len(batches),
+                                    [lemmatized] * len(batches)))
+    return {
+        "emotions": results[0]["emotions"],
+        "counts": np.concatenate([r["counts"] for r in results]),
+        "masks": np.concatenate([r["masks"] for r in results]),
+        "affect_words": [words for r in results for words in r["affect_words"]],
+        "affect_lists": [affects for r in results for affects in r["affect_lists"]],
+    }
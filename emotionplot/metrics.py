@@ -0,0 +1,230 @@
+import cProfile
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from emotionplot.params import PROFILE_DIR
+
+# Help text of each metric, in the order they are rendered
+METRICS = {
+    "emotionplot_stage_seconds": ("summary", "Time spent in each pipeline stage"),
+    "emotionplot_fetch_bytes_total": ("counter", "Bytes of raw text downloaded"),
+    "emotionplot_sentences_total": ("counter", "Sentences split from preprocessed texts"),
+    "emotionplot_chunks_total": ("counter", "Chunks built for inference"),
+    "emotionplot_tokens_total": ("counter", "Model input tokens, without padding"),
+    "emotionplot_padded_tokens_total": ("counter", "Model input tokens, including batch padding"),
+    "emotionplot_batch_size": ("summary", "Rows per forward pass"),
+    "emotionplot_cache_lookups_total": ("counter", "Cache lookups by cache, tier and result"),
+    "emotionplot_model_load_seconds": ("summary", "Time spent loading models"),
+    "emotionplot_cascade_chunks_total": ("counter", "Chunks screened and escalated by the cascade model"),
+    "emotionplot_scheduler_wait_seconds": ("summary", "Time from queuing a chunk in the inference scheduler to its result"),
+    "emotionplot_scheduler_rejected_total": ("counter", "Requests rejected by the inference scheduler's backpressure"),
+}
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and summaries (sum and count), rendered in the Prometheus
+    text exposition format.
+
+    Values are per process: inference worker processes keep their own counters.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._summaries = {}
+        self._lock = Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            total, count = self._summaries.get(key, (0.0, 0))
+            self._summaries[key] = (total + value, count + 1)
+
+    def snapshot(self):
+        """Returns {name: [(labels, value)]} for counters and {name: [(labels, sum, count)]} for summaries."""
+        with self._lock:
+            counters, summaries = {}, {}
+            for (name, labels), value in self._counters.items():
+                counters.setdefault(name, []).append((dict(labels), value))
+            for (name, labels), (total, count) in self._summaries.items():
+                summaries.setdefault(name, []).append((dict(labels), total, count))
+            return counters, summaries
+
+    def render(self):
+        """Returns all metrics in the Prometheus text format."""
+        counters, summaries = self.snapshot()
+        lines = []
+        for name in list(METRICS) + sorted((set(counters) | set(summaries)) - set(METRICS)):
+            kind, help_text = METRICS.get(name, ("summary" if name in summaries else "counter", ""))
+            if name not in counters and name not in summaries:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in counters.get(name, []):
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for labels, total, count in summaries.get(name, []):
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+registry = MetricsRegistry()
+
+# Per-request breakdown collected by request_timings(), if one is active in this context
+_timings = ContextVar("emotionplot_timings", default=None)
+
+
+_timings_lock = Lock()
+
+
+def inc(name, value=1, **labels):
+    """Increments a counter, and the matching entry of the active request breakdown."""
+    registry.inc(name, value, **labels)
+    count_in(_timings.get(), name, value, **labels)
+
+
+def current_timings():
+    """Returns the breakdown of the active request_timings() in this context, or None."""
+    return _timings.get()
+
+
+def count_in(timings, name, value=1, **labels):
+    """
+    Adds to a counter of a request breakdown (from current_timings()) only, for work
+    done on behalf of that request in another thread or process, whose process-wide
+    metrics are counted where it runs.
+    """
+    if timings is None:
+        return
+    counter = ".".join([name.removeprefix("emotionplot_").removesuffix("_total"), *map(str, labels.values())])
+    merge_counters(timings, {counter: value})
+
+
+def merge_counters(timings, counters):
+    """Adds the 'counters' of another request breakdown (e.g. from a worker process) to `timings`."""
+    if timings is None:
+        return
+    with _timings_lock:
+        for counter, value in counters.items():
+            timings["counters"][counter] = timings["counters"].get(counter, 0) + value
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+@contextmanager
+def span(stage):
+    """Times a pipeline stage into emotionplot_stage_seconds and the active request breakdown."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        registry.observe("emotionplot_stage_seconds", elapsed, stage=stage)
+        timings = _timings.get()
+        if timings is not None:
+            timings["stages"][stage] = timings["stages"].get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def request_timings():
+    """
+    Collects the stage timings (seconds) and counters of the code run in this context.
+
+    The breakdown follows the context, not the work: threads and processes that
+    score chunks for the request add their token counts to it explicitly (the
+    inference scheduler and worker pool do, see count_in and merge_counters).
+    Background jobs run outside any request and have no breakdown.
+    Yields:
+        dict: {"stages": {...}, "counters": {...}, "total": seconds}, filled in as the
+            code runs; "total" is set on exit.
+    """
+    timings = {"stages": {}, "counters": {}, "total": 0.0}
+    token = _timings.set(timings)
+    start = time.perf_counter()
+    try:
+        yield timings
+    finally:
+        timings["total"] = time.perf_counter() - start
+        _timings.reset(token)
+
+
+def server_timing(timings):
+    """Formats request_timings() stages as an HTTP Server-Timing header value (milliseconds)."""
+    entries = [f"{stage};dur={1000 * seconds:.1f}" for stage, seconds in timings["stages"].items()]
+    return ", ".join(entries + [f"total;dur={1000 * timings['total']:.1f}"])
+
+
+PROFILERS = ["cprofile", "torch"]
+
+# Only one profiler can be active per process: profiled requests run one at a time
+_profile_lock = Lock()
+
+
+@contextmanager
+def profile(kind="cprofile", directory=PROFILE_DIR, name="request"):
+    """
+    Profiles the code run in this context with cProfile or the torch profiler.
+
+    cProfile statistics are written to DIRECTORY/NAME-TIMESTAMP-ID.prof (open them
+    with pstats or snakeviz), where ID is unique per profile; torch profiles are
+    written as a Chrome trace (.json). Concurrent profiles wait for each other, since
+    a process can only run one profiler at a time.
+    Yields:
+        dict: {"path": ...} with the output file, set on exit.
+    """
+    if kind not in PROFILERS:
+        raise ValueError(f"Invalid profiler: {kind}. Choose from: {PROFILERS}")
+    os.makedirs(directory, exist_ok=True)
+    with _profile_lock:
+        with _profile(kind, directory, name) as result:
+            yield result
+
+
+@contextmanager
+def _profile(kind, directory, name):
+    result = {"path": None}
+    stem = os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+
+    if kind == "cprofile":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            result["path"] = f"{stem}.prof"
+            profiler.dump_stats(result["path"])
+        return
+
+    import torch
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    with torch.profiler.profile(activities=activities, record_shapes=True) as profiler:
+        try:
+            yield result
+        finally:
+            result["path"] = f"{stem}.json"
+    profiler.export_chrome_trace(result["path"])
@@ -1,88 +1,553 @@
+import time
+from collections import OrderedDict
+from threading import Lock
 
+import numpy as np
 import torch
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import nltk
+from transformers import AutoConfig, AutoTokenizer
 
-nltk.download('punkt')
+from emotionplot.backends import BACKENDS, load_model
+from emotionplot.metrics import inc, observe
+from emotionplot.params import MAX_LOADED_MODELS, INFERENCE_BACKEND, CASCADE_MIN_CONFIDENCE, CASCADE_MIN_MARGIN
 
 # Model names
 FAST_MODEL = "joeddav/distilbert-base-uncased-go-emotions-student"
 ACCURATE_MODEL = "SamLowe/roberta-base-go_emotions"
 
-# Load both tokenizers and models
-tokenizers = {
-    "fast": AutoTokenizer.from_pretrained(FAST_MODEL),
-    "accurate": AutoTokenizer.from_pretrained(ACCURATE_MODEL)
+MODEL_NAMES = {
+    "fast": FAST_MODEL,
+    "accurate": ACCURATE_MODEL
 }
 
-models = {
-    "fast": AutoModelForSequenceClassification.from_pretrained(FAST_MODEL),
-    "accurate": AutoModelForSequenceClassification.from_pretrained(ACCURATE_MODEL)
-}
+# "cascade" scores every chunk with the first (cheap) model and rescores with the second one
+# only the chunks where the first is unsure (see predict_emotions)
+CASCADE = ("fast", "accurate")
+MODEL_TYPES = [*MODEL_NAMES, "cascade"]
 
-# Move models to device
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-for model in models.values():
-    model.to(device).eval()
 
-# Label maps (identical between the two)
-id2label = models["fast"].config.id2label
 
-def predict_emotions(df, text_column="chunk", top_k=3, batch_size=32, model_type="accurate"):
-    print(f"[predict_emotions] Using model: {model_type}")
+class ModelRegistry:
+    """
+    Loads tokenizers and models the first time they are requested.
 
+    Tokenizers are small and stay loaded. Models are keyed by (model_type, backend)
+    and at most `max_models` of them are kept in memory; when a new model is needed,
+    the least recently used one is evicted.
     """
-    Predict emotions in a DataFrame using a specified model.
+
+    def __init__(self, model_names, max_models=0):
+        self.model_names = dict(model_names)
+        self.max_models = max_models
+        self._tokenizers = {}
+        self._configs = {}
+        self._factories = {}
+        self._models = OrderedDict()
+        self._lock = Lock()
+
+    def register(self, model_type, tokenizer, config, model_factory, name=None):
+        """
+        Registers a model built in process instead of loaded from the Hugging Face hub
+        (e.g. the stand-in models of emotionplot.standin). Replaces any loaded model
+        of this type.
+        Args:
+            model_type (str): Model type the model is served under.
+            tokenizer: Tokenizer returned by get_tokenizer.
+            config: Model config returned by get_config (labels in `id2label`).
+            model_factory (callable): Called as model_factory(backend) to build the model.
+            name (str, optional): Name reported in model_names.
+        """
+        with self._lock:
+            self.model_names[model_type] = name or f"registered/{model_type}"
+            self._tokenizers[model_type] = tokenizer
+            self._configs[model_type] = config
+            self._factories[model_type] = model_factory
+            for key in [key for key in self._models if key[0] == model_type]:
+                del self._models[key]
+
+    def _check(self, model_type):
+        if model_type not in self.model_names:
+            raise KeyError(f"Invalid model_type: {model_type}. Choose from: {list(self.model_names.keys())}")
+
+    def get_tokenizer(self, model_type):
+        self._check(model_type)
+        with self._lock:
+            if model_type not in self._tokenizers:
+                self._tokenizers[model_type] = AutoTokenizer.from_pretrained(self.model_names[model_type])
+            return self._tokenizers[model_type]
+
+    def get_config(self, model_type):
+        self._check(model_type)
+        with self._lock:
+            if model_type not in self._configs:
+                self._configs[model_type] = AutoConfig.from_pretrained(self.model_names[model_type])
+            return self._configs[model_type]
+
+    def get_model(self, model_type, backend="torch"):
+        self._check(model_type)
+        key = (model_type, backend)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            print(f"[ModelRegistry] Loading model: {model_type} ({backend})")
+            start = time.perf_counter()
+            if model_type in self._factories:
+                model = self._factories[model_type](backend)
+            else:
+                model = load_model(self.model_names[model_type], backend, device)
+            observe("emotionplot_model_load_seconds", time.perf_counter() - start, model=model_type, backend=backend)
+            self._models[key] = model
+
+            while self.max_models and len(self._models) > self.max_models:
+                evicted, _ = self._models.popitem(last=False)
+                print(f"[ModelRegistry] Evicted model: {evicted}")
+            return model
+
+    def loaded_models(self):
+        """Returns the (model_type, backend) pairs currently in memory, least recently used first."""
+        with self._lock:
+            return list(self._models.keys())
+
+
+registry = ModelRegistry(MODEL_NAMES, max_models=MAX_LOADED_MODELS)
+
+
+def get_tokenizer(model_type):
+    return registry.get_tokenizer(model_type)
+
+
+def get_model(model_type, backend=None):
+    return registry.get_model(model_type, backend or INFERENCE_BACKEND)
+
+
+def get_id2label(model_type):
+    # Cascade results are in the label order of its final model
+    return registry.get_config(CASCADE[1] if model_type == "cascade" else model_type).id2label
+
+
+def input_model(model_type):
+    """Returns the model whose tokenizer builds the pre-tokenized inputs of `model_type`."""
+    return CASCADE[0] if model_type == "cascade" else model_type
+
+
+def model_key(model_type):
+    """Returns the name of a model's results in cache keys (cascade results depend on its thresholds)."""
+    if model_type == "cascade":
+        return f"cascade-conf{CASCADE_MIN_CONFIDENCE:g}-margin{CASCADE_MIN_MARGIN:g}"
+    return model_type
+
+
+def _length_bucketed_batches(lengths, max_tokens=8192, max_batch_size=64):
+    """
+    Groups sequence indices into batches of similar length under a token budget.
     Args:
-        df (pd.DataFrame): DataFrame containing text data.
-        text_column (str): Column name containing the text to analyze.
-        top_k (int): Number of top emotions to return.
-        batch_size (int): Batch size for processing.
+        lengths (list[int]): Token length of each sequence.
+        max_tokens (int): Maximum padded tokens (rows x longest row) per batch.
+        max_batch_size (int): Maximum number of rows per batch.
+    Returns:
+        list[list[int]]: Batches of indices into `lengths`, shortest sequences first.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches = []
+    batch, batch_max = [], 0
+
+    for idx in order:
+        longest = max(batch_max, lengths[idx])
+        if batch and (longest * (len(batch) + 1) > max_tokens or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch, longest = [], lengths[idx]
+        batch.append(idx)
+        batch_max = longest
+
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _forward(model, inputs, backend):
+    # Quantized and ONNX Runtime models only run on CPU
+    inputs = {k: v.to(device if backend == "torch" else "cpu") for k, v in inputs.items()}
+    with torch.no_grad():
+        outputs = model(**inputs)
+    return torch.nn.functional.softmax(outputs.logits, dim=-1).cpu()
+
+
+def _score_batch(tokenizer, model, features, backend):
+    inputs = tokenizer.pad(features, return_tensors="pt")
+    inc("emotionplot_tokens_total", int(inputs["attention_mask"].sum()))
+    inc("emotionplot_padded_tokens_total", inputs["input_ids"].numel())
+    observe("emotionplot_batch_size", len(features))
+    return _forward(model, inputs, backend)
+
+
+def predict_batch(input_ids, model_type="accurate", backend=None):
+    """
+    Scores pre-tokenized texts in a single forward pass.
+    Args:
+        input_ids (list[list[int]]): Token IDs of each text, with special tokens.
         model_type (str): Model type to use ("fast" or "accurate").
+        backend (str, optional): Inference backend. Defaults to INFERENCE_BACKEND.
     Returns:
-        pd.DataFrame: DataFrame with predicted emotions.
+        torch.Tensor: Probabilities of shape (len(input_ids), num_labels).
     """
-    if model_type not in models:
-        raise KeyError(f"Invalid model_type: {model_type}. Choose from: {list(models.keys())}")
+    backend = backend or INFERENCE_BACKEND
+    model = get_model(model_type, backend)
+    return _score_batch(get_tokenizer(model_type), model, [{"input_ids": ids} for ids in input_ids], backend)
 
-    model = models[model_type]
-    tokenizer = tokenizers[model_type]
 
-    texts = df[text_column].tolist()
-    all_probs = []
-
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i+batch_size]
-        inputs = tokenizer(
-            batch,
-            return_tensors="pt",
-            truncation=True,
-            padding=True,
-            max_length=512
+def predict_probs(texts, model_type="accurate", batch_size=32, max_tokens=8192, batching="bucketed",
+                  input_ids=None, backend=None, progress_callback=None):
+    """
+    Computes the emotion probability matrix for a list of texts.
+    Args:
+        texts (list[str]): Texts to classify.
+        model_type (str): Model type to use ("fast" or "accurate").
+        batch_size (int): Maximum number of texts per forward pass.
+        max_tokens (int): Padded token budget per batch (bucketed batching only).
+        batching (str): "bucketed" to batch texts of similar length by token budget,
+            "fixed" to run fixed slices of `batch_size` texts in document order.
+        input_ids (list[list[int]], optional): Pre-tokenized inputs for each text
+            (see emotionplot.tokenization.build_chunk_inputs). When given, the texts
+            are not tokenized again.
+        backend (str, optional): Inference backend ("torch", "int8" or "onnx").
+            Defaults to INFERENCE_BACKEND from emotionplot.params.
+        progress_callback (callable, optional): Called as progress_callback(done, total)
+            after each batch, with the number of texts scored so far.
+    Returns:
+        torch.Tensor: Probabilities of shape (len(texts), num_labels), in input order.
+    """
+    if batching not in ("bucketed", "fixed"):
+        raise ValueError(f"Invalid batching: {batching}. Choose from: ['bucketed', 'fixed']")
+    backend = backend or INFERENCE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid backend: {backend}. Choose from: {BACKENDS}")
+
+    tokenizer = get_tokenizer(model_type)
+    model = get_model(model_type, backend)
+    num_labels = model.config.num_labels
+
+    if not texts:
+        return torch.empty((0, num_labels))
+
+    if input_ids is None:
+        # Tokenize once without padding; each batch is padded only to its own longest row
+        encodings = tokenizer(texts, truncation=True, max_length=512)
+    else:
+        encodings = {"input_ids": input_ids}
+    features = [{k: encodings[k][i] for k in encodings.keys()} for i in range(len(texts))]
+
+    if batching == "fixed":
+        batches = [list(range(i, min(i + batch_size, len(texts)))) for i in range(0, len(texts), batch_size)]
+    else:
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        batches = _length_bucketed_batches(lengths, max_tokens, batch_size)
+
+    probs = torch.empty((len(texts), num_labels))
+    done = 0
+    for batch in batches:
+        probs[batch] = _score_batch(tokenizer, model, [features[i] for i in batch], backend)
+        done += len(batch)
+        if progress_callback is not None:
+            progress_callback(done, len(texts))
+
+    return probs
+
+
+def top_k_indices(probs, top_k=3):
+    """
+    Returns the indices and scores of the top-k labels of each row, best first.
+
+    Uses np.argpartition on the whole matrix, then sorts only the k selected columns.
+    Args:
+        probs (np.ndarray | torch.Tensor): Probabilities of shape (num_texts, num_labels).
+        top_k (int): Number of labels per row.
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Indices and scores, both of shape (num_texts, top_k).
+    """
+    probs = probs.numpy() if isinstance(probs, torch.Tensor) else np.asarray(probs)
+    top = np.argpartition(-probs, top_k - 1, axis=1)[:, :top_k]
+    scores = np.take_along_axis(probs, top, axis=1)
+    order = np.argsort(-scores, axis=1, kind="stable")
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+
+def top_k_emotions(probs, id2label, top_k=3):
+    """
+    Formats the top-k emotions of each row of a probability matrix.
+    Args:
+        probs (np.ndarray | torch.Tensor): Probabilities of shape (num_texts, num_labels).
+        id2label (dict): Maps label indices to emotion names.
+        top_k (int): Number of top emotions to return per row.
+    Returns:
+        tuple[list[str], list[dict]]: The top-1 label of each row, and a dict of
+            the top-k labels to their rounded scores.
+    """
+    if len(probs) == 0:
+        return [], []
+    indices, scores = top_k_indices(probs, top_k)
+
+    top_emotions = [
+        {id2label[i]: round(score, 3) for i, score in zip(row_indices, row_scores)}
+        for row_indices, row_scores in zip(indices.tolist(), scores.tolist())
+    ]
+    predicted_labels = [id2label[row[0]] for row in indices.tolist()]
+    return predicted_labels, top_emotions
+
+
+def _predict_with_cache(texts, input_ids, model_type, backend, chunk_cache, predict, progress_callback=None):
+    """
+    Looks texts up in a chunk probability cache and runs `predict` only on the unique misses.
+
+    Fresh rows go through the cache's float16 precision as well, so results do not
+    depend on whether a chunk was cached.
+    """
+    if chunk_cache is None:
+        return predict(texts, input_ids, progress_callback)
+
+    backend = backend or INFERENCE_BACKEND
+    probs, missing = chunk_cache.lookup(texts, model_type, backend)
+    if not missing:
+        if progress_callback is not None:
+            progress_callback(len(texts), len(texts))
+        return torch.from_numpy(probs)
+
+    first_index = {}
+    for i in missing:
+        first_index.setdefault(texts[i], i)
+    unique = list(first_index.values())
+    hits = len(texts) - len(missing)
+
+    def progress(done, total):
+        if progress_callback is not None:
+            progress_callback(hits + done * len(missing) // total, len(texts))
+
+    fresh = predict([texts[i] for i in unique],
+                    [input_ids[i] for i in unique] if input_ids is not None else None,
+                    progress).numpy().astype(np.float16)
+    chunk_cache.store_many([texts[i] for i in unique], model_type, backend, fresh)
+
+    if probs is None:
+        probs = np.zeros((len(texts), fresh.shape[1]), dtype=np.float32)
+    row_of = {texts[i]: row for row, i in enumerate(unique)}
+    for i in missing:
+        probs[i] = fresh[row_of[texts[i]]]
+    return torch.from_numpy(probs)
+
+
+def align_labels(probs, source_model, target_model):
+    """Reorders the probability columns of `source_model` into the label order of `target_model`."""
+    source = {label: i for i, label in get_id2label(source_model).items()}
+    target = get_id2label(target_model)
+    if set(source) != set(target.values()):
+        raise ValueError(f"Models '{source_model}' and '{target_model}' have different labels")
+    columns = [source[target[i]] for i in range(len(target))]
+    if columns == list(range(len(columns))):
+        return probs
+    return probs[:, columns]
+
+
+def cascade_escalations(probs, min_confidence=CASCADE_MIN_CONFIDENCE, min_margin=CASCADE_MIN_MARGIN):
+    """
+    Returns the indices of the rows a cascade rescores with its final model: those whose
+    top-1 probability is below `min_confidence` or whose margin between the top-1 and
+    top-2 probabilities is below `min_margin`.
+    """
+    if len(probs) == 0:
+        return np.zeros(0, dtype=np.int64)
+    _, scores = top_k_indices(probs, 2)
+    return np.flatnonzero((scores[:, 0] < min_confidence) | (scores[:, 0] - scores[:, 1] < min_margin))
+
+
+def _predict_cascade(texts, input_ids, predict_with, backend, chunk_cache, progress_callback=None,
+                     min_confidence=CASCADE_MIN_CONFIDENCE, min_margin=CASCADE_MIN_MARGIN):
+    """
+    Scores texts with the first model of CASCADE and rescores the uncertain rows (see
+    cascade_escalations) with the second. `input_ids` are those of the first model;
+    the escalated texts are tokenized for the second. Each model has its own entries
+    in the chunk cache.
+    Returns:
+        tuple[torch.Tensor, np.ndarray]: Probabilities in the label order of the second
+            model, and the indices of the escalated rows.
+    """
+    screen, final = CASCADE
+    total = len(texts)
+
+    # Screening is reported as the first half of the work, escalations as the second half
+    def screen_progress(done, _):
+        if progress_callback is not None:
+            progress_callback(done // 2, total)
+
+    probs = _predict_with_cache(texts, input_ids, screen, backend, chunk_cache, predict_with(screen), screen_progress)
+    probs = align_labels(probs, screen, final)
+    escalated = cascade_escalations(probs, min_confidence, min_margin)
+    inc("emotionplot_cascade_chunks_total", total, stage="screened")
+    inc("emotionplot_cascade_chunks_total", len(escalated), stage="escalated")
+
+    if len(escalated):
+        def final_progress(done, escalated_total):
+            if progress_callback is not None:
+                progress_callback(total // 2 + done * (total - total // 2) // escalated_total, total)
+
+        probs[torch.as_tensor(escalated)] = _predict_with_cache(
+            [texts[i] for i in escalated], None, final, backend, chunk_cache, predict_with(final), final_progress
         )
-        inputs = {k: v.to(device) for k, v in inputs.items()}
+    if progress_callback is not None:
+        progress_callback(total, total)
+    return probs, escalated
 
-        with torch.no_grad():
-            outputs = model(**inputs)
 
-        probs = torch.nn.functional.softmax(outputs.logits, dim=-1)
-        all_probs.append(probs.cpu())
+def iter_emotion_records(texts, model_type="accurate", top_k=3, window=256, input_ids=None,
+                         backend=None, chunk_cache=None, pool=None, batch_size=32, max_tokens=8192,
+                         batching="bucketed", cascade_min_confidence=CASCADE_MIN_CONFIDENCE,
+                         cascade_min_margin=CASCADE_MIN_MARGIN, stats=None):
+    """
+    Scores texts window by window and yields their records as soon as each window is done.
+
+    Windows are contiguous, so records come out in document order; inside a window,
+    the texts are batched as in predict_emotions.
+    Args:
+        texts (list[str]): Texts to classify.
+        model_type (str): Model type to use ("fast", "accurate" or "cascade").
+        top_k (int): Number of top emotions per record.
+        window (int): Number of texts scored before yielding.
+        input_ids (list[list[int]], optional): Pre-tokenized inputs for each text
+            (for "cascade", those of its first model).
+        backend (str, optional): Inference backend ("torch", "int8" or "onnx").
+        chunk_cache (emotionplot.chunk_cache.ChunkProbCache, optional): Cache of
+            probabilities by chunk text; only uncached chunks are scored.
+        pool (optional): An InferenceScheduler or InferencePool to run the forward
+            passes on, as in predict_emotions.
+        batch_size, max_tokens, batching: See predict_probs (the pool ignores batching).
+        cascade_min_confidence, cascade_min_margin: Cascade thresholds, see predict_emotions.
+        stats (dict, optional): Cascade only: its "escalated" count is increased by the
+            escalated chunks of each window before the window is yielded.
+    Yields:
+        list[dict]: Records with 'chunk', 'Predicted_Emotion' and 'Top_3_Emotions' keys.
+    """
+    def predict_with(model):
+        def predict(texts, input_ids, progress_callback):
+            if pool is not None:
+                return pool.predict_probs(texts, model, batch_size=batch_size, max_tokens=max_tokens,
+                                          input_ids=input_ids, backend=backend)
+            return predict_probs(texts, model, batch_size=batch_size, max_tokens=max_tokens,
+                                 batching=batching, input_ids=input_ids, backend=backend)
+        return predict
 
-    probs = torch.cat(all_probs, dim=0)
+    id2label = get_id2label(model_type)
+    for start in range(0, len(texts), window):
+        window_texts = texts[start:start+window]
+        window_ids = input_ids[start:start+window] if input_ids is not None else None
+        if model_type == "cascade":
+            probs, escalated = _predict_cascade(window_texts, window_ids, predict_with, backend, chunk_cache,
+                                                min_confidence=cascade_min_confidence,
+                                                min_margin=cascade_min_margin)
+            if stats is not None:
+                stats["escalated"] = stats.get("escalated", 0) + len(escalated)
+        else:
+            probs = _predict_with_cache(window_texts, window_ids, model_type, backend, chunk_cache,
+                                        predict_with(model_type))
+        predicted_labels, top_emotions = top_k_emotions(probs, id2label, top_k)
+        yield [
+            {"chunk": text, "Predicted_Emotion": label, "Top_3_Emotions": top}
+            for text, label, top in zip(window_texts, predicted_labels, top_emotions)
+        ]
+
+
+def predict_emotions(df, text_column="chunk", top_k=3, batch_size=32, model_type="accurate",
+                     max_tokens=8192, batching="bucketed", ids_column="input_ids", backend=None,
+                     pool=None, progress_callback=None, chunk_cache=None, return_probs=False,
+                     cascade_min_confidence=CASCADE_MIN_CONFIDENCE, cascade_min_margin=CASCADE_MIN_MARGIN):
+    print(f"[predict_emotions] Using model: {model_type}")
+
+    """
+    Predict emotions in a DataFrame using a specified model.
+    Args:
+        df (pd.DataFrame): DataFrame containing text data.
+        text_column (str): Column name containing the text to analyze.
+        top_k (int): Number of top emotions to return.
+        batch_size (int): Maximum number of chunks per batch.
+        model_type (str): Model type to use ("fast", "accurate" or "cascade"). "cascade"
+            scores every chunk with the fast model and only the uncertain ones with the
+            accurate model; the fraction of escalated chunks is set in
+            df.attrs["escalated_fraction"].
+        max_tokens (int): Padded token budget per batch when batching is "bucketed".
+        batching (str): "bucketed" (length-sorted, token-budget batches) or "fixed".
+        ids_column (str): Column with pre-tokenized input IDs (of input_model(model_type));
+            used instead of tokenizing `text_column` when present.
+        backend (str, optional): Inference backend ("torch", "int8" or "onnx").
+        pool (emotionplot.workers.InferencePool, optional): Worker pool to shard the
+            chunks across; inference runs in the calling thread when None.
+        progress_callback (callable, optional): Called as progress_callback(done, total)
+            as chunks are scored.
+        chunk_cache (emotionplot.chunk_cache.ChunkProbCache, optional): Cache of
+            probabilities by chunk text; only uncached chunks are scored.
+        return_probs (bool): Also return the full probability matrix.
+        cascade_min_confidence (float): Cascade only: escalate chunks whose top-1
+            probability from the fast model is below this.
+        cascade_min_margin (float): Cascade only: escalate chunks whose top-1 minus
+            top-2 probability from the fast model is below this.
+    Returns:
+        pd.DataFrame: DataFrame with predicted emotions, or a (DataFrame, np.ndarray)
+            tuple with the (num_chunks, num_labels) probability matrix if return_probs.
+    """
+    texts = df[text_column].tolist()
+    input_ids = df[ids_column].tolist() if ids_column in df.columns else None
 
-    top_emotions = []
-    predicted_labels = []
+    def predict_with(model):
+        def predict(texts, input_ids, progress_callback):
+            if pool is not None:
+                return pool.predict_probs(texts, model, batch_size=batch_size, max_tokens=max_tokens,
+                                          input_ids=input_ids, backend=backend,
+                                          progress_callback=progress_callback)
+            return predict_probs(texts, model, batch_size=batch_size,
+                                 max_tokens=max_tokens, batching=batching, input_ids=input_ids,
+                                 backend=backend, progress_callback=progress_callback)
+        return predict
 
-    for row in probs:
-        top_indices = torch.topk(row, top_k).indices.tolist()
-        top_scores = [round(row[i].item(), 3) for i in top_indices]
-        top_labels = [id2label[i] for i in top_indices]
+    if model_type == "cascade":
+        probs, escalated = _predict_cascade(texts, input_ids, predict_with, backend, chunk_cache, progress_callback,
+                                            cascade_min_confidence, cascade_min_margin)
+        df.attrs["escalated_fraction"] = len(escalated) / len(texts) if texts else 0.0
+    else:
+        probs = _predict_with_cache(texts, input_ids, model_type, backend, chunk_cache, predict_with(model_type),
+                                    progress_callback)
 
-        top_emotions.append(dict(zip(top_labels, top_scores)))
-        predicted_labels.append(top_labels[0])
+    predicted_labels, top_emotions = top_k_emotions(probs, get_id2label(model_type), top_k)
 
     df["Predicted_Emotion"] = predicted_labels
     df["Top_3_Emotions"] = top_emotions
 
     print("[predict_emotions] Prediction complete.")
+    if return_probs:
+        return df, probs.numpy()
     return df
+
+
+def check_backend_drift(texts, model_type="accurate", backend="int8", top_k=3, reference="torch"):
+    """
+    Compares the top-k labels of a backend against the reference (fp32) backend.
+    Args:
+        texts (list[str]): Texts to classify with both backends.
+        model_type (str): Model type to use ("fast" or "accurate").
+        backend (str): Backend under test.
+        top_k (int): Number of top labels to compare.
+        reference (str): Reference backend.
+    Returns:
+        dict: Top-1 agreement, share of texts with an identical top-k label set,
+            and the maximum absolute probability difference.
+    """
+    expected = predict_probs(texts, model_type, backend=reference)
+    actual = predict_probs(texts, model_type, backend=backend)
+
+    expected_top, _ = top_k_indices(expected, top_k)
+    actual_top, _ = top_k_indices(actual, top_k)
+    same_set = [set(e) == set(a) for e, a in zip(expected_top.tolist(), actual_top.tolist())]
+
+    return {
+        "backend": backend,
+        "top1_agreement": float((expected_top[:, 0] == actual_top[:, 0]).mean()) if len(texts) else 0.0,
+        f"top{top_k}_set_agreement": sum(same_set) / max(len(same_set), 1),
+        "max_abs_diff": (expected - actual).abs().max().item() if len(texts) else 0.0,
+    }
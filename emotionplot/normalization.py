@@ -0,0 +1,86 @@
+import re
+
+# Characters replaced by a space in preprocessing(). The original list also had the
+# three-character string '"]"', which never matched because '"' is replaced first.
+PUNCTUATION = '!"#$%&()*+-/:;<=>@\\^_'
+
+# ASCII punctuation -> space and ASCII digits -> deleted, applied to UTF-8 bytes (ASCII
+# bytes never occur inside multi-byte sequences, so this cannot corrupt other characters)
+_PUNCTUATION_TABLE = bytes.maketrans(PUNCTUATION.encode(), b" " * len(PUNCTUATION))
+_ASCII_DIGITS = b"0123456789"
+
+# Line ending and whitespace rules of clean_gutenberg_text, applied in one pass:
+# runs of 2+ newlines (\r\n counted as one) -> blank line, \r\n -> \n, spaces/tabs -> one space
+_WHITESPACE = re.compile(r"(?P<blank>(?:\r\n|\n){2,})|(?P<crlf>\r\n)|[ \t]+")
+
+
+def normalize_text(content):
+    """
+    Lowercases the text, drops digits, replaces punctuation with spaces and
+    collapses whitespace.
+
+    Digits and punctuation are handled by a single bytes.translate pass over the
+    UTF-8 encoded text (much faster than str.translate on non-ASCII text); the rare
+    non-ASCII digits are removed beforehand. Produces exactly the same output as the
+    original multi-pass preprocessing().
+    Args:
+        content (str): The text to normalize.
+    Returns:
+        str: The normalized text with words separated by single spaces.
+    """
+    content = content.lower()
+    if not content.isascii():
+        for char in [c for c in set(content) if c.isdigit() and not c.isascii()]:
+            content = content.replace(char, "")
+
+    data = content.encode("utf-8", "surrogatepass").translate(_PUNCTUATION_TABLE, _ASCII_DIGITS)
+    return " ".join(data.decode("utf-8", "surrogatepass").split())
+
+
+def iter_normalized_blocks(blocks):
+    """
+    Streaming version of normalize_text over an iterable of text blocks.
+
+    Each block is cut after its last whitespace character and the remainder is
+    carried over, so words (and context-dependent lowercasing) never straddle two
+    blocks. Joining the yielded pieces with single spaces gives normalize_text of
+    the concatenated blocks.
+    Args:
+        blocks (iterable[str]): Consecutive pieces of the text.
+    Yields:
+        str: Normalized pieces, without leading or trailing spaces.
+    """
+    carry = ""
+    for block in blocks:
+        block = carry + block
+        cut = max(block.rfind(c) for c in (" ", "\n", "\t", "\r"))
+        if cut < 0:
+            carry = block
+            continue
+        carry = block[cut + 1:]
+        normalized = normalize_text(block[:cut + 1])
+        if normalized:
+            yield normalized
+    normalized = normalize_text(carry)
+    if normalized:
+        yield normalized
+
+
+def _replace_whitespace(match):
+    if match.lastgroup == "blank":
+        return "\n\n"
+    if match.lastgroup == "crlf":
+        return "\n"
+    return " "
+
+
+def normalize_whitespace(content):
+    """
+    Unifies line endings, collapses blank lines and spaces/tabs, and strips the text,
+    in a single regex pass (same result as the former four-pass version).
+    Args:
+        content (str): The text to normalize.
+    Returns:
+        str: The text with normalized whitespace.
+    """
+    return _WHITESPACE.sub(_replace_whitespace, content).strip()
@@ -0,0 +1,79 @@
+import os
+
+##################  VARIABLES  ##################
+# Maximum number of models kept in memory at once (least recently used are evicted, 0 = no limit)
+MAX_LOADED_MODELS = int(os.environ.get("MAX_LOADED_MODELS", "2"))
+
+# Default inference backend: "torch" (fp32), "int8" (dynamic quantization) or "onnx" (ONNX Runtime)
+INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "torch")
+
+# Directory for exported and downloaded model artifacts
+MODELS_DIR = os.environ.get("MODELS_DIR", "models")
+
+# Inference worker processes per API process (0 = run inference in the request thread)
+INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0"))
+
+# Torch threads per inference worker (0 = split the CPU cores evenly between workers)
+THREADS_PER_WORKER = int(os.environ.get("THREADS_PER_WORKER", "0"))
+
+# Background threads running /analyze/jobs pipelines, and finished jobs kept for polling
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+MAX_FINISHED_JOBS = int(os.environ.get("MAX_FINISHED_JOBS", "100"))
+
+# Result cache tiers: in-process LRU (bytes), optional local directory, and remote store ("gcs", "fs" or "none")
+RESULT_CACHE_MEMORY_BYTES = int(os.environ.get("RESULT_CACHE_MEMORY_BYTES", str(256 * 1024 * 1024)))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", "")
+RESULT_CACHE_DISK_BYTES = int(os.environ.get("RESULT_CACHE_DISK_BYTES", str(2 * 1024 ** 3)))
+RESULT_CACHE_REMOTE = os.environ.get("RESULT_CACHE_REMOTE", "gcs")
+RESULT_CACHE_FS_ROOT = os.environ.get("RESULT_CACHE_FS_ROOT", "outputs/remote_cache")
+
+# Content-addressed cache of per-chunk probabilities: in-process bytes limit and optional local directory
+CHUNK_CACHE_MEMORY_BYTES = int(os.environ.get("CHUNK_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+CHUNK_CACHE_DIR = os.environ.get("CHUNK_CACHE_DIR", "")
+
+# Directory for per-book probability matrix artifacts ("" = do not write them), and the size beyond which
+# the least recently used artifacts are removed (0 = no limit)
+ARTIFACTS_DIR = os.environ.get("ARTIFACTS_DIR", "outputs/artifacts")
+ARTIFACTS_MAX_BYTES = int(os.environ.get("ARTIFACTS_MAX_BYTES", str(5 * 1024 ** 3)))
+
+# Raw text fetching: local compressed store and its size limit (0 = no limit), optional offline mirror,
+# timeouts and offline mode
+RAW_TEXT_DIR = os.environ.get("RAW_TEXT_DIR", "outputs/raw_texts")
+RAW_TEXT_MAX_BYTES = int(os.environ.get("RAW_TEXT_MAX_BYTES", str(1024 ** 3)))
+GUTENBERG_MIRROR_DIR = os.environ.get("GUTENBERG_MIRROR_DIR", "")
+FETCH_TIMEOUT = float(os.environ.get("FETCH_TIMEOUT", "30"))
+FETCH_OFFLINE = os.environ.get("FETCH_OFFLINE", "0") == "1"
+
+# Sentence segmenter ("punkt" or "regex") and worker processes for large texts (0 = in-process)
+SEGMENTER = os.environ.get("SEGMENTER", "punkt")
+SEGMENTER_WORKERS = int(os.environ.get("SEGMENTER_WORKERS", "0"))
+
+# Per-request profiling (?profile=cprofile|torch on /analyze/) is off unless enabled; profiles go to PROFILE_DIR
+ENABLE_PROFILING = os.environ.get("ENABLE_PROFILING", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "outputs/profiles")
+
+# Per-book intermediate results (preprocessed text, sentence spans and scores) reused across chunkings ("" = off),
+# and the size beyond which the least recently used books are removed (0 = no limit)
+BOOK_STORE_DIR = os.environ.get("BOOK_STORE_DIR", "outputs/books")
+BOOK_STORE_MAX_BYTES = int(os.environ.get("BOOK_STORE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+# Rendered word cloud PNGs cached by a hash of their word frequencies (memory bytes, optional directory),
+# and worker processes rendering several word clouds at once (0 or 1 = in-process)
+WORDCLOUD_CACHE_MEMORY_BYTES = int(os.environ.get("WORDCLOUD_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+WORDCLOUD_CACHE_DIR = os.environ.get("WORDCLOUD_CACHE_DIR", "")
+WORDCLOUD_WORKERS = int(os.environ.get("WORDCLOUD_WORKERS", "0"))
+
+# Cross-request micro-batching of inference in the API process (see emotionplot.scheduler): rows per
+# forward pass, longest wait for a fuller batch, padded token budget per batch, and queued chunks per model
+# beyond which new requests wait up to SCHEDULER_ADMISSION_TIMEOUT seconds, then are rejected
+INFERENCE_SCHEDULER = os.environ.get("INFERENCE_SCHEDULER", "0") == "1"
+SCHEDULER_MAX_BATCH_SIZE = int(os.environ.get("SCHEDULER_MAX_BATCH_SIZE", "32"))
+SCHEDULER_MAX_WAIT_MS = float(os.environ.get("SCHEDULER_MAX_WAIT_MS", "10"))
+SCHEDULER_MAX_TOKENS = int(os.environ.get("SCHEDULER_MAX_TOKENS", "8192"))
+SCHEDULER_MAX_PENDING = int(os.environ.get("SCHEDULER_MAX_PENDING", "20000"))
+SCHEDULER_ADMISSION_TIMEOUT = float(os.environ.get("SCHEDULER_ADMISSION_TIMEOUT", "30"))
+
+# Cascade model: chunks whose top-1 probability from the fast model is below CASCADE_MIN_CONFIDENCE,
+# or whose top-1 minus top-2 probability is below CASCADE_MIN_MARGIN, are rescored by the accurate model
+CASCADE_MIN_CONFIDENCE = float(os.environ.get("CASCADE_MIN_CONFIDENCE", "0.5"))
+CASCADE_MIN_MARGIN = float(os.environ.get("CASCADE_MIN_MARGIN", "0.2"))
@@ -0,0 +1,466 @@
+import json
+import os
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from emotionplot.data import get_novel, clean_gutenberg_text
+from emotionplot.preprocessing import preprocessing, split_sentences, sentence_offsets, chunk_by_sentences
+from emotionplot.model import (
+    predict_emotions, iter_emotion_records, get_id2label, top_k_emotions, input_model, model_key, get_tokenizer,
+    CASCADE
+)
+from emotionplot.workers import get_inference_pool
+from emotionplot.scheduler import get_inference_scheduler
+from emotionplot.params import INFERENCE_BACKEND, ARTIFACTS_DIR, ARTIFACTS_MAX_BYTES
+from emotionplot.artifacts import save_emotion_matrix, load_emotion_matrix, prune_store
+from emotionplot.tokenization import build_chunk_inputs, chunk_by_tokens
+from emotionplot.gcs_utils import generate_novel_id
+from emotionplot.cache import get_result_cache
+from emotionplot.chunk_cache import get_chunk_cache
+from emotionplot.ingest import stream_chunks, iter_windows
+from emotionplot.metrics import span, inc
+from emotionplot.book_store import get_book_store, book_key, aggregate_sentence_probs
+from emotionplot.lexicon import analyze_sentences
+from emotionplot.plot_word_cloud import WordFrequencyIndex
+from emotionplot.formats import encoded_blob_name, encode_result
+
+# Stages reported to the progress callback, in execution order
+STAGES = ["cache", "download", "preprocess", "chunk", "inference", "upload"]
+
+# "chunk": the model scores each chunk; "sentence-mean": chunk scores are the length-weighted
+# mean of stored sentence scores, so any chunking of an analyzed book needs no inference
+SCORING_MODES = ["chunk", "sentence-mean"]
+
+# Word frequency indexes of the most recently requested books (see get_word_frequency_index)
+MAX_WORD_INDEXES = 8
+_word_indexes = OrderedDict()
+_word_indexes_lock = Lock()
+
+
+def result_blob_name(url, sentences_per_chunk, model, backend, tokens_per_chunk=None, overlap_sentences=0,
+                     scoring="chunk"):
+    """Returns the key (GCS blob name) under which an analysis result is cached."""
+    novel_id = generate_novel_id(url)
+    if tokens_per_chunk:
+        chunking = f"tpc={tokens_per_chunk}" + (f"_overlap={overlap_sentences}" if overlap_sentences else "")
+    else:
+        chunking = f"spc={sentences_per_chunk}"
+    backend_suffix = "" if backend == "torch" else f"_backend={backend}"
+    scoring_suffix = "" if scoring == "chunk" else f"_scoring={scoring}"
+    return f"emotion_results/{novel_id}_model={model_key(model)}_{chunking}{backend_suffix}{scoring_suffix}.json"
+
+
+def artifact_dir(blob_name):
+    """Returns the local directory of the probability matrix artifact of a cached result."""
+    return os.path.join(ARTIFACTS_DIR, os.path.basename(blob_name).removesuffix(".json"))
+
+
+def _reporter(progress):
+    def report(stage, done=0, total=1):
+        if progress is not None:
+            progress(stage, done, total)
+    return report
+
+
+def _prepare_sentences(url, report):
+    """
+    Downloads, preprocesses and splits a book into sentences. The preprocessed text and
+    the sentence spans are kept in the book store, so any later analysis of the same
+    book (whatever its chunking parameters) starts directly at the chunking step.
+    Returns:
+        tuple[str, list[str], list[tuple[int, int]]]: The preprocessed text, the
+            sentences and their character spans in it.
+    """
+    store = get_book_store()
+    key = book_key(url)
+    stored = store.load_text(key) if store is not None else None
+
+    if stored is None:
+        print("Step 1: Getting novel...")
+        report("download")
+        with span("download"):
+            raw_text = get_novel(url)
+        report("download", 1)
+
+        print("Step 2: Preprocessing...")
+        report("preprocess")
+        with span("preprocess"):
+            clean_text = clean_gutenberg_text(raw_text)
+            preprocessed = preprocessing(clean_text)
+        report("preprocess", 1)
+
+        print("Step 3: Chunking...")
+        report("chunk")
+        with span("segment"):
+            sentences = split_sentences(preprocessed)
+            offsets = sentence_offsets(preprocessed, sentences)
+        if store is not None and sentences:
+            store.save_text(key, preprocessed, offsets)
+    else:
+        print("Steps 1-2: Using the stored preprocessed text...")
+        preprocessed, offsets = stored
+        offsets = [tuple(pair) for pair in offsets.tolist()]
+        report("download", 1)
+        report("preprocess", 1)
+
+        print("Step 3: Chunking...")
+        report("chunk")
+        sentences = [preprocessed[start:end] for start, end in offsets]
+
+    if not sentences:
+        raise ValueError("No sentences found.")
+    inc("emotionplot_sentences_total", len(sentences))
+    return preprocessed, sentences, offsets
+
+
+def _prepare_chunks(url, sentences_per_chunk, model, report, tokens_per_chunk=None, overlap_sentences=0):
+    """
+    Prepares the sentences of a book (see _prepare_sentences) and chunks them.
+    Returns:
+        tuple[pd.DataFrame, list[str], list[tuple[int, int]]]: The chunks, the
+            sentences and their character spans in the preprocessed text.
+    """
+    preprocessed, sentences, offsets = _prepare_sentences(url, report)
+    with span("chunk"):
+        if tokens_per_chunk:
+            # Cascade chunks are budgeted with the tokenizer of its final model, so escalated chunks are
+            # never truncated; the screening model's inputs are then tokenized from the chunk texts
+            budget_model = CASCADE[1] if model == "cascade" else model
+            df_chunks = chunk_by_tokens(preprocessed, sentences, tokens_per_chunk, overlap_sentences,
+                                        model_type=budget_model)
+            if budget_model != input_model(model):
+                df_chunks["input_ids"] = get_tokenizer(input_model(model))(
+                    df_chunks["chunk"].tolist(), truncation=True, max_length=512)["input_ids"]
+        else:
+            df_chunks = chunk_by_sentences(preprocessed, sentences_per_chunk, sentences=sentences)
+            df_chunks["input_ids"] = build_chunk_inputs(sentences, sentences_per_chunk, model_type=input_model(model))
+    inc("emotionplot_chunks_total", len(df_chunks))
+    report("chunk", 1)
+    return df_chunks, sentences, offsets
+
+
+def _sentence_mean_predictions(url, df_chunks, sentences, offsets, model, backend, report):
+    """
+    Scores chunks from sentence probabilities (see book_store.aggregate_sentence_probs).
+    The sentence probabilities are computed on the first call for a book, model and
+    backend, and then read from the book store.
+    Returns:
+        tuple[pd.DataFrame, np.ndarray]: Like predict_emotions(..., return_probs=True).
+    """
+    store = get_book_store()
+    key = book_key(url)
+    sentence_probs = store.load_sentence_probs(key, model_key(model), backend) if store is not None else None
+
+    if sentence_probs is None or len(sentence_probs) != len(sentences):
+        df_sentences = pd.DataFrame({
+            "chunk": sentences,
+            "input_ids": build_chunk_inputs(sentences, 1, model_type=input_model(model)),
+        })
+        _, sentence_probs = predict_emotions(
+            df_sentences, top_k=1, model_type=model, backend=backend, pool=get_inference_scheduler() or get_inference_pool(),
+            progress_callback=lambda done, total: report("inference", done, total),
+            chunk_cache=get_chunk_cache(), return_probs=True
+        )
+        # Same precision as the stored copy, so results do not depend on the book store state
+        sentence_probs = sentence_probs.astype(np.float16)
+        if store is not None:
+            store.save_sentence_probs(key, model_key(model), backend, sentence_probs)
+
+    probs = aggregate_sentence_probs(offsets, sentence_probs, df_chunks[["start", "end"]].to_numpy())
+    predicted_labels, top_emotions = top_k_emotions(probs, get_id2label(model), 3)
+    df_chunks["Predicted_Emotion"] = predicted_labels
+    df_chunks["Top_3_Emotions"] = top_emotions
+    return df_chunks, probs
+
+
+def _response_header(url, sentences_per_chunk, model, backend, num_chunks, tokens_per_chunk=None,
+                     overlap_sentences=0, scoring="chunk", escalated_fraction=None):
+    header = {
+        "status": "success",
+        "model_used": model,
+        "backend": backend,
+        "book_url": url,
+        "sentences_per_chunk": sentences_per_chunk,
+        "num_chunks": num_chunks,
+    }
+    if tokens_per_chunk:
+        header["tokens_per_chunk"] = tokens_per_chunk
+        header["overlap_sentences"] = overlap_sentences
+    if scoring != "chunk":
+        header["scoring"] = scoring
+    if escalated_fraction is not None:
+        header["escalated_fraction"] = round(escalated_fraction, 4)
+    return header
+
+
+def run_emotion_pipeline(url, sentences_per_chunk=3, model="accurate", backend=None, progress=None,
+                         tokens_per_chunk=None, overlap_sentences=0, scoring="chunk", use_cache=True):
+    """
+    Runs the full emotion analysis pipeline on a novel from Project Gutenberg.
+    Args:
+        url (str): The URL to the Project Gutenberg novel.
+        sentences_per_chunk (int): Number of sentences per chunk.
+        model (str): The model to use for emotion prediction: 'fast', 'accurate' or 'cascade'
+            (fast model, with the chunks it is unsure about rescored by the accurate model).
+        backend (str, optional): The inference backend. Defaults to INFERENCE_BACKEND.
+        progress (callable, optional): Called as progress(stage, done, total) when a
+            stage starts, advances and finishes; see STAGES.
+        tokens_per_chunk (int, optional): If given, chunks are packed up to this many
+            model tokens (see tokenization.chunk_by_tokens) instead of holding
+            `sentences_per_chunk` sentences.
+        overlap_sentences (int): Sentences shared by consecutive chunks in token mode.
+        scoring (str): "chunk" to run the model on each chunk, or "sentence-mean" to
+            derive chunk scores from stored sentence scores (see SCORING_MODES).
+        use_cache (bool): Return the cached result if there is one; False recomputes it.
+    Returns:
+        dict: The status, model used, book URL, sentences per chunk, number of chunks,
+            the predicted emotions and, for a cascade, the fraction of escalated chunks.
+    """
+    if scoring not in SCORING_MODES:
+        raise ValueError(f"Invalid scoring: {scoring}. Choose from: {SCORING_MODES}")
+    report = _reporter(progress)
+
+    print("Step 0: Check for cached results...")
+    report("cache")
+    backend = backend or INFERENCE_BACKEND
+    blob_name = result_blob_name(url, sentences_per_chunk, model, backend, tokens_per_chunk, overlap_sentences,
+                                 scoring)
+
+    with span("cache"):
+        cached_result = get_result_cache().get_json(blob_name) if use_cache else None
+    report("cache", 1)
+    if cached_result:
+        print("Found cached result. Returning.")
+        return cached_result
+
+    df_chunks, sentences, offsets = _prepare_chunks(url, sentences_per_chunk, model, report, tokens_per_chunk,
+                                                    overlap_sentences)
+
+    print("Step 4: Predicting emotions...")
+    report("inference", 0, len(df_chunks))
+    with span("inference"):
+        if scoring == "sentence-mean":
+            df_with_preds, probs = _sentence_mean_predictions(url, df_chunks, sentences, offsets, model, backend,
+                                                              report)
+        else:
+            df_with_preds, probs = predict_emotions(
+                df_chunks, top_k=3, model_type=model, backend=backend, pool=get_inference_scheduler() or get_inference_pool(),
+                progress_callback=lambda done, total: report("inference", done, total),
+                chunk_cache=get_chunk_cache(), return_probs=True
+            )
+
+    if ARTIFACTS_DIR:
+        id2label = get_id2label(model)
+        with span("artifacts"):
+            save_emotion_matrix(
+                artifact_dir(blob_name), probs, [id2label[i] for i in range(len(id2label))],
+                df_with_preds[["start", "end"]].to_numpy(),
+                meta={"book_url": url, "model": model, "backend": backend, "sentences_per_chunk": sentences_per_chunk,
+                      "tokens_per_chunk": tokens_per_chunk, "overlap_sentences": overlap_sentences,
+                      "scoring": scoring, "escalated_fraction": df_with_preds.attrs.get("escalated_fraction")}
+            )
+            if ARTIFACTS_MAX_BYTES:
+                prune_store(ARTIFACTS_DIR, ARTIFACTS_MAX_BYTES)
+
+    response_data = _response_header(url, sentences_per_chunk, model, backend, len(df_with_preds),
+                                     tokens_per_chunk, overlap_sentences, scoring,
+                                     df_with_preds.attrs.get("escalated_fraction"))
+    response_data["emotions"] = df_with_preds[["chunk", "Predicted_Emotion", "Top_3_Emotions"]].to_dict(orient="records")
+
+    print("Step 5: Saving result to cache...")
+    report("upload")
+    with span("upload"):
+        get_result_cache().put_json(blob_name, response_data)
+    report("upload", 1)
+
+    print("Done. Returning fresh result.")
+    return response_data
+
+
+def get_emotion_matrix(url, sentences_per_chunk=3, model="accurate", backend=None, tokens_per_chunk=None,
+                       overlap_sentences=0, scoring="chunk"):
+    """
+    Returns the probability matrix artifact of an analysis, running the pipeline first
+    if the artifact is not on this machine (e.g. the result came from the remote cache).
+    Args:
+        url (str): The URL to the Project Gutenberg novel.
+        Other arguments: see run_emotion_pipeline.
+    Returns:
+        dict: 'probs', 'offsets', 'labels' and metadata, see artifacts.load_emotion_matrix.
+    """
+    if not ARTIFACTS_DIR:
+        raise ValueError("Probability matrices are not kept on this server (ARTIFACTS_DIR is empty)")
+    backend = backend or INFERENCE_BACKEND
+    directory = artifact_dir(result_blob_name(url, sentences_per_chunk, model, backend, tokens_per_chunk,
+                                              overlap_sentences, scoring))
+    try:
+        matrix = load_emotion_matrix(directory)
+    except FileNotFoundError:
+        run_emotion_pipeline(url, sentences_per_chunk, model, backend, tokens_per_chunk=tokens_per_chunk,
+                             overlap_sentences=overlap_sentences, scoring=scoring, use_cache=False)
+        matrix = load_emotion_matrix(directory)
+    # Marks the artifact as recently used for prune_store
+    os.utime(directory)
+    return matrix
+
+
+def get_encoded_result(url, sentences_per_chunk=3, model="accurate", backend=None, tokens_per_chunk=None,
+                       overlap_sentences=0, scoring="chunk", response_format="json"):
+    """
+    Returns an analysis result encoded in one of formats.RESPONSE_FORMATS, as bytes.
+
+    Each format is cached under its own key, so a cached result is sent as it is
+    stored, without being decoded and encoded again. The compact and msgpack formats
+    are built from the probability matrix artifact (see get_emotion_matrix).
+    Args:
+        url (str): The URL to the Project Gutenberg novel.
+        response_format (str): "json", "compact" or "msgpack".
+        Other arguments: see run_emotion_pipeline.
+    Returns:
+        bytes: The encoded result.
+    """
+    backend = backend or INFERENCE_BACKEND
+    blob_name = result_blob_name(url, sentences_per_chunk, model, backend, tokens_per_chunk, overlap_sentences,
+                                 scoring)
+    key = encoded_blob_name(blob_name, response_format)
+    cache = get_result_cache()
+    with span("cache"):
+        data = cache.get(key)
+    if data is not None:
+        return data
+
+    if response_format == "json":
+        result = run_emotion_pipeline(url, sentences_per_chunk, model, backend, tokens_per_chunk=tokens_per_chunk,
+                                      overlap_sentences=overlap_sentences, scoring=scoring, use_cache=False)
+        # The pipeline just stored the encoded result
+        return cache.get(key) or json.dumps(result).encode()
+
+    matrix = get_emotion_matrix(url, sentences_per_chunk, model, backend, tokens_per_chunk=tokens_per_chunk,
+                                overlap_sentences=overlap_sentences, scoring=scoring)
+    header = _response_header(url, sentences_per_chunk, model, backend, len(matrix["probs"]), tokens_per_chunk,
+                              overlap_sentences, scoring, matrix.get("escalated_fraction"))
+    with span("serialize"):
+        data = encode_result(response_format, header, matrix["probs"], matrix["labels"], matrix["offsets"])
+    with span("upload"):
+        cache.put(key, data)
+    return data
+
+
+def get_word_frequency_index(url):
+    """
+    Returns the NRC lexicon words of every sentence of a book as a WordFrequencyIndex,
+    from which the word frequencies of any range of the book are computed cheaply.
+    The sentences come from the book store when the book was already analyzed.
+    Args:
+        url (str): The URL to the Project Gutenberg novel.
+    Returns:
+        WordFrequencyIndex: Indexed by sentence and by character position.
+    """
+    key = book_key(url)
+    with _word_indexes_lock:
+        if key in _word_indexes:
+            _word_indexes.move_to_end(key)
+            return _word_indexes[key]
+
+    preprocessed, sentences, offsets = _prepare_sentences(url, _reporter(None))
+    with span("lexicon"):
+        affect_words = analyze_sentences(sentences)["affect_words"]
+    index = WordFrequencyIndex(affect_words, [start for start, _ in offsets], len(preprocessed))
+
+    with _word_indexes_lock:
+        _word_indexes[key] = index
+        while len(_word_indexes) > MAX_WORD_INDEXES:
+            _word_indexes.popitem(last=False)
+    return index
+
+
+def iter_emotion_pipeline(url, sentences_per_chunk=3, model="accurate", backend=None, window=256,
+                          tokens_per_chunk=None, overlap_sentences=0):
+    """
+    Streaming variant of run_emotion_pipeline that yields results as chunks are scored.
+
+    The first message is the response header (status, model, book URL, number of
+    chunks, ...) with "type": "header"; each following message has "type": "rows"
+    and the records of one window of chunks, in document order; the last one is
+    {"type": "done"}, which for a cascade also holds the "escalated_fraction" (only
+    known once every chunk is scored). Cached results are replayed in the same
+    format, and fresh results are cached once the whole book has been scored, as
+    run_emotion_pipeline would have cached them.
+    Args:
+        url (str): The URL to the Project Gutenberg novel.
+        sentences_per_chunk (int): Number of sentences per chunk.
+        model (str): The model to use for emotion prediction: 'fast', 'accurate' or 'cascade'.
+        backend (str, optional): The inference backend. Defaults to INFERENCE_BACKEND.
+        window (int): Number of chunks per "rows" message.
+        tokens_per_chunk (int, optional): Token budget per chunk, see run_emotion_pipeline.
+        overlap_sentences (int): Sentences shared by consecutive chunks in token mode.
+    Yields:
+        dict: Header, rows and done messages.
+    """
+    report = _reporter(None)
+    backend = backend or INFERENCE_BACKEND
+    blob_name = result_blob_name(url, sentences_per_chunk, model, backend, tokens_per_chunk, overlap_sentences)
+
+    cached_result = get_result_cache().get_json(blob_name)
+    if cached_result:
+        records = cached_result.pop("emotions")
+        yield {"type": "header", **cached_result}
+        for start in range(0, len(records), window):
+            yield {"type": "rows", "start": start, "rows": records[start:start+window]}
+        yield _done_message(cached_result.get("escalated_fraction"))
+        return
+
+    df_chunks, _, _ = _prepare_chunks(url, sentences_per_chunk, model, report, tokens_per_chunk, overlap_sentences)
+    header = _response_header(url, sentences_per_chunk, model, backend, len(df_chunks),
+                              tokens_per_chunk, overlap_sentences)
+    yield {"type": "header", **header}
+
+    # Only the records are kept for the cache upload, never the serialized response
+    records, stats = [], {}
+    batches = iter_emotion_records(df_chunks["chunk"].tolist(), model, top_k=3, window=window,
+                                   input_ids=df_chunks["input_ids"].tolist(), backend=backend,
+                                   chunk_cache=get_chunk_cache(),
+                                   pool=get_inference_scheduler() or get_inference_pool(), stats=stats)
+    for rows in batches:
+        yield {"type": "rows", "start": len(records), "rows": rows}
+        records.extend(rows)
+
+    # The cached result is the one run_emotion_pipeline returns, which shares the key
+    escalated_fraction = None
+    if model == "cascade":
+        escalated_fraction = stats.get("escalated", 0) / len(records) if records else 0.0
+    header = _response_header(url, sentences_per_chunk, model, backend, len(df_chunks),
+                              tokens_per_chunk, overlap_sentences, escalated_fraction=escalated_fraction)
+    get_result_cache().put_json(blob_name, {**header, "emotions": records})
+    yield _done_message(header.get("escalated_fraction"))
+
+
+def _done_message(escalated_fraction=None):
+    message = {"type": "done"}
+    if escalated_fraction is not None:
+        message["escalated_fraction"] = escalated_fraction
+    return message
+
+
+def iter_source_emotions(source, sentences_per_chunk=3, model="accurate", backend=None, window=256):
+    """
+    Scores a text read with bounded memory from a URL or a local file.
+
+    Chunks come from emotionplot.ingest.stream_chunks and are scored window by window,
+    so neither the text nor the full list of chunks is ever held in memory.
+    Args:
+        source (str): Project Gutenberg URL or path to a local text file.
+        sentences_per_chunk (int): Number of sentences per chunk.
+        model (str): The model to use for emotion prediction: 'fast', 'accurate' or 'cascade'.
+        backend (str, optional): The inference backend. Defaults to INFERENCE_BACKEND.
+        window (int): Number of chunks scored at a time.
+    Yields:
+        list[dict]: Records with 'chunk', 'Predicted_Emotion' and 'Top_3_Emotions' keys.
+    """
+    for chunks in iter_windows(stream_chunks(source, sentences_per_chunk), window):
+        yield from iter_emotion_records(chunks, model, top_k=3, window=window, backend=backend,
+                                        chunk_cache=get_chunk_cache(),
+                                        pool=get_inference_scheduler() or get_inference_pool())
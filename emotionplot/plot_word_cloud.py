@@ -1,38 +1,238 @@
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
-import pandas as pd
+import io
+import json
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from hashlib import sha1
+from threading import Lock
 
-def generate_wordclouds(df, chunk_size):
+import numpy as np
+
+from emotionplot.cache import MemoryCache, DiskCache, TieredCache
+from emotionplot.params import WORDCLOUD_CACHE_MEMORY_BYTES, WORDCLOUD_CACHE_DIR, WORDCLOUD_WORKERS
+from emotionplot.processes import process_context
+
+# Rendering options; the layout is seeded so that the same frequencies always give the same image
+DEFAULT_RENDER_OPTIONS = {"width": 400, "height": 400, "background_color": "white", "max_words": 200,
+                          "random_state": 0}
+
+
+def group_frequencies(words_per_sentence, group_size):
     """
-    Generates word clouds for grouped sentences.
+    Counts the words of consecutive groups of sentences.
 
     Parameters:
-    - df (pd.DataFrame): DataFrame containing sentences and emotional words.
-    - chunk_size (int): Number of sentences per group.
+    - words_per_sentence (iterable): Words of each sentence, as lists or space-separated strings.
+    - group_size (int): Number of sentences per group.
+
+    Returns:
+    - list[Counter]: Word frequencies of each group.
+    """
+    groups = []
+    for i, words in enumerate(words_per_sentence):
+        if i % group_size == 0:
+            groups.append(Counter())
+        groups[-1].update(words.split() if isinstance(words, str) else words)
+    return groups
+
+
+class WordFrequencyIndex:
+    """
+    Words of every sentence of a book, stored as one array of word IDs with the
+    start of each sentence, so the word frequencies of any range of sentences are
+    a single np.bincount over a slice.
+    """
+
+    def __init__(self, words_per_sentence, sentence_starts=None, text_length=None):
+        """
+        Parameters:
+        - words_per_sentence (list[list[str]]): Words of each sentence.
+        - sentence_starts (array-like, optional): Character offset of each sentence,
+          to select ranges by position in the text.
+        - text_length (int, optional): Length of the text (default: last sentence start + 1).
+        """
+        word_ids = {}
+        ids = [word_ids.setdefault(word, len(word_ids)) for words in words_per_sentence for word in words]
+        self.vocabulary = list(word_ids)
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.bounds = np.concatenate([[0], np.cumsum([len(words) for words in words_per_sentence])]).astype(np.int64)
+        self.num_sentences = len(words_per_sentence)
+        if sentence_starts is None:
+            sentence_starts = np.arange(self.num_sentences)
+        self.sentence_starts = np.asarray(sentence_starts, dtype=np.int64)
+        if text_length is None:
+            text_length = int(self.sentence_starts[-1]) + 1 if self.num_sentences else 0
+        self.text_length = text_length
+
+    def frequencies(self, first_sentence=0, last_sentence=None):
+        """Returns the word frequencies of sentences [first_sentence, last_sentence)."""
+        last_sentence = self.num_sentences if last_sentence is None else min(last_sentence, self.num_sentences)
+        first_sentence = max(0, min(first_sentence, last_sentence))
+        ids = self.ids[self.bounds[first_sentence]:self.bounds[last_sentence]]
+        counts = np.bincount(ids, minlength=len(self.vocabulary))
+        return {self.vocabulary[i]: int(counts[i]) for i in np.flatnonzero(counts).tolist()}
+
+    def sentence_range(self, start=0.0, end=1.0):
+        """Returns the (first, last) sentences starting between positions start and end (0 to 1) of the text."""
+        bounds = np.searchsorted(self.sentence_starts, [start * self.text_length, end * self.text_length])
+        if end >= 1.0:
+            bounds[1] = self.num_sentences
+        return int(bounds[0]), int(bounds[1])
+
+
+def frequencies_key(frequencies, options=None):
+    """Returns the cache key of the image of some word frequencies rendered with `options`."""
+    options = {**DEFAULT_RENDER_OPTIONS, **(options or {})}
+    payload = json.dumps([sorted(frequencies.items()), sorted(options.items())], separators=(",", ":"))
+    return f"wordcloud/{sha1(payload.encode()).hexdigest()}.png"
+
+
+def render_wordcloud(frequencies, options=None):
+    """
+    Renders a word cloud of word frequencies to PNG bytes.
+
+    Parameters:
+    - frequencies (dict): Word -> count.
+    - options (dict, optional): WordCloud options overriding DEFAULT_RENDER_OPTIONS.
 
     Returns:
-    - Displays word clouds for each sentence group.
+    - bytes: The PNG image (a blank image if there are no words).
     """
+    from wordcloud import WordCloud
+
+    options = {**DEFAULT_RENDER_OPTIONS, **(options or {})}
+    wordcloud = WordCloud(**options)
+    if frequencies:
+        image = wordcloud.generate_from_frequencies(frequencies).to_image()
+    else:
+        from PIL import Image
+        image = Image.new("RGB", (options["width"], options["height"]), options["background_color"])
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
 
-    # Assign sentence groups dynamically based on chunk size
-    df["Sentence_Group"] = df.index // chunk_size
 
-    # Group emotional words by sentence group
-    grouped_words = df.groupby("Sentence_Group")["words"].apply(lambda x: " ".join(x)).reset_index()
+class WordCloudRenderer:
+    """
+    Renders word clouds from word frequencies, caching each PNG under a hash of its
+    frequencies and options, and rendering cache misses in worker processes.
 
-    # Create word clouds for each sentence group
-    fig, axes = plt.subplots(1, len(grouped_words), figsize=(15, 6))
+    The worker pool is started on the first call with several misses and then kept
+    (see processes.process_context: renders are requested from API threads).
+    """
+
+    def __init__(self, cache=None, workers=WORDCLOUD_WORKERS):
+        self.cache = cache
+        self.workers = workers
+        self._executor = None
+        self._lock = Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=process_context(preload=["emotionplot.plot_word_cloud"]))
+            return self._executor
+
+    def shutdown(self):
+        """Stops the worker processes, if they were started."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def render(self, frequencies, options=None):
+        """Returns the PNG bytes of one word cloud."""
+        return self.render_many([frequencies], options)[0]
+
+    def render_many(self, frequency_list, options=None):
+        """
+        Returns the PNG bytes of the word cloud of each word frequencies dict.
+        Cached images are returned as they are; the others are rendered in parallel.
+        """
+        keys = [frequencies_key(frequencies, options) for frequencies in frequency_list]
+        images = [self.cache.get(key) if self.cache is not None else None for key in keys]
+
+        # Identical frequencies are rendered once
+        missing = {}
+        for key, frequencies, image in zip(keys, frequency_list, images):
+            if image is None and key not in missing:
+                missing[key] = dict(frequencies)
+        if self.workers > 1 and len(missing) > 1:
+            rendered = dict(zip(missing, self._get_executor().map(render_wordcloud, missing.values(),
+                                                                  [options] * len(missing))))
+        else:
+            rendered = {key: render_wordcloud(frequencies, options) for key, frequencies in missing.items()}
+
+        if self.cache is not None:
+            for key, image in rendered.items():
+                self.cache.put(key, image)
+        return [image if image is not None else rendered[key] for key, image in zip(keys, images)]
+
+
+def save_images(images, directory, prefix="chunk"):
+    """Writes PNG images to PREFIX_INDEX.png files in `directory`. Returns their paths."""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, image in enumerate(images):
+        path = os.path.join(directory, f"{prefix}_{i}.png")
+        with open(path, "wb") as f:
+            f.write(image)
+        paths.append(path)
+    return paths
+
+
+_renderer = None
+_renderer_lock = Lock()
+
+
+def get_wordcloud_renderer():
+    """Returns the process-wide word cloud renderer and its image cache (see emotionplot.params)."""
+    global _renderer
+    with _renderer_lock:
+        if _renderer is None:
+            tiers = [MemoryCache(WORDCLOUD_CACHE_MEMORY_BYTES)]
+            if WORDCLOUD_CACHE_DIR:
+                tiers.append(DiskCache(WORDCLOUD_CACHE_DIR))
+            _renderer = WordCloudRenderer(TieredCache(tiers, name="wordcloud"), WORDCLOUD_WORKERS)
+        return _renderer
+
+
+def generate_wordclouds(df, chunk_size, words_column="words", out_dir=None, show=True, columns=5):
+    """
+    Generates word clouds for grouped sentences.
+
+    Parameters:
+    - df (pd.DataFrame): DataFrame containing sentences and emotional words.
+    - chunk_size (int): Number of sentences per group.
+    - words_column (str): Column holding the space-separated words of each sentence.
+    - out_dir (str, optional): Directory to write one PNG file per group to.
+    - show (bool): Whether to display the word clouds (in a grid of `columns` per row).
+    - columns (int): Word clouds per row of the displayed grid.
+
+    Returns:
+    - list[bytes]: The PNG image of each sentence group.
+    """
+    frequency_list = group_frequencies(df[words_column], chunk_size)
+    images = get_wordcloud_renderer().render_many(frequency_list)
+    if out_dir:
+        save_images(images, out_dir)
 
-    # Generate word cloud for each sentence group
-    for i, row in grouped_words.iterrows():
-        wordcloud = WordCloud(width=400, height=400, background_color="white").generate(row["words"])
-        axes[i].imshow(wordcloud, interpolation="bilinear")
-        axes[i].axis("off")
-        axes[i].set_title(f"Chunk {row['Sentence_Group']}")
+    if show and images:
+        import matplotlib.pyplot as plt
+        from PIL import Image
 
-    # Show the word clouds
-    plt.tight_layout()
-    plt.show()
+        rows = -(-len(images) // columns)
+        fig, axes = plt.subplots(rows, min(columns, len(images)), figsize=(3 * min(columns, len(images)), 3 * rows),
+                                 squeeze=False)
+        for i, ax in enumerate(axes.flat):
+            ax.axis("off")
+            if i < len(images):
+                ax.imshow(Image.open(io.BytesIO(images[i])), interpolation="bilinear")
+                ax.set_title(f"Chunk {i}")
+        plt.tight_layout()
+        plt.show()
+    return images
 
 # Example usage:
-# generate_wordclouds(df, 400)
+# generate_wordclouds(df, 400, out_dir="outputs/wordclouds", show=False)
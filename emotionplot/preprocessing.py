@@ -1,55 +1,86 @@
-import pandas as pd
-import nltk
-from nltk.tokenize import sent_tokenize
-
-nltk.download('punkt')
-
-def preprocessing(content):
-    """
-    Preprocesses the input text by:
-    1. Lowercasing the text.
-    2. Removing numbers.
-    3. Removing punctuation.
-    4. Tokenizing the text into words.
-    Args:
-        content (str): The input text to preprocess.
-    Returns:
-        str: The preprocessed text with words separated by spaces.
-    """
-    # Lowercase
-    content = content.lower()
-
-    # Remove numbers
-    content = ''.join([char for char in content if not char.isdigit()])
-
-    # Remove punctuation
-    punctuation = ['!','"','#','$','%','&','(',')',
-                   '*','+','-','/',':',';','<',
-                   '=','>','@',"\\",'"]"','^','_']
-
-
-    for punct in punctuation:
-        content = content.replace(punct, ' ')
-
-    # Tokenize (split into words)
-    tokens = content.split()
-
-    return ' '.join(tokens)
-
-
-def chunk_by_sentences(content, sentences_per_chunk=3):
-    sentences = sent_tokenize(content)
-    chunks = []
-
-    for i in range(0, len(sentences), sentences_per_chunk):
-        chunk = sentences[i:i+sentences_per_chunk]
-        chunks.append(" ".join(chunk))
-    df = pd.DataFrame({'chunk': chunks})
-    return df
-
-# chunks = chunk_by_sentences(data, sentences_per_chunk=10)
-
-# Create DataFrame with each chunk as a row
-# df = pd.DataFrame({'chunk': chunks})
-
-# df["cleaned_chunk"] = df["chunk"].apply(preprocessing)
+import pandas as pd
+
+from emotionplot.normalization import normalize_text
+from emotionplot.segmentation import get_segmenter
+
+
+def preprocessing(content):
+    """
+    Preprocesses the input text by:
+    1. Lowercasing the text.
+    2. Removing numbers.
+    3. Removing punctuation.
+    4. Tokenizing the text into words.
+    All steps run in one pass, see emotionplot.normalization.normalize_text.
+    Args:
+        content (str): The input text to preprocess.
+    Returns:
+        str: The preprocessed text with words separated by spaces.
+    """
+    return normalize_text(content)
+
+
+def split_sentences(content):
+    """
+    Splits the text into sentences with the configured segmenter (SEGMENTER and
+    SEGMENTER_WORKERS in emotionplot.params). The default, "punkt", gives the same
+    output as NLTK's sent_tokenize.
+    Args:
+        content (str): The text to split.
+    Returns:
+        list[str]: The sentences of the text, in order.
+    """
+    return get_segmenter().split(content)
+
+
+def sentence_offsets(content, sentences):
+    """
+    Finds the character span of each sentence in the text it was split from.
+    Args:
+        content (str): The text the sentences were split from.
+        sentences (list[str]): The sentences, in order.
+    Returns:
+        list[tuple[int, int]]: (start, end) offsets of each sentence in `content`.
+    """
+    offsets = []
+    position = 0
+    for sentence in sentences:
+        start = content.find(sentence, position)
+        if start < 0:
+            start = position
+        position = start + len(sentence)
+        offsets.append((start, position))
+    return offsets
+
+
+def chunk_by_sentences(content, sentences_per_chunk=3, sentences=None):
+    """
+    Groups consecutive sentences into chunks.
+    Args:
+        content (str): The text to chunk.
+        sentences_per_chunk (int): Number of sentences per chunk.
+        sentences (list[str], optional): Sentences already split from `content`,
+            to avoid tokenizing the text again.
+    Returns:
+        pd.DataFrame: DataFrame with one chunk of text per row in the 'chunk' column,
+            and its character offsets in `content` in the 'start' and 'end' columns.
+    """
+    if sentences is None:
+        sentences = split_sentences(content)
+    offsets = sentence_offsets(content, sentences)
+    chunks, starts, ends = [], [], []
+
+    for i in range(0, len(sentences), sentences_per_chunk):
+        chunk = sentences[i:i+sentences_per_chunk]
+        chunks.append(" ".join(chunk))
+        starts.append(offsets[i][0])
+        ends.append(offsets[i + len(chunk) - 1][1])
+    df = pd.DataFrame({'chunk': chunks, 'start': starts, 'end': ends})
+    return df
+
+# chunks = chunk_by_sentences(data, sentences_per_chunk=10)
+
+# Create DataFrame with each chunk as a row
+# df = pd.DataFrame({'chunk': chunks})
+
+# df["cleaned_chunk"] = df["chunk"].apply(preprocessing)
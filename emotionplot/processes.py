@@ -0,0 +1,30 @@
+import multiprocessing as mp
+from threading import Lock
+
+# Modules imported by the fork server, requested by every pool created so far
+_preload = set()
+_preload_lock = Lock()
+
+
+def process_context(preload=()):
+    """
+    Returns the multiprocessing context of the package's process pools: `forkserver`
+    where the platform supports it, `spawn` otherwise.
+
+    Pools are created lazily from request, job or I/O threads, so workers are never
+    forked from the calling process: a child forked while another thread holds a lock
+    (model registry, metrics, tokenizers, logging) would inherit it held and deadlock.
+    Args:
+        preload (list[str]): Modules the fork server imports before forking workers,
+            so that they start with them loaded. Only applies if the server is not
+            running yet.
+    Returns:
+        multiprocessing.context.BaseContext: The context to pass as `mp_context`.
+    """
+    if "forkserver" not in mp.get_all_start_methods():
+        return mp.get_context("spawn")
+    context = mp.get_context("forkserver")
+    with _preload_lock:
+        _preload.update(preload)
+        context.set_forkserver_preload(sorted(_preload))
+    return context
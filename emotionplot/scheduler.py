@@ -0,0 +1,317 @@
+import time
+from collections import deque
+from concurrent.futures import Future
+from threading import Condition, Lock, Thread
+
+import torch
+
+from emotionplot.metrics import inc, observe, current_timings, count_in
+from emotionplot.model import predict_batch, predict_probs, get_tokenizer
+from emotionplot.params import (
+    INFERENCE_BACKEND, INFERENCE_SCHEDULER, SCHEDULER_MAX_BATCH_SIZE, SCHEDULER_MAX_WAIT_MS,
+    SCHEDULER_MAX_TOKENS, SCHEDULER_MAX_PENDING, SCHEDULER_ADMISSION_TIMEOUT
+)
+
+
+class SchedulerBusy(RuntimeError):
+    """Raised when a request cannot enter a full inference queue before the admission timeout."""
+
+
+# Rows considered for each batch, in batches' worth: the batch is the run of rows of similar length
+# around the oldest waiting row, so wider windows pad less but reorder more
+BUCKET_WINDOW_BATCHES = 4
+
+
+class _Request:
+    """Chunks of one caller, scored row by row as batches complete."""
+
+    def __init__(self, input_ids, progress_callback):
+        self.input_ids = input_ids
+        self.progress_callback = progress_callback
+        self.submitted = time.perf_counter()
+        # Rows not yet assigned to a batch, shortest first
+        self.rows = deque(sorted(range(len(input_ids)), key=lambda row: len(input_ids[row])))
+        self.done = 0
+        self.probs = None
+        self.future = Future()
+        # Breakdown of the caller's request_timings(), filled in from the batcher thread
+        self.timings = current_timings()
+
+
+class _ModelQueue:
+    """Requests waiting for one (model, backend), and the thread that batches them."""
+
+    def __init__(self, model_type, backend):
+        self.model_type = model_type
+        self.backend = backend
+        self.requests = deque()  # requests with rows not yet assigned to a batch
+        self.queued = 0  # rows not yet assigned to a batch
+        self.pending = 0  # rows not yet scored
+        self.batches = 0
+        self.rows = 0
+        self.condition = Condition()
+        self.thread = None
+
+
+class InferenceScheduler:
+    """
+    Shares forward passes between concurrent requests.
+
+    Each request puts its chunks in the queue of its (model, backend). One batcher
+    thread per queue waits until `max_batch_size` rows are queued or `max_wait_ms`
+    have passed, then builds a batch of up to `max_batch_size` rows and `max_tokens`
+    padded tokens: it takes a window of rows from all waiting requests, round robin
+    and shortest first within each request, and keeps the rows closest in length to
+    the first one of the request at the head of the queue (which then moves to the
+    back), so that batches are padded little and no request starves. It runs one
+    forward pass and hands each row back to its request, whose future completes once
+    all of its rows are scored. Forward passes of a model never compete for CPU
+    threads.
+
+    Backpressure: a request is only queued while fewer than `max_pending` rows of its
+    model are waiting; otherwise it waits up to `admission_timeout` seconds and is
+    then rejected with SchedulerBusy.
+    """
+
+    def __init__(self, max_batch_size=SCHEDULER_MAX_BATCH_SIZE, max_wait_ms=SCHEDULER_MAX_WAIT_MS,
+                 max_tokens=SCHEDULER_MAX_TOKENS, max_pending=SCHEDULER_MAX_PENDING,
+                 admission_timeout=SCHEDULER_ADMISSION_TIMEOUT):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_tokens = max_tokens
+        self.max_pending = max_pending
+        self.admission_timeout = admission_timeout
+        self._queues = {}
+        self._lock = Lock()
+        self._stopped = False
+
+    def _queue(self, model_type, backend):
+        key = (model_type, backend)
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = _ModelQueue(model_type, backend)
+                queue.thread = Thread(target=self._run, args=(queue,), name=f"batcher-{model_type}-{backend}",
+                                      daemon=True)
+                queue.thread.start()
+            return queue
+
+    def submit(self, input_ids, model_type="accurate", backend=None, progress_callback=None):
+        """
+        Queues pre-tokenized chunks for scoring.
+        Args:
+            input_ids (list[list[int]]): Token IDs of each chunk.
+            model_type (str): Model type to use ("fast" or "accurate").
+            backend (str, optional): Inference backend. Defaults to INFERENCE_BACKEND.
+            progress_callback (callable, optional): Called as progress_callback(done, total)
+                from the batcher thread after each batch that scored some of the chunks.
+        Raises:
+            SchedulerBusy: If the queue stays full for `admission_timeout` seconds.
+        Returns:
+            concurrent.futures.Future: Resolves to the (len(input_ids), num_labels) probabilities.
+        """
+        request = _Request(list(input_ids), progress_callback)
+        if not request.input_ids:
+            request.future.set_result(torch.empty((0, 0)))
+            return request.future
+
+        queue = self._queue(model_type, backend or INFERENCE_BACKEND)
+        deadline = time.monotonic() + self.admission_timeout
+        with queue.condition:
+            # A request larger than max_pending is admitted once the queue is empty
+            while queue.pending and queue.pending + len(request.input_ids) > self.max_pending:
+                if self._stopped:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    inc("emotionplot_scheduler_rejected_total", model=model_type)
+                    raise SchedulerBusy(f"Inference queue of the '{model_type}' model is full, retry later")
+                queue.condition.wait(remaining)
+            if self._stopped:
+                raise RuntimeError("The inference scheduler is shut down")
+            queue.requests.append(request)
+            queue.queued += len(request.input_ids)
+            queue.pending += len(request.input_ids)
+            queue.condition.notify_all()
+        return request.future
+
+    def predict_probs(self, texts, model_type="accurate", batch_size=32, max_tokens=8192, input_ids=None,
+                      backend=None, progress_callback=None):
+        """
+        Same as emotionplot.model.predict_probs, with the forward passes shared between
+        concurrent callers (batch_size and max_tokens are set by the scheduler instead).
+        Returns:
+            torch.Tensor: Probabilities of shape (len(texts), num_labels), in input order.
+        """
+        if not texts:
+            return predict_probs(texts, model_type, backend=backend)
+        if input_ids is None:
+            input_ids = get_tokenizer(model_type)(texts, truncation=True, max_length=512)["input_ids"]
+        return self.submit(input_ids, model_type, backend, progress_callback).result()
+
+    def _collect(self, queue):
+        """Waits for rows and returns the next batch as (request, row) pairs, or None when stopped."""
+        with queue.condition:
+            while not queue.requests and not self._stopped:
+                queue.condition.wait()
+            if self._stopped:
+                return None
+            deadline = time.monotonic() + self.max_wait
+            while queue.queued < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                queue.condition.wait(remaining)
+
+            batch = self._bucket(queue)
+            queue.queued -= len(batch)
+            return batch
+
+    def _bucket(self, queue):
+        """Takes the next batch from the waiting requests (see the class docstring). Call with the condition held."""
+        # Candidate rows, round robin over the requests and shortest first within each
+        window = self.max_batch_size * BUCKET_WINDOW_BATCHES
+        candidates, depth = [], 0
+        while len(candidates) < window:
+            added = False
+            for request in queue.requests:
+                if depth < len(request.rows):
+                    candidates.append((request, request.rows[depth]))
+                    added = True
+                    if len(candidates) == window:
+                        break
+            if not added:
+                break
+            depth += 1
+
+        # Grow a run of similar lengths around the head request's row, preferring shorter rows
+        length = lambda candidate: len(candidate[0].input_ids[candidate[1]])
+        anchor = candidates[0]
+        ordered = sorted(candidates, key=length)
+        lo = hi = ordered.index(anchor)
+        hi += 1
+        while hi - lo < self.max_batch_size:
+            if lo > 0 and length(ordered[hi - 1]) * (hi - lo + 1) <= self.max_tokens:
+                lo -= 1
+            elif hi < len(ordered) and length(ordered[hi]) * (hi - lo + 1) <= self.max_tokens:
+                hi += 1
+            else:
+                break
+        batch = ordered[lo:hi]
+
+        # Taken rows leave their requests; the head request goes to the back of the queue
+        taken = {}
+        for request, row in batch:
+            taken.setdefault(id(request), set()).add(row)
+        for request in queue.requests:
+            rows = taken.get(id(request))
+            if rows:
+                request.rows = deque(row for row in request.rows if row not in rows)
+        queue.requests.rotate(-1)
+        for request in [request for request in queue.requests if not request.rows]:
+            queue.requests.remove(request)
+        return batch
+
+    def _run(self, queue):
+        while True:
+            batch = self._collect(queue)
+            if batch is None:
+                return
+            requests = list({id(request): request for request, _ in batch}.values())
+            try:
+                probs = predict_batch([request.input_ids[row] for request, row in batch], queue.model_type,
+                                      queue.backend)
+            except Exception as e:
+                self._fail(queue, requests, e)
+                continue
+
+            # The forward pass counted its tokens in the process metrics; attribute them to each request
+            longest = max(len(request.input_ids[row]) for request, row in batch)
+            for request, row in batch:
+                count_in(request.timings, "emotionplot_tokens_total", len(request.input_ids[row]))
+                count_in(request.timings, "emotionplot_padded_tokens_total", longest)
+
+            now = time.perf_counter()
+            for (request, row), row_probs in zip(batch, probs):
+                if request.probs is None:
+                    request.probs = torch.empty((len(request.input_ids), probs.shape[1]))
+                request.probs[row] = row_probs
+                request.done += 1
+                observe("emotionplot_scheduler_wait_seconds", now - request.submitted, model=queue.model_type)
+            with queue.condition:
+                queue.batches += 1
+                queue.rows += len(batch)
+                queue.pending -= len(batch)
+                queue.condition.notify_all()
+            for request in requests:
+                if request.progress_callback is not None:
+                    try:
+                        request.progress_callback(request.done, len(request.input_ids))
+                    except Exception as e:
+                        # A failing callback must not stop the batcher thread
+                        print(f"[scheduler] Progress callback failed: {e}")
+                if request.done == len(request.input_ids):
+                    request.future.set_result(request.probs)
+
+    def _fail(self, queue, requests, error):
+        # The remaining rows of the failed requests are dropped from the queue
+        with queue.condition:
+            for request in requests:
+                if request in queue.requests:
+                    queue.requests.remove(request)
+                    queue.queued -= len(request.rows)
+                    request.rows.clear()
+                queue.pending -= len(request.input_ids) - request.done
+            queue.condition.notify_all()
+        for request in requests:
+            if not request.future.done():
+                request.future.set_exception(error)
+
+    def stats(self):
+        """Returns the queued rows, batches run and mean rows per batch of each (model, backend)."""
+        with self._lock:
+            queues = list(self._queues.values())
+        report = {}
+        for queue in queues:
+            with queue.condition:
+                report[f"{queue.model_type}/{queue.backend}"] = {
+                    "pending": queue.pending,
+                    "requests": len(queue.requests),
+                    "batches": queue.batches,
+                    "mean_batch_size": queue.rows / queue.batches if queue.batches else 0.0,
+                }
+        return report
+
+    def shutdown(self):
+        """
+        Stops the batcher threads once their current batch is done. Requests with rows
+        still queued fail with RuntimeError, and new requests are refused.
+        """
+        self._stopped = True
+        with self._lock:
+            queues = list(self._queues.values())
+        for queue in queues:
+            with queue.condition:
+                queue.condition.notify_all()
+            queue.thread.join()
+            with queue.condition:
+                unfinished = list(queue.requests)
+            self._fail(queue, unfinished, RuntimeError("The inference scheduler was shut down"))
+
+
+_scheduler = None
+_scheduler_lock = Lock()
+
+
+def get_inference_scheduler():
+    """
+    Returns the process-wide inference scheduler when INFERENCE_SCHEDULER is enabled,
+    or None when each request runs its own forward passes.
+    """
+    global _scheduler
+    if not INFERENCE_SCHEDULER:
+        return None
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = InferenceScheduler()
+        return _scheduler
@@ -0,0 +1,221 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+import nltk
+
+from emotionplot.params import SEGMENTER, SEGMENTER_WORKERS
+from emotionplot.processes import process_context
+
+# Abbreviations after which a period does not end a sentence (compared lowercased)
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "st", "sr", "jr", "prof", "rev", "gen", "col", "capt", "lt",
+    "sgt", "hon", "messrs", "mme", "mlle", "vol", "ch", "chap", "pp", "etc",
+    "vs", "viz", "cf", "e.g", "i.e", "a.m", "p.m", "jan", "feb", "mar", "apr", "jun",
+    "jul", "aug", "sep", "sept", "oct", "nov", "dec",
+}
+
+# A run of terminators, optional closing quotes/brackets, then whitespace
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]’”]*(?=\s)")
+_LAST_WORD = re.compile(r"(\S+?)[.!?]+[\"')\]’”]*$")
+
+_punkt_checked = False
+
+
+def _ensure_punkt():
+    """Downloads the Punkt sentence tokenizer data on first use if it is not installed."""
+    global _punkt_checked
+    if _punkt_checked:
+        return
+    for resource in ("punkt", "punkt_tab"):
+        try:
+            nltk.data.find(f"tokenizers/{resource}")
+        except LookupError:
+            nltk.download(resource, quiet=True)
+    _punkt_checked = True
+
+
+def _skip_space(text, position):
+    while position < len(text) and text[position].isspace():
+        position += 1
+    return position
+
+
+class Segmenter:
+    """Splits text into sentences, described by their character spans."""
+
+    name = None
+
+    def span_tokenize(self, text):
+        """Returns the (start, end) character span of each sentence of `text`."""
+        raise NotImplementedError
+
+    def split(self, text):
+        """Returns the sentences of `text`, in order."""
+        return [text[start:end] for start, end in self.span_tokenize(text)]
+
+
+class PunktSegmenter(Segmenter):
+    """NLTK's Punkt tokenizer, the reference behavior (same output as sent_tokenize)."""
+
+    name = "punkt"
+
+    def __init__(self):
+        self._tokenizer = None
+
+    def _get_tokenizer(self):
+        if self._tokenizer is None:
+            _ensure_punkt()
+            try:
+                from nltk.tokenize.punkt import PunktTokenizer
+                self._tokenizer = PunktTokenizer("english")
+            except ImportError:
+                self._tokenizer = nltk.data.load("tokenizers/punkt/english.pickle")
+        return self._tokenizer
+
+    def span_tokenize(self, text):
+        return list(self._get_tokenizer().span_tokenize(text))
+
+
+class RegexSegmenter(Segmenter):
+    """
+    Fast rule-based segmenter: a sentence ends at a run of . ! or ? (with optional
+    closing quotes or brackets) followed by whitespace, unless the period ends a
+    known abbreviation or a single-letter initial. Works on lowercased text, so it
+    does not rely on capitalization.
+    """
+
+    name = "regex"
+
+    def is_boundary(self, text, end):
+        """Whether the terminator run ending at `end` closes a sentence."""
+        match = _LAST_WORD.search(text, max(0, end - 20), end)
+        if match is None or "." not in match.group(0)[len(match.group(1)):]:
+            return True
+        word = match.group(1).lstrip("\"'([‘“").lower()
+        # "i." is far more often the pronoun than an initial in lowercased text
+        return not (word in ABBREVIATIONS or (len(word) == 1 and word.isalpha() and word != "i"))
+
+    def span_tokenize(self, text):
+        spans = []
+        start = len(text) - len(text.lstrip())
+        for match in _SENTENCE_END.finditer(text):
+            end = match.end()
+            if end <= start or not self.is_boundary(text, end):
+                continue
+            spans.append((start, end))
+            start = _skip_space(text, end)
+        if start < len(text.rstrip()):
+            spans.append((start, len(text.rstrip())))
+        return spans
+
+
+SEGMENTERS = {
+    "punkt": PunktSegmenter,
+    "regex": RegexSegmenter,
+}
+
+_segmenters = {}
+_segmenters_lock = Lock()
+
+
+def _get_base_segmenter(name):
+    if name not in SEGMENTERS:
+        raise ValueError(f"Invalid segmenter: {name}. Choose from: {list(SEGMENTERS.keys())}")
+    with _segmenters_lock:
+        if name not in _segmenters:
+            _segmenters[name] = SEGMENTERS[name]()
+        return _segmenters[name]
+
+
+def _span_tokenize_piece(name, piece):
+    return _get_base_segmenter(name).span_tokenize(piece)
+
+
+class ParallelSegmenter(Segmenter):
+    """
+    Segments large texts across processes with another segmenter.
+
+    The text is cut at paragraph boundaries (blank lines) or, for texts without
+    them such as preprocessed text, at the sentence boundary found by the regex
+    rules after each target cut point. Each piece is segmented in a worker process
+    and the spans are shifted back to offsets in the full text. The workers are
+    started with processes.process_context, as segmentation runs in request threads.
+    """
+
+    def __init__(self, base="punkt", workers=4, min_piece_chars=200_000):
+        self.base = base
+        self.name = f"parallel-{base}"
+        self.workers = workers
+        self.min_piece_chars = min_piece_chars
+        self._executor = None
+        self._lock = Lock()
+
+    def _cut_points(self, text):
+        piece_chars = max(self.min_piece_chars, len(text) // (self.workers * 2) + 1)
+        rules = RegexSegmenter()
+        cuts = [0]
+        while len(text) - cuts[-1] > piece_chars:
+            target = cuts[-1] + piece_chars
+            paragraph = text.find("\n\n", target)
+            cut = paragraph + 2 if paragraph >= 0 else -1
+            if cut < 0 or cut - target > piece_chars:
+                cut = -1
+                for match in _SENTENCE_END.finditer(text, target):
+                    if rules.is_boundary(text, match.end()):
+                        cut = _skip_space(text, match.end())
+                        break
+            if cut < 0 or cut >= len(text):
+                break
+            cuts.append(cut)
+        cuts.append(len(text))
+        return cuts
+
+    def span_tokenize(self, text):
+        cuts = self._cut_points(text)
+        if len(cuts) <= 2:
+            return _span_tokenize_piece(self.base, text)
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=process_context(preload=["emotionplot.segmentation"]))
+        pieces = [text[start:end] for start, end in zip(cuts[:-1], cuts[1:])]
+        spans = []
+        for offset, piece_spans in zip(cuts, self._executor.map(_span_tokenize_piece, [self.base] * len(pieces), pieces)):
+            spans.extend((offset + start, offset + end) for start, end in piece_spans)
+        return spans
+
+
+def get_segmenter(name=SEGMENTER, workers=SEGMENTER_WORKERS):
+    """
+    Returns a shared segmenter instance.
+    Args:
+        name (str): "punkt" (reference) or "regex".
+        workers (int): Worker processes for large texts; 0 or 1 segments in-process.
+    Returns:
+        Segmenter: The segmenter.
+    """
+    if workers and workers > 1:
+        key = f"parallel-{name}-{workers}"
+        _get_base_segmenter(name)
+        with _segmenters_lock:
+            if key not in _segmenters:
+                _segmenters[key] = ParallelSegmenter(name, workers)
+            return _segmenters[key]
+    return _get_base_segmenter(name)
+
+
+def boundary_agreement(reference_spans, spans):
+    """
+    Compares sentence boundaries (end offsets) against a reference segmentation.
+    Returns:
+        dict: Precision, recall and F1 of the boundaries in `spans`.
+    """
+    expected = {end for _, end in reference_spans}
+    found = {end for _, end in spans}
+    matched = len(expected & found)
+    precision = matched / len(found) if found else 1.0
+    recall = matched / len(expected) if expected else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
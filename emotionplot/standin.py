@@ -0,0 +1,100 @@
+import copy
+import os
+import re
+import tempfile
+from collections import Counter
+
+import torch
+from transformers import BertTokenizerFast, DistilBertConfig, DistilBertForSequenceClassification
+
+from emotionplot.backends import OnnxSequenceClassifier, export_model_onnx
+from emotionplot.model import device
+
+# Labels of the GoEmotions models, in their output order
+GOEMOTIONS_LABELS = [
+    "admiration", "amusement", "anger", "annoyance", "approval", "caring", "confusion",
+    "curiosity", "desire", "disappointment", "disapproval", "disgust", "embarrassment",
+    "excitement", "fear", "gratitude", "grief", "joy", "love", "nervousness", "optimism",
+    "pride", "realization", "relief", "remorse", "sadness", "surprise", "neutral",
+]
+
+SPECIAL_TOKENS = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"]
+
+
+def hf_weights_cached(model_name):
+    """Whether the config and weights of a Hugging Face model are in the local cache."""
+    try:
+        from huggingface_hub import try_to_load_from_cache
+    except ImportError:
+        return False
+    if not isinstance(try_to_load_from_cache(model_name, "config.json"), str):
+        return False
+    return any(isinstance(try_to_load_from_cache(model_name, f), str)
+               for f in ("model.safetensors", "pytorch_model.bin"))
+
+
+def build_tokenizer(texts, directory, vocab_size=8000):
+    """
+    Builds a lowercasing WordPiece tokenizer whose vocabulary is the most frequent
+    words of `texts` (every other word maps to [UNK]).
+    """
+    counts = Counter(re.findall(r"\w+|[^\w\s]", " ".join(texts).lower()))
+    words = [word for word, _ in counts.most_common(vocab_size - len(SPECIAL_TOKENS))]
+    os.makedirs(directory, exist_ok=True)
+    vocab_file = os.path.join(directory, "vocab.txt")
+    with open(vocab_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(SPECIAL_TOKENS + words) + "\n")
+    # Same inputs as the DistilBERT tokenizer of the fast model (no token_type_ids)
+    return BertTokenizerFast(vocab_file=vocab_file, do_lower_case=True, model_max_length=512,
+                             model_input_names=["input_ids", "attention_mask"])
+
+
+def build_model(vocab_size, dim=64, layers=2, seed=0):
+    """Returns a small randomly initialized DistilBERT classifier with the GoEmotions labels."""
+    torch.manual_seed(seed)
+    config = DistilBertConfig(
+        vocab_size=vocab_size, dim=dim, hidden_dim=4 * dim, n_layers=layers, n_heads=2,
+        max_position_embeddings=512, num_labels=len(GOEMOTIONS_LABELS),
+        id2label=dict(enumerate(GOEMOTIONS_LABELS)),
+        label2id={label: i for i, label in enumerate(GOEMOTIONS_LABELS)},
+    )
+    return DistilBertForSequenceClassification(config).eval()
+
+
+def register_standin_models(registry, texts, model_types=("fast", "accurate"), directory=None, **model_kwargs):
+    """
+    Registers a stand-in tokenizer and model under each model type of a ModelRegistry.
+
+    Stand-ins have the interface of the real GoEmotions models (28 labels, a
+    BERT-style tokenizer with offsets, every inference backend) but random weights,
+    so benchmarks and smoke runs work offline when the Hugging Face weights are not
+    cached. The "accurate" stand-in is twice as deep as the others, so that relative
+    costs stay roughly ordered.
+    Args:
+        registry (emotionplot.model.ModelRegistry): The registry to populate.
+        texts (list[str]): Texts the tokenizer vocabulary is built from.
+        model_types (tuple[str]): Model types to replace.
+        directory (str, optional): Where the vocabulary and ONNX exports are written
+            (a temporary directory by default).
+        **model_kwargs: Passed on to build_model (dim, layers, seed).
+    """
+    directory = directory or tempfile.mkdtemp(prefix="emotionplot-standin-")
+    tokenizer = build_tokenizer(texts, directory)
+
+    for model_type in model_types:
+        kwargs = dict(model_kwargs)
+        if model_type == "accurate":
+            kwargs["layers"] = 2 * kwargs.get("layers", 2)
+        model = build_model(len(tokenizer), **kwargs)
+
+        def factory(backend, model=model, model_type=model_type):
+            if backend == "int8":
+                return torch.quantization.quantize_dynamic(copy.deepcopy(model).cpu(), {torch.nn.Linear}, dtype=torch.qint8)
+            if backend == "onnx":
+                path = os.path.join(directory, f"{model_type}.onnx")
+                if not os.path.exists(path):
+                    export_model_onnx(copy.deepcopy(model).cpu(), tokenizer, path)
+                return OnnxSequenceClassifier(path, model.config)
+            return model.to(device)
+
+        registry.register(model_type, tokenizer, model.config, factory, name=f"standin/{model_type}")
@@ -0,0 +1,153 @@
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+from emotionplot.model import get_tokenizer
+from emotionplot.preprocessing import sentence_offsets
+
+# Maximum number of sentences whose token IDs are kept per model type and variant
+MAX_CACHED_SENTENCES = 200_000
+
+# (model_type, leading_space) -> OrderedDict(sentence -> np.ndarray of token IDs), least recently used first
+_sentence_ids = {}
+_lock = Lock()
+
+
+def encode_sentences(sentences, model_type="accurate", leading_space=True):
+    """
+    Returns the token IDs of each sentence, tokenizing only sentences not seen before.
+
+    Sentences are encoded without special tokens. Inside a chunk, sentences are
+    joined by spaces, and byte-level BPE tokenizers (RoBERTa) encode a word after a
+    space differently from a word at the start of the text: sentences that follow
+    another one in their chunk are encoded with a leading space, and the first
+    sentence of a chunk without one (leading_space=False). Concatenated that way,
+    the IDs are those of the chunk text tokenized at once.
+    Args:
+        sentences (list[str]): Sentences to encode.
+        model_type (str): Model type whose tokenizer is used ("fast" or "accurate").
+        leading_space (bool): Encode each sentence as if it followed a space.
+    Returns:
+        list[np.ndarray]: One int32 array of token IDs per sentence.
+    """
+    unique = list(dict.fromkeys(sentences))
+    with _lock:
+        cache = _sentence_ids.setdefault((model_type, leading_space), OrderedDict())
+        found = {s: cache[s] for s in unique if s in cache}
+        for sentence in found:
+            cache.move_to_end(sentence)
+
+    missing = [s for s in unique if s not in found]
+    if missing:
+        prefix = " " if leading_space else ""
+        encoded = get_tokenizer(model_type)([prefix + s for s in missing], add_special_tokens=False)["input_ids"]
+        fresh = {sentence: np.asarray(ids, dtype=np.int32) for sentence, ids in zip(missing, encoded)}
+        found.update(fresh)
+        with _lock:
+            cache.update(fresh)
+            while len(cache) > MAX_CACHED_SENTENCES:
+                cache.popitem(last=False)
+
+    return [found[s] for s in sentences]
+
+
+def build_chunk_inputs(sentences, sentences_per_chunk=3, model_type="accurate", max_length=512):
+    """
+    Builds model input IDs for each chunk by joining cached sentence token IDs.
+    Args:
+        sentences (list[str]): Sentences of the text, in order.
+        sentences_per_chunk (int): Number of sentences per chunk.
+        model_type (str): Model type whose tokenizer is used ("fast" or "accurate").
+        max_length (int): Maximum input length including special tokens.
+    Returns:
+        list[list[int]]: Input IDs per chunk, matching the rows of chunk_by_sentences.
+    """
+    tokenizer = get_tokenizer(model_type)
+    budget = max_length - tokenizer.num_special_tokens_to_add(pair=False)
+    ids = encode_sentences(sentences, model_type)
+    initial_ids = encode_sentences(sentences[::sentences_per_chunk], model_type, leading_space=False)
+
+    chunks = []
+    for n, i in enumerate(range(0, len(ids), sentences_per_chunk)):
+        joined = np.concatenate([initial_ids[n], *ids[i+1:i+sentences_per_chunk]])[:budget]
+        chunks.append(tokenizer.build_inputs_with_special_tokens(joined.tolist()))
+    return chunks
+
+
+def _split_long_sentence(tokenizer, sentence, start, budget):
+    """
+    Cuts a sentence longer than `budget` tokens into pieces at token boundaries. Each
+    piece fills a chunk of its own, so the sentence is encoded without a leading space.
+    """
+    encoding = tokenizer(sentence, add_special_tokens=False, return_offsets_mapping=True)
+    ids, mapping = encoding["input_ids"], encoding["offset_mapping"]
+    pieces = []
+    for i in range(0, len(ids), budget):
+        last = min(i + budget, len(ids)) - 1
+        piece_start = start + mapping[i][0]
+        piece_end = start + mapping[last][1]
+        pieces.append((piece_start, piece_end, np.asarray(ids[i:i + budget], dtype=np.int32)))
+    return pieces
+
+
+def chunk_by_tokens(content, sentences, tokens_per_chunk=512, overlap_sentences=0, model_type="accurate",
+                    max_length=512):
+    """
+    Packs consecutive sentences into chunks of up to `tokens_per_chunk` tokens of the
+    model's tokenizer, so that no chunk is truncated and few model calls are wasted
+    on tiny inputs.
+
+    A sentence longer than the budget is cut at token boundaries into several units;
+    chunks starting inside such a sentence have the IDs of the cut, which can differ
+    from tokenizing their text at once.
+    With `overlap_sentences`, each chunk starts with the last sentences of the
+    previous one (as long as the chunk still advances by at least one sentence).
+    Args:
+        content (str): The text the sentences were split from.
+        sentences (list[str]): Sentences of the text, in order.
+        tokens_per_chunk (int): Maximum tokens per chunk, including special tokens.
+        overlap_sentences (int): Sentences repeated at the start of the next chunk.
+        model_type (str): Model type whose tokenizer is used ("fast" or "accurate").
+        max_length (int): Model input limit; `tokens_per_chunk` is capped to it.
+    Returns:
+        pd.DataFrame: Like chunk_by_sentences ('chunk', 'start', 'end' columns), plus
+            the model inputs of each chunk in 'input_ids'.
+    """
+    tokenizer = get_tokenizer(model_type)
+    budget = min(tokens_per_chunk, max_length) - tokenizer.num_special_tokens_to_add(pair=False)
+    if budget <= 0:
+        raise ValueError(f"tokens_per_chunk must leave room for text tokens, got {tokens_per_chunk}")
+
+    # (start, end, token IDs, sentence) of each sentence, or of each piece of a long sentence (sentence None)
+    units = []
+    for sentence, (start, end), ids in zip(sentences, sentence_offsets(content, sentences),
+                                           encode_sentences(sentences, model_type)):
+        if len(ids) <= budget:
+            units.append((start, end, ids, sentence))
+        else:
+            units.extend((*piece, None) for piece in _split_long_sentence(tokenizer, sentence, start, budget))
+
+    chunks, starts, ends, input_ids = [], [], [], []
+    i = 0
+    while i < len(units):
+        # The first sentence of a chunk is encoded without its leading space (see encode_sentences)
+        first = units[i][2]
+        if units[i][3] is not None:
+            first = encode_sentences([units[i][3]], model_type, leading_space=False)[0][:budget]
+        j, size = i + 1, len(first)
+        while j < len(units) and size + len(units[j][2]) <= budget:
+            size += len(units[j][2])
+            j += 1
+        start, end = units[i][0], units[j - 1][1]
+        chunks.append(content[start:end])
+        starts.append(start)
+        ends.append(end)
+        joined = np.concatenate([first, *(ids for _, _, ids, _ in units[i + 1:j])])
+        input_ids.append(tokenizer.build_inputs_with_special_tokens(joined.tolist()))
+        if j == len(units):
+            break
+        i = max(j - overlap_sentences, i + 1)
+
+    return pd.DataFrame({'chunk': chunks, 'start': starts, 'end': ends, 'input_ids': input_ids})
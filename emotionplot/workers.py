@@ -0,0 +1,105 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from threading import Lock
+
+import torch
+
+from emotionplot.metrics import request_timings, current_timings, merge_counters
+from emotionplot.model import predict_probs, get_model, get_tokenizer
+from emotionplot.params import INFERENCE_WORKERS, THREADS_PER_WORKER
+from emotionplot.processes import process_context
+
+# Shards per worker, so that a slow shard does not leave the other workers idle
+SHARDS_PER_WORKER = 4
+
+
+def _init_worker(threads, preload, backend):
+    torch.set_num_threads(threads)
+    for model_type in preload:
+        get_tokenizer(model_type)
+        get_model(model_type, backend)
+
+
+def _predict_shard(texts, input_ids, model_type, backend, batch_size, max_tokens):
+    # Counters of the shard go back to the caller's request breakdown
+    with request_timings() as timings:
+        probs = predict_probs(texts, model_type, batch_size=batch_size, max_tokens=max_tokens,
+                              input_ids=input_ids, backend=backend)
+    return probs.numpy(), timings["counters"]
+
+
+class InferencePool:
+    """
+    Shards the chunks of one text across worker processes that each hold a model copy.
+
+    Workers are started with `forkserver` or `spawn` (see processes.process_context),
+    never forked from the calling thread. Each worker loads the models in `preload`
+    when it starts, and any other model on first use. Models registered in process (ModelRegistry.register)
+    are not seen by the workers.
+    """
+
+    def __init__(self, num_workers=2, threads_per_worker=0, preload=("accurate",), backend=None):
+        self.num_workers = num_workers
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // num_workers)
+
+        # Workers forked from the server start with torch and transformers imported
+        self.executor = ProcessPoolExecutor(
+            max_workers=num_workers,
+            mp_context=process_context(preload=["emotionplot.model"]),
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker, tuple(preload), backend),
+        )
+
+    def predict_probs(self, texts, model_type="accurate", batch_size=32, max_tokens=8192,
+                      input_ids=None, backend=None, progress_callback=None):
+        """
+        Same as emotionplot.model.predict_probs, run across the worker processes.
+        Returns:
+            torch.Tensor: Probabilities of shape (len(texts), num_labels), in input order.
+        """
+        if not texts:
+            return predict_probs(texts, model_type, backend=backend)
+
+        num_shards = min(len(texts), self.num_workers * SHARDS_PER_WORKER)
+        bounds = [len(texts) * i // num_shards for i in range(num_shards + 1)]
+
+        futures = [
+            self.executor.submit(
+                _predict_shard,
+                texts[start:end],
+                input_ids[start:end] if input_ids is not None else None,
+                model_type, backend, batch_size, max_tokens,
+            )
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        shards, done = [], 0
+        timings = current_timings()
+        for future in futures:
+            probs, counters = future.result()
+            merge_counters(timings, counters)
+            shards.append(torch.from_numpy(probs))
+            done += len(shards[-1])
+            if progress_callback is not None:
+                progress_callback(done, len(texts))
+        return torch.cat(shards, dim=0)
+
+    def shutdown(self):
+        self.executor.shutdown()
+
+
+_pool = None
+_pool_lock = Lock()
+
+
+def get_inference_pool():
+    """
+    Returns the shared inference pool configured by INFERENCE_WORKERS and
+    THREADS_PER_WORKER, or None when inference runs in the calling thread.
+    """
+    global _pool
+    if INFERENCE_WORKERS < 1:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = InferencePool(INFERENCE_WORKERS, THREADS_PER_WORKER)
+        return _pool
@@ -0,0 +1,53 @@
+"""
+Compares inference backends: throughput, latency and top-3 drift against fp32.
+
+Usage:
+    python scripts/benchmark_backends.py --url https://www.gutenberg.org/ebooks/1342 --max-chunks 2000
+"""
+import argparse
+import time
+
+import torch
+
+from emotionplot.backends import BACKENDS
+from emotionplot.data import get_novel, clean_gutenberg_text
+from emotionplot.preprocessing import preprocessing, chunk_by_sentences
+from emotionplot.model import predict_probs, get_model
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="https://www.gutenberg.org/ebooks/1342")
+    parser.add_argument("--models", nargs="+", default=["fast", "accurate"])
+    parser.add_argument("--backends", nargs="+", default=BACKENDS)
+    parser.add_argument("--max-chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    text = preprocessing(clean_gutenberg_text(get_novel(args.url)))
+    texts = chunk_by_sentences(text, 3)["chunk"].tolist()[:args.max_chunks]
+    print(f"{len(texts)} chunks, threads={torch.get_num_threads()}")
+
+    for model_type in args.models:
+        reference = None
+        for backend in args.backends:
+            get_model(model_type, backend)  # exclude load/export time
+
+            start = time.perf_counter()
+            probs = predict_probs(texts, model_type, batch_size=args.batch_size, backend=backend)
+            elapsed = time.perf_counter() - start
+
+            if reference is None:
+                reference = probs
+            top1 = (probs.argmax(-1) == reference.argmax(-1)).float().mean().item()
+            top3 = [set(a.tolist()) == set(b.tolist()) for a, b in
+                    zip(torch.topk(probs, 3).indices, torch.topk(reference, 3).indices)]
+
+            print(f"{model_type:9s} {backend:6s} {len(texts) / elapsed:8.1f} chunks/s  "
+                  f"{1000 * elapsed / len(texts):7.2f} ms/chunk  "
+                  f"top1 agree {top1:6.1%}  top3 set agree {sum(top3) / len(top3):6.1%}  "
+                  f"max |diff| {(probs - reference).abs().max().item():.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Compares fixed-size batching with length-bucketed batching in predict_probs.
+
+Usage:
+    python scripts/benchmark_batching.py --url https://www.gutenberg.org/ebooks/2701 --model accurate
+"""
+import argparse
+import time
+
+import torch
+
+from emotionplot.data import get_novel, clean_gutenberg_text
+from emotionplot.preprocessing import preprocessing, chunk_by_sentences
+from emotionplot.model import predict_probs
+
+
+def time_batching(texts, model_type, batching, batch_size, max_tokens):
+    start = time.perf_counter()
+    probs = predict_probs(texts, model_type, batch_size=batch_size,
+                          max_tokens=max_tokens, batching=batching)
+    return probs, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="https://www.gutenberg.org/ebooks/2701")
+    parser.add_argument("--model", default="accurate", choices=["fast", "accurate"])
+    parser.add_argument("--sentences-per-chunk", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-tokens", type=int, default=8192)
+    args = parser.parse_args()
+
+    text = preprocessing(clean_gutenberg_text(get_novel(args.url)))
+    texts = chunk_by_sentences(text, args.sentences_per_chunk)["chunk"].tolist()
+    print(f"{len(texts)} chunks, model={args.model}, threads={torch.get_num_threads()}")
+
+    fixed, fixed_s = time_batching(texts, args.model, "fixed", args.batch_size, args.max_tokens)
+    bucketed, bucketed_s = time_batching(texts, args.model, "bucketed", args.batch_size, args.max_tokens)
+
+    print(f"fixed     {fixed_s:8.1f}s  {len(texts) / fixed_s:8.1f} chunks/s")
+    print(f"bucketed  {bucketed_s:8.1f}s  {len(texts) / bucketed_s:8.1f} chunks/s")
+    print(f"speedup   {fixed_s / bucketed_s:8.2f}x")
+    print(f"max |diff| {(fixed - bucketed).abs().max().item():.2e}")
+
+
+if __name__ == "__main__":
+    main()
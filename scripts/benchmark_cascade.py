@@ -0,0 +1,93 @@
+"""
+Compares the cascade model with full runs of the fast and accurate models.
+
+For each threshold setting, runs predict_emotions(model_type="cascade") on the same
+chunks and reports its time, the fraction of chunks escalated to the accurate model,
+and the top-1 agreement with a full accurate run (the reference). Uses stand-in
+models when the Hugging Face weights are not cached (see emotionplot.standin); the
+agreement numbers are only meaningful with the real models.
+
+Usage:
+    python scripts/benchmark_cascade.py --url https://www.gutenberg.org/ebooks/1661 --max-chunks 2000
+    python scripts/benchmark_cascade.py --confidences 0.3 0.5 0.7 --margins 0 0.2
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_suite import load_bodies  # noqa: E402
+from emotionplot.data import get_novel, clean_gutenberg_text  # noqa: E402
+from emotionplot.model import CASCADE, MODEL_NAMES, registry, get_model, predict_emotions  # noqa: E402
+from emotionplot.preprocessing import preprocessing, split_sentences, chunk_by_sentences  # noqa: E402
+from emotionplot.standin import hf_weights_cached, register_standin_models  # noqa: E402
+from emotionplot.tokenization import build_chunk_inputs  # noqa: E402
+
+
+def timed_predict(df_chunks, model_type, backend, **kwargs):
+    df = df_chunks.copy()
+    start = time.perf_counter()
+    df, probs = predict_emotions(df, model_type=model_type, backend=backend, return_probs=True, **kwargs)
+    return time.perf_counter() - start, df, probs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Gutenberg book to use instead of the bundled texts")
+    parser.add_argument("--sentences-per-chunk", type=int, default=3)
+    parser.add_argument("--max-chunks", type=int, default=0, help="Use the first N chunks (0 = all)")
+    parser.add_argument("--backend", default=None)
+    parser.add_argument("--standin", default="auto", choices=["auto", "always", "never"])
+    parser.add_argument("--confidences", type=float, nargs="+", default=[0.3, 0.5, 0.7])
+    parser.add_argument("--margins", type=float, nargs="+", default=[0.0, 0.2])
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    bodies = load_bodies()
+    standin = args.standin == "always" or (
+        args.standin == "auto" and not all(hf_weights_cached(MODEL_NAMES[m]) for m in CASCADE))
+    if standin:
+        register_standin_models(registry, bodies)
+
+    text = preprocessing(clean_gutenberg_text(get_novel(args.url)) if args.url else " ".join(bodies))
+    sentences = split_sentences(text)
+    df_chunks = chunk_by_sentences(text, args.sentences_per_chunk, sentences=sentences)
+    df_chunks["input_ids"] = build_chunk_inputs(sentences, args.sentences_per_chunk, model_type=CASCADE[0])
+    if args.max_chunks:
+        df_chunks = df_chunks.head(args.max_chunks)
+    print(f"{len(df_chunks)} chunks, models: {'stand-in' if standin else ', '.join(MODEL_NAMES[m] for m in CASCADE)}")
+    for model_type in CASCADE:
+        get_model(model_type, args.backend)
+
+    # The cascade's escalated chunks are tokenized on the fly, so the accurate reference is too
+    fast_seconds, df_fast, _ = timed_predict(df_chunks, "fast", args.backend)
+    accurate_seconds, df_accurate, _ = timed_predict(df_chunks.drop(columns="input_ids"), "accurate", args.backend)
+    reference = df_accurate["Predicted_Emotion"].to_numpy()
+
+    rows = [{"setting": "fast", "seconds": fast_seconds, "escalated": 0.0,
+             "agreement": float(np.mean(df_fast["Predicted_Emotion"].to_numpy() == reference))},
+            {"setting": "accurate", "seconds": accurate_seconds, "escalated": 1.0, "agreement": 1.0}]
+    for confidence in args.confidences:
+        for margin in args.margins:
+            seconds, df, _ = timed_predict(df_chunks, "cascade", args.backend, cascade_min_confidence=confidence,
+                                           cascade_min_margin=margin)
+            rows.append({
+                "setting": f"cascade conf<{confidence:g} margin<{margin:g}",
+                "seconds": seconds,
+                "escalated": df.attrs["escalated_fraction"],
+                "agreement": float(np.mean(df["Predicted_Emotion"].to_numpy() == reference)),
+            })
+
+    results = pd.DataFrame(rows)
+    results["cost_vs_accurate"] = results["seconds"] / accurate_seconds
+    print(results.to_string(index=False, float_format=lambda v: f"{v:.3f}"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Compares peak memory and time of the in-memory ingestion path with streaming ingestion.
+
+Both paths stop at chunking (no inference). The book is repeated --copies times into a
+temporary file to simulate a very large text; a directory runs every .txt file in it.
+
+Usage:
+    python scripts/benchmark_ingestion.py --source rawdata/pg2600.txt --copies 1 10 50
+    python scripts/benchmark_ingestion.py --source rawdata/mirror/
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from emotionplot.data import clean_gutenberg_text
+from emotionplot.ingest import iter_source_paths, stream_chunks
+from emotionplot.preprocessing import preprocessing, chunk_by_sentences
+
+
+def in_memory_chunks(path):
+    with open(path, encoding="utf-8", errors="replace") as f:
+        raw_text = f.read()
+    return len(chunk_by_sentences(preprocessing(clean_gutenberg_text(raw_text)), 3))
+
+
+def streaming_chunks(path):
+    return sum(1 for _ in stream_chunks(path, 3))
+
+
+def profile(fn, path):
+    tracemalloc.start()
+    start = time.perf_counter()
+    num_chunks = fn(path)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return num_chunks, elapsed, peak / 1e6
+
+
+def repeated_book(path, copies):
+    """Writes the body of the book `copies` times between a single pair of markers."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        body = clean_gutenberg_text(f.read())
+    tmp = tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False, encoding="utf-8")
+    with tmp:
+        tmp.write("*** START OF THE PROJECT GUTENBERG EBOOK BENCHMARK ***\n")
+        for _ in range(copies):
+            tmp.write(body + "\n\n")
+        tmp.write("*** END OF THE PROJECT GUTENBERG EBOOK BENCHMARK ***\n")
+    return tmp.name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", required=True, help="Local text file or directory of .txt files")
+    parser.add_argument("--copies", nargs="+", type=int, default=[1, 10])
+    args = parser.parse_args()
+
+    for path in iter_source_paths(args.source):
+        for copies in args.copies:
+            big = repeated_book(path, copies)
+            size_mb = os.path.getsize(big) / 1e6
+            for name, fn in [("in-memory", in_memory_chunks), ("streaming", streaming_chunks)]:
+                num_chunks, elapsed, peak_mb = profile(fn, big)
+                print(f"{os.path.basename(path)} x{copies:<3d} ({size_mb:6.1f} MB)  {name:9s}  "
+                      f"{num_chunks:8d} chunks  {elapsed:7.2f}s  peak {peak_mb:8.1f} MB")
+            os.remove(big)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Compares the NRC lexicon engine (emotionplot.lexicon) with one NRCLex object per
+sentence, as extract_emotional_words used to do.
+
+First checks that the engine returns exactly NRCLex's affect_list on a reference
+set of sentences (NRCLex(text) for nrclex 3.x, NRCLex().load_raw_text(text) with
+lemmatized lookups for nrclex 4.x), and reports how often the faster "regex"
+tokenizer agrees with it. Then times NRCLex and the engine on the whole corpus.
+
+The corpus is the sentences of the bundled benchmark texts (or a Gutenberg book /
+local file) repeated until it reaches --sentences.
+
+Usage:
+    python scripts/benchmark_lexicon.py --sentences 100000 --workers 2 4
+    python scripts/benchmark_lexicon.py --url https://www.gutenberg.org/ebooks/2600 --reference 5000
+"""
+import argparse
+import os
+import time
+
+from nrclex import NRCLex
+
+from emotionplot.data import get_novel, clean_gutenberg_text
+from emotionplot.lexicon import LEXICON_TOKENIZERS, analyze_sentences, get_lexicon_index, nrclex_lemmatizes
+from emotionplot.preprocessing import preprocessing, split_sentences
+
+TEXT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_texts")
+
+# nrclex 4.x lemmatizes words (load_raw_text); nrclex 3.x looks them up as they are
+LEMMATIZED = nrclex_lemmatizes()
+
+
+def nrclex_affect_list(sentence):
+    if LEMMATIZED:
+        emotion_obj = NRCLex()
+        emotion_obj.load_raw_text(sentence)
+    else:
+        emotion_obj = NRCLex(sentence)
+    return emotion_obj.affect_list
+
+
+def load_sentences(url=None, file=None):
+    if file:
+        with open(file, encoding="utf-8") as f:
+            texts = [clean_gutenberg_text(f.read())]
+    elif url:
+        texts = [clean_gutenberg_text(get_novel(url))]
+    else:
+        texts = []
+        for name in sorted(os.listdir(TEXT_DIR)):
+            if name.endswith(".txt"):
+                with open(os.path.join(TEXT_DIR, name), encoding="utf-8") as f:
+                    texts.append(clean_gutenberg_text(f.read()))
+    return [sentence for text in texts for sentence in split_sentences(preprocessing(text))]
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Gutenberg book to use instead of the bundled texts")
+    parser.add_argument("--file", help="Local text file to use instead of the bundled texts")
+    parser.add_argument("--sentences", type=int, default=50000, help="Corpus size, in sentences")
+    parser.add_argument("--reference", type=int, default=2000, help="Sentences checked against NRCLex")
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    book = load_sentences(args.url, args.file)
+    corpus = (book * (args.sentences // len(book) + 1))[:args.sentences]
+    reference = book[:args.reference]
+    print(f"corpus: {len(corpus)} sentences, reference: {len(reference)} sentences, "
+          f"nrclex {'4.x (lemmatized)' if LEMMATIZED else '3.x'}")
+
+    # Exactness on the reference set
+    expected = [nrclex_affect_list(sentence) for sentence in reference]
+    for tokenizer in LEXICON_TOKENIZERS:
+        result = analyze_sentences(reference, tokenizer=tokenizer, lemmatized=LEMMATIZED)
+        matches = sum(a == b for a, b in zip(result["affect_lists"], expected))
+        print(f"{tokenizer:6s} tokenizer: {matches}/{len(reference)} sentences identical to NRCLex")
+        if tokenizer == "nltk":
+            assert matches == len(reference), "the nltk tokenizer must reproduce NRCLex exactly"
+
+    # Speed on the whole corpus
+    get_lexicon_index()
+    baseline, _ = timed(lambda: [nrclex_affect_list(sentence) for sentence in corpus])
+    print(f"{'NRCLex per sentence':24s} {baseline:7.2f}s  {len(corpus) / baseline:9.0f} sentences/s")
+    runs = [(tokenizer, 0) for tokenizer in LEXICON_TOKENIZERS]
+    runs += [(tokenizer, workers) for workers in args.workers for tokenizer in LEXICON_TOKENIZERS]
+    for tokenizer, workers in runs:
+        seconds, _ = timed(lambda: analyze_sentences(corpus, tokenizer=tokenizer, lemmatized=LEMMATIZED,
+                                                     workers=workers, batch_size=5000))
+        label = tokenizer + (f" x{workers}" if workers else "")
+        print(f"{label:24s} {seconds:7.2f}s  {len(corpus) / seconds:9.0f} sentences/s  x{baseline / seconds:5.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Checks that the single-pass normalization matches the original implementations
+exactly, and compares their speed on a large corpus.
+
+The corpus is a Gutenberg book (or a local file) repeated until it reaches --size-mb.
+
+Usage:
+    python scripts/benchmark_normalization.py --url https://www.gutenberg.org/ebooks/2600 --size-mb 50
+    python scripts/benchmark_normalization.py --file rawdata/war_and_peace.txt
+"""
+import argparse
+import random
+import re
+import time
+
+from emotionplot.data import get_novel
+from emotionplot.normalization import normalize_text, normalize_whitespace, iter_normalized_blocks
+
+
+def reference_preprocessing(content):
+    """The original emotionplot.preprocessing.preprocessing."""
+    content = content.lower()
+    content = ''.join([char for char in content if not char.isdigit()])
+    punctuation = ['!','"','#','$','%','&','(',')',
+                   '*','+','-','/',':',';','<',
+                   '=','>','@',"\\",'"]"','^','_']
+    for punct in punctuation:
+        content = content.replace(punct, ' ')
+    return ' '.join(content.split())
+
+
+def reference_whitespace(content):
+    """The original whitespace passes of emotionplot.data.clean_gutenberg_text."""
+    content = re.sub(r'\r\n', '\n', content)
+    content = re.sub(r'\n{2,}', '\n\n', content)
+    content = re.sub(r'[ \t]+', ' ', content)
+    return content.strip()
+
+
+def check_equivalence(corpus, samples=20000):
+    """Compares outputs on the corpus and on random strings of tricky characters."""
+    alphabet = list('aAbZΣσς \t\n\r\x0b\xa0  1²٣!"]#-_^\\é.,?İ’—') + ['\r\n']
+    rng = random.Random(0)
+    cases = [corpus] + [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 60))) for _ in range(samples)]
+    for text in cases:
+        expected = reference_preprocessing(text)
+        assert normalize_text(text) == expected, repr(text[:200])
+        size = rng.randint(1, 4096)
+        blocks = (text[i:i + size] for i in range(0, len(text), size))
+        assert " ".join(iter_normalized_blocks(blocks)) == expected, repr(text[:200])
+        assert normalize_whitespace(text) == reference_whitespace(text), repr(text[:200])
+    print(f"equivalence: OK on {len(cases)} inputs")
+
+
+def best_of(fn, text, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="https://www.gutenberg.org/ebooks/2600")
+    parser.add_argument("--file", help="Local text file to use instead of downloading --url")
+    parser.add_argument("--size-mb", type=float, default=50)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            book = f.read()
+    else:
+        book = get_novel(args.url)
+    corpus = book * max(1, int(args.size_mb * 1e6 / len(book)))
+
+    check_equivalence(book)
+    print(f"corpus: {len(corpus) / 1e6:.1f}M characters")
+
+    for name, reference, fast in [
+        ("preprocessing", reference_preprocessing, normalize_text),
+        ("whitespace", reference_whitespace, normalize_whitespace),
+    ]:
+        before = best_of(reference, corpus)
+        after = best_of(fast, corpus)
+        print(f"{name:14s} original {before:7.2f}s  single-pass {after:7.2f}s  speedup {before / after:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""
+Load test of the cross-request inference scheduler (emotionplot.scheduler).
+
+Simulates concurrent /analyze/ requests in one process: each client thread sends
+requests of a random number of chunks (drawn from the bundled benchmark texts),
+one after the other. Every run is done twice:
+  - direct: each request calls predict_probs on its own, as without the scheduler,
+  - scheduler: requests share forward passes through an InferenceScheduler.
+Reports request latency (p50, p99), throughput and the mean rows per forward pass.
+Uses stand-in models when the Hugging Face weights are not cached (see
+emotionplot.standin).
+
+Usage:
+    python scripts/benchmark_scheduler.py --concurrency 1 4 16 --requests 64
+    python scripts/benchmark_scheduler.py --model accurate --max-batch-size 64 --max-wait-ms 5
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from benchmark_suite import load_bodies  # noqa: E402
+from emotionplot.model import MODEL_NAMES, registry, get_model, get_tokenizer, predict_probs  # noqa: E402
+from emotionplot.preprocessing import preprocessing, split_sentences, chunk_by_sentences  # noqa: E402
+from emotionplot.scheduler import InferenceScheduler  # noqa: E402
+from emotionplot.standin import hf_weights_cached, register_standin_models  # noqa: E402
+
+
+def build_requests(chunks, num_requests, min_chunks, max_chunks, seed=0):
+    """Returns `num_requests` lists of consecutive chunks, of random sizes."""
+    rng = random.Random(seed)
+    requests = []
+    for _ in range(num_requests):
+        size = rng.randint(min_chunks, max_chunks)
+        start = rng.randrange(max(1, len(chunks) - size))
+        requests.append(chunks[start:start + size])
+    return requests
+
+
+def run_load(requests, concurrency, predict):
+    """Sends the requests from `concurrency` threads. Returns the latency of each request and the wall time."""
+    def send(texts):
+        start = time.perf_counter()
+        predict(texts)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(send, requests))
+    return np.array(latencies), time.perf_counter() - start
+
+
+def report(label, requests, latencies, wall, extra=""):
+    chunks = sum(len(texts) for texts in requests)
+    print(f"{label:28s} p50 {1000 * np.percentile(latencies, 50):8.1f} ms  p99 {1000 * np.percentile(latencies, 99):8.1f} ms  "
+          f"{len(requests) / wall:6.2f} req/s  {chunks / wall:8.1f} chunks/s{extra}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="fast", choices=list(MODEL_NAMES))
+    parser.add_argument("--standin", default="auto", choices=["auto", "always", "never"])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=48, help="Requests per run")
+    parser.add_argument("--min-chunks", type=int, default=1)
+    parser.add_argument("--max-chunks", type=int, default=40)
+    parser.add_argument("--batch-size", type=int, default=32, help="Batch size of the direct runs")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    torch.manual_seed(0)
+    bodies = load_bodies()
+    standin = args.standin == "always" or (args.standin == "auto" and not hf_weights_cached(MODEL_NAMES[args.model]))
+    if standin:
+        register_standin_models(registry, bodies)
+    print(f"model: {args.model} ({'stand-in' if standin else MODEL_NAMES[args.model]}), "
+          f"threads={torch.get_num_threads()}")
+
+    text = preprocessing(" ".join(bodies))
+    chunks = chunk_by_sentences(text, 3, sentences=split_sentences(text))["chunk"].tolist()
+    requests = build_requests(chunks, args.requests, args.min_chunks, args.max_chunks)
+    tokenizer = get_tokenizer(args.model)
+    get_model(args.model)
+
+    # Requests arrive tokenized, as from the pipeline (build_chunk_inputs)
+    tokenized = {text: ids for text, ids in zip(chunks, tokenizer(chunks, truncation=True, max_length=512)["input_ids"])}
+
+    def direct(texts):
+        return predict_probs(texts, args.model, batch_size=args.batch_size,
+                             input_ids=[tokenized[text] for text in texts])
+
+    for concurrency in args.concurrency:
+        latencies, wall = run_load(requests, concurrency, direct)
+        report(f"direct     x{concurrency}", requests, latencies, wall)
+
+        scheduler = InferenceScheduler(max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+        latencies, wall = run_load(requests, concurrency, lambda texts: scheduler.predict_probs(
+            texts, args.model, input_ids=[tokenized[text] for text in texts]))
+        stats = next(iter(scheduler.stats().values()))
+        report(f"scheduler  x{concurrency}", requests, latencies, wall,
+               f"  {stats['mean_batch_size']:5.1f} rows/batch")
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares the speed of the sentence segmenters and how closely their sentence
+boundaries agree with NLTK's Punkt (the reference).
+
+The corpus is a preprocessed Gutenberg book (or local file) repeated until it
+reaches --size-mb.
+
+Usage:
+    python scripts/benchmark_segmentation.py --url https://www.gutenberg.org/ebooks/2600 --size-mb 20
+    python scripts/benchmark_segmentation.py --file rawdata/war_and_peace.txt --workers 2 4 8
+"""
+import argparse
+import time
+
+from emotionplot.data import get_novel, clean_gutenberg_text
+from emotionplot.preprocessing import preprocessing
+from emotionplot.segmentation import PunktSegmenter, RegexSegmenter, ParallelSegmenter, boundary_agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="https://www.gutenberg.org/ebooks/2600")
+    parser.add_argument("--file", help="Local text file to use instead of downloading --url")
+    parser.add_argument("--size-mb", type=float, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            book = clean_gutenberg_text(f.read())
+    else:
+        book = get_novel(args.url)
+    book = preprocessing(book)
+    corpus = " ".join([book] * max(1, int(args.size_mb * 1e6 / len(book))))
+    print(f"corpus: {len(corpus) / 1e6:.1f}M characters")
+
+    segmenters = [PunktSegmenter(), RegexSegmenter()]
+    for workers in args.workers:
+        segmenters += [ParallelSegmenter("punkt", workers), ParallelSegmenter("regex", workers)]
+
+    reference = None
+    for segmenter in segmenters:
+        if isinstance(segmenter, ParallelSegmenter):
+            # Start the worker processes outside of the timed run
+            segmenter.span_tokenize(corpus[:2 * segmenter.min_piece_chars + 1])
+        start = time.perf_counter()
+        spans = segmenter.span_tokenize(corpus)
+        elapsed = time.perf_counter() - start
+        reference = reference or spans
+        agreement = boundary_agreement(reference, spans)
+        label = segmenter.name + (f" x{segmenter.workers}" if isinstance(segmenter, ParallelSegmenter) else "")
+        print(
+            f"{label:20s} {elapsed:7.2f}s  {len(corpus) / 1e6 / elapsed:6.1f} MB/s  {len(spans):8d} sentences  "
+            f"P {agreement['precision']:.3f}  R {agreement['recall']:.3f}  F1 {agreement['f1']:.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Measures cold-start latency: importing the API module, then the first prediction.
+
+Each measurement runs in a fresh interpreter so nothing is already imported or loaded.
+
+Usage:
+    python scripts/benchmark_startup.py --model fast --runs 3
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+import api.api
+imported = time.perf_counter()
+
+import pandas as pd
+from emotionplot.model import predict_emotions
+predict_emotions(pd.DataFrame({"chunk": ["it was the best of times, it was the worst of times."]}), model_type=%r)
+done = time.perf_counter()
+print(json.dumps({"import_s": imported - start, "first_request_s": done - imported}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="fast", choices=["fast", "accurate"])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    for run in range(args.runs):
+        out = subprocess.run([sys.executable, "-c", CHILD % args.model],
+                             capture_output=True, text=True, check=True).stdout
+        timings = json.loads(out.strip().splitlines()[-1])
+        total = timings["import_s"] + timings["first_request_s"]
+        print(f"run {run}: import {timings['import_s']:6.2f}s  "
+              f"first request {timings['first_request_s']:6.2f}s  total {total:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
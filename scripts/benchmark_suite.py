@@ -0,0 +1,243 @@
+"""
+Offline benchmark suite covering every stage of the /analyze/ pipeline.
+
+Runs on the public-domain excerpts bundled in scripts/bench_texts/, repeated to
+each size of a scaling sweep. When the Hugging Face weights are not cached, tiny
+randomly initialized stand-in models are registered instead (see
+emotionplot.standin), so the inference numbers measure the pipeline overhead
+rather than the real models; the results record which models were used.
+
+For each text size, times clean_gutenberg_text, preprocessing, sentence splitting,
+chunk_by_sentences, tokenization (cold sentence-ID cache), predict_emotions and the
+JSON serialization of the /analyze/ payload. predict_emotions is also timed for
+every backend and batch size on the largest text. Results are written as JSON so
+that two commits can be compared with --compare.
+
+Usage:
+    python scripts/benchmark_suite.py --out outputs/benchmarks/$(git rev-parse --short HEAD).json
+    python scripts/benchmark_suite.py --sizes-kb 50 200 800 --backends torch int8 --batch-sizes 8 32
+    python scripts/benchmark_suite.py --compare outputs/benchmarks/old.json outputs/benchmarks/new.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import torch
+import transformers
+
+from emotionplot import tokenization
+from emotionplot.backends import BACKENDS
+from emotionplot.data import START_MARKER, END_MARKER, clean_gutenberg_text
+from emotionplot.model import MODEL_NAMES, registry, get_model, predict_emotions
+from emotionplot.pipeline import _response_header
+from emotionplot.preprocessing import preprocessing, split_sentences, chunk_by_sentences
+from emotionplot.standin import hf_weights_cached, register_standin_models
+
+TEXT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench_texts")
+
+
+def load_bodies(text_dir=TEXT_DIR):
+    """Returns the main content of each bundled text."""
+    bodies = []
+    for name in sorted(os.listdir(text_dir)):
+        if name.endswith(".txt"):
+            with open(os.path.join(text_dir, name), encoding="utf-8") as f:
+                bodies.append(clean_gutenberg_text(f.read()))
+    return bodies
+
+
+def build_raw_text(bodies, size_chars):
+    """Builds a Gutenberg-formatted raw text of about `size_chars` characters from the bodies."""
+    start = START_MARKER.replace("\\", "") + " BENCHMARK CORPUS ***"
+    end = END_MARKER.replace("\\", "") + " BENCHMARK CORPUS ***"
+    parts, length, i = [], 0, 0
+    while length < size_chars:
+        body = bodies[i % len(bodies)].replace("\n", "\r\n")
+        parts.append(body)
+        length += len(body) + 4
+        i += 1
+    return f"Benchmark corpus header\r\n\r\n{start}\r\n\r\n" + "\r\n\r\n".join(parts) + f"\r\n\r\n{end}\r\n"
+
+
+def best_of(fn, repeat=3, setup=None):
+    """Runs fn() `repeat` times and returns the fastest time and the last result."""
+    timings, result = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def clear_token_cache():
+    tokenization._sentence_ids.clear()
+
+
+def bench_text_stages(raw, model_type, repeat):
+    """Times the CPU stages before inference. Returns the rows and the chunk DataFrame."""
+    rows = []
+
+    def record(stage, fn, setup=None, **extra):
+        seconds, result = best_of(fn, repeat, setup)
+        rows.append({"stage": stage, "size_chars": len(raw), "seconds": seconds, **extra})
+        return result
+
+    clean = record("clean_gutenberg_text", lambda: clean_gutenberg_text(raw))
+    preprocessed = record("preprocessing", lambda: preprocessing(clean))
+    sentences = record("split_sentences", lambda: split_sentences(preprocessed))
+    df_chunks = record("chunk_by_sentences", lambda: chunk_by_sentences(preprocessed, 3, sentences=sentences),
+                       sentences=len(sentences))
+    input_ids = record("tokenization", lambda: tokenization.build_chunk_inputs(sentences, 3, model_type=model_type),
+                       setup=clear_token_cache, chunks=len(df_chunks))
+    df_chunks["input_ids"] = input_ids
+    return rows, df_chunks
+
+
+def bench_inference(df_chunks, size_chars, model_type, backend, batch_size, repeat):
+    """Times predict_emotions (model load excluded). Returns the row and the scored DataFrame."""
+    get_model(model_type, backend)
+    seconds, df = best_of(lambda: predict_emotions(df_chunks.copy(), model_type=model_type, batch_size=batch_size,
+                                                   backend=backend), repeat)
+    row = {"stage": "predict_emotions", "size_chars": size_chars, "seconds": seconds,
+           "backend": backend, "batch_size": batch_size, "chunks": len(df_chunks),
+           "chunks_per_second": len(df_chunks) / seconds}
+    return row, df
+
+
+def bench_serialization(df, size_chars, model_type, backend, repeat):
+    """Times building and serializing the /analyze/ response payload."""
+    def serialize():
+        payload = _response_header("benchmark", 3, model_type, backend, len(df))
+        payload["emotions"] = df[["chunk", "Predicted_Emotion", "Top_3_Emotions"]].to_dict(orient="records")
+        return json.dumps(payload).encode()
+
+    seconds, data = best_of(serialize, repeat)
+    return {"stage": "serialize_payload", "size_chars": size_chars, "seconds": seconds,
+            "bytes": len(data)}
+
+
+def row_key(row):
+    """Identifies a measurement across runs, e.g. 'predict_emotions[backend=int8,batch_size=32]@200000'."""
+    params = ",".join(f"{k}={row[k]}" for k in ("backend", "batch_size") if k in row)
+    return f"{row['stage']}{f'[{params}]' if params else ''}@{row['size_chars']}"
+
+
+def scaling_exponents(rows):
+    """
+    Fits time ~ size^k per stage between the smallest and largest text of the
+    sweep (k = 1 is linear).
+    """
+    by_stage = {}
+    for row in rows:
+        if row.get("sweep"):
+            by_stage.setdefault(row["stage"], []).append(row)
+    exponents = {}
+    for stage, stage_rows in by_stage.items():
+        stage_rows.sort(key=lambda r: r["size_chars"])
+        first, last = stage_rows[0], stage_rows[-1]
+        if last["size_chars"] > first["size_chars"] and first["seconds"] > 0:
+            exponents[stage] = math.log(last["seconds"] / first["seconds"]) / math.log(last["size_chars"] / first["size_chars"])
+    return exponents
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    """Prints the time ratio new/old of every measurement present in both result files."""
+    with open(old_path) as f:
+        old = {row_key(row): row for row in json.load(f)["results"]}
+    with open(new_path) as f:
+        new = {row_key(row): row for row in json.load(f)["results"]}
+    for key in sorted(old.keys() & new.keys()):
+        ratio = new[key]["seconds"] / old[key]["seconds"] if old[key]["seconds"] else float("inf")
+        flag = "  <-- slower" if ratio > 1.1 else ("  faster" if ratio < 0.9 else "")
+        print(f"{key:70s} {old[key]['seconds']:9.4f}s -> {new[key]['seconds']:9.4f}s  x{ratio:5.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="fast", choices=list(MODEL_NAMES))
+    parser.add_argument("--standin", default="auto", choices=["auto", "always", "never"],
+                        help="Use stand-in models: when the HF weights are not cached (auto), always or never")
+    parser.add_argument("--sizes-kb", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--backends", nargs="+", default=["torch", "int8"], choices=BACKENDS)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[8, 32])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=None, help="Result file (default outputs/benchmarks/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    torch.manual_seed(0)
+    bodies = load_bodies()
+    standin = args.standin == "always" or (args.standin == "auto" and not hf_weights_cached(MODEL_NAMES[args.model]))
+    if standin:
+        register_standin_models(registry, bodies)
+    print(f"model: {args.model} ({'stand-in' if standin else MODEL_NAMES[args.model]}), "
+          f"threads={torch.get_num_threads()}")
+
+    results = []
+    sizes = sorted(1000 * kb for kb in args.sizes_kb)
+    for size in sizes:
+        raw = build_raw_text(bodies, size)
+        rows, df_chunks = bench_text_stages(raw, args.model, args.repeat)
+        row, df = bench_inference(df_chunks, len(raw), args.model, args.backends[0], args.batch_sizes[-1], args.repeat)
+        rows += [row, bench_serialization(df, len(raw), args.model, args.backends[0], args.repeat)]
+        for row in rows:
+            row["sweep"] = True
+            print(f"{row_key(row):70s} {row['seconds']:9.4f}s")
+        results += rows
+
+    # Every backend and batch size on the largest text
+    for backend in args.backends:
+        for batch_size in args.batch_sizes:
+            if backend == args.backends[0] and batch_size == args.batch_sizes[-1]:
+                continue
+            row, _ = bench_inference(df_chunks, len(raw), args.model, backend, batch_size, args.repeat)
+            print(f"{row_key(row):70s} {row['seconds']:9.4f}s  {row['chunks_per_second']:8.1f} chunks/s")
+            results.append(row)
+
+    exponents = scaling_exponents(results)
+    for stage, exponent in exponents.items():
+        print(f"scaling {stage:24s} time ~ size^{exponent:.2f}")
+
+    out = args.out or os.path.join("outputs", "benchmarks", f"{git_commit() or 'results'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "model": args.model,
+                "standin": standin,
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "torch": torch.__version__,
+                "transformers": transformers.__version__,
+                "threads": torch.get_num_threads(),
+                "repeat": args.repeat,
+            },
+            "results": results,
+            "scaling_exponents": exponents,
+        }, f, indent=2)
+    print(f"results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Measures how inference throughput scales with the number of worker processes.
+
+Each worker count uses cpu_count // workers torch threads per worker unless
+--threads-per-worker is set.
+
+Usage:
+    python scripts/benchmark_workers.py --workers 1 2 4 8 --model accurate
+"""
+import argparse
+import os
+import time
+
+from emotionplot.data import get_novel, clean_gutenberg_text
+from emotionplot.preprocessing import preprocessing, chunk_by_sentences
+from emotionplot.workers import InferencePool
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="https://www.gutenberg.org/ebooks/1342")
+    parser.add_argument("--model", default="accurate", choices=["fast", "accurate"])
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--threads-per-worker", type=int, default=0)
+    parser.add_argument("--max-chunks", type=int, default=4000)
+    args = parser.parse_args()
+
+    text = preprocessing(clean_gutenberg_text(get_novel(args.url)))
+    texts = chunk_by_sentences(text, 3)["chunk"].tolist()[:args.max_chunks]
+    print(f"{len(texts)} chunks on {os.cpu_count()} cores, model={args.model}")
+
+    baseline = None
+    for num_workers in args.workers:
+        pool = InferencePool(num_workers, args.threads_per_worker, preload=(args.model,))
+        pool.predict_probs(texts[:num_workers], args.model)  # warm up the workers
+
+        start = time.perf_counter()
+        pool.predict_probs(texts, args.model)
+        elapsed = time.perf_counter() - start
+        pool.shutdown()
+
+        baseline = baseline or elapsed
+        print(f"{num_workers} workers x {pool.threads_per_worker} threads  "
+              f"{len(texts) / elapsed:8.1f} chunks/s  speedup {baseline / elapsed:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
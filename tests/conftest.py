@@ -0,0 +1,36 @@
+import random
+
+import pytest
+
+from emotionplot import tokenization
+from emotionplot.model import registry
+from emotionplot.standin import register_standin_models
+
+WORDS = ("the whale sea ship captain ahab ishmael harpoon deck storm night morning fear joy "
+         "anger sadness wonderful terrible old young man men said cried looked went came").split()
+
+
+def make_book(num_sentences=60, seed=0):
+    """A small text of random sentences over a fixed vocabulary."""
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(num_sentences):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(3, 20))]
+        sentences.append(" ".join(words).capitalize() + rng.choice([".", "!", "?"]))
+    return " ".join(sentences)
+
+
+@pytest.fixture(scope="module")
+def standin_models(tmp_path_factory):
+    """Serves small random stand-in models (see emotionplot.standin) as 'fast' and 'accurate' for a module."""
+    saved = {name: dict(getattr(registry, name)) for name in ("model_names", "_tokenizers", "_configs", "_factories")}
+    saved_models = registry._models.copy()
+    register_standin_models(registry, [make_book(seed=seed) for seed in range(3)],
+                            directory=str(tmp_path_factory.mktemp("standin")))
+    yield registry
+    for name, value in saved.items():
+        setattr(registry, name, value)
+    registry._models = saved_models
+    for model_type in ("fast", "accurate"):
+        for leading_space in (True, False):
+            tokenization._sentence_ids.pop((model_type, leading_space), None)
@@ -0,0 +1,119 @@
+import math
+
+import numpy as np
+import pytest
+
+from emotionplot.aggregation import bin_edges, bin_series, rolling_mean, lttb_indices, emotion_arcs
+from emotionplot.book_store import aggregate_sentence_probs
+
+
+def reference_lttb(y, threshold):
+    """Straightforward LTTB (Steinarsson, 2013) over the points (i, y[i])."""
+    n = len(y)
+    every = (n - 2) / (threshold - 2)
+    selected, a = [0], 0
+    for i in range(threshold - 2):
+        next_start = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        avg_x = sum(range(next_start, next_end)) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        start, end = int(math.floor(i * every)) + 1, int(math.floor((i + 1) * every)) + 1
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((a - avg_x) * (y[j] - y[a]) - (a - j) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    selected.append(n - 1)
+    return selected
+
+
+@pytest.mark.parametrize("n, num_points", [(10, 3), (100, 10), (1000, 200), (1001, 37), (5000, 4999)])
+def test_lttb_matches_reference(n, num_points):
+    y = np.random.default_rng(n).random(n)
+    indices = lttb_indices(y, num_points)
+    assert indices.tolist() == reference_lttb(y.tolist(), num_points)
+    assert len(indices) == num_points
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == n - 1
+
+
+def test_lttb_keeps_spikes():
+    y = np.zeros(1000)
+    y[[123, 456, 789]] = [1.0, -1.0, 0.5]
+    assert {123, 456, 789} <= set(lttb_indices(y, 20).tolist())
+
+
+@pytest.mark.parametrize("num_points", [0, 2, 50, 60])
+def test_lttb_returns_all_rows_when_nothing_to_drop(num_points):
+    assert lttb_indices(np.arange(50.0), num_points).tolist() == list(range(50))
+
+
+def reference_aggregate(sentence_spans, sentence_probs, chunk_spans):
+    rows = []
+    for chunk_start, chunk_end in chunk_spans:
+        overlapping = [i for i, (start, end) in enumerate(sentence_spans) if end > chunk_start and start < chunk_end]
+        weights = np.array([max(sentence_spans[i][1] - sentence_spans[i][0], 1) for i in overlapping], dtype=float)
+        rows.append((weights[:, None] * sentence_probs[overlapping]).sum(axis=0) / weights.sum())
+    return np.array(rows)
+
+
+def random_sentences(num_sentences, num_labels=5, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 80, num_sentences)
+    starts = np.concatenate([[0], np.cumsum(lengths + 1)[:-1]])
+    spans = np.stack([starts, starts + lengths], axis=1)
+    return spans, rng.dirichlet(np.ones(num_labels), num_sentences)
+
+
+def test_aggregate_sentence_probs_of_sentence_chunks():
+    spans, probs = random_sentences(100)
+    # A chunk per sentence gives back the sentence scores
+    np.testing.assert_allclose(aggregate_sentence_probs(spans, probs, spans), probs, rtol=1e-6)
+    # Chunks of 3 sentences, like chunk_by_sentences
+    chunks = [(spans[i][0], spans[min(i + 2, len(spans) - 1)][1]) for i in range(0, len(spans), 3)]
+    np.testing.assert_allclose(aggregate_sentence_probs(spans, probs, chunks),
+                               reference_aggregate(spans, probs, chunks), rtol=1e-5)
+
+
+def test_aggregate_sentence_probs_of_arbitrary_chunks():
+    spans, probs = random_sentences(200, seed=1)
+    rng = np.random.default_rng(2)
+    starts = rng.integers(0, spans[-1][1] - 1, 300)
+    chunks = np.stack([starts, np.minimum(starts + rng.integers(1, 500, 300), spans[-1][1])], axis=1)
+    # Keep chunks that overlap at least one sentence (not only the space between two)
+    chunks = [c for c in chunks if any(end > c[0] and start < c[1] for start, end in spans)]
+    result = aggregate_sentence_probs(spans, probs, chunks)
+    assert result.dtype == np.float32
+    np.testing.assert_allclose(result, reference_aggregate(spans, probs, chunks), rtol=1e-5)
+    np.testing.assert_allclose(result.sum(axis=1), 1.0, rtol=1e-5)
+
+
+def test_bin_series_and_edges():
+    values = np.arange(20, dtype=float).reshape(10, 2)
+    edges = bin_edges(10, num_bins=3)
+    assert edges.tolist() == [0, 3, 6]
+    np.testing.assert_allclose(bin_series(values, edges), [[2, 3], [8, 9], [15, 16]])
+    np.testing.assert_allclose(bin_series(values, bin_edges(10, group_size=5), reduce="sum"), [[20, 25], [70, 75]])
+    assert bin_edges(3, num_bins=10).tolist() == [0, 1, 2]
+
+
+def test_rolling_mean_truncates_windows_at_edges():
+    values = np.array([[0.0], [3.0], [6.0], [9.0]])
+    np.testing.assert_allclose(rolling_mean(values, 3), [[1.5], [3.0], [6.0], [7.5]])
+    np.testing.assert_allclose(rolling_mean(values, 1), values)
+
+
+def test_emotion_arcs_shapes():
+    probs = np.random.default_rng(0).dirichlet(np.ones(4), 500)
+    offsets = np.stack([np.arange(500) * 10, np.arange(500) * 10 + 9], axis=1)
+    labels = ["joy", "fear", "anger", "neutral"]
+    binned = emotion_arcs(probs, labels, offsets, bins=50, exclude_neutral=True)
+    assert binned["labels"] == ["joy", "fear", "anger"]
+    assert len(binned["x"]) == len(binned["position"]) == 50
+    assert all(len(series) == 50 for series in binned["values"])
+    lttb = emotion_arcs(probs, labels, offsets, bins=50, method="lttb", emotions=["joy"])
+    assert len(lttb["x"]) == 1 and len(lttb["x"][0]) == 50
+    with pytest.raises(ValueError):
+        emotion_arcs(probs, labels, emotions=["awe"])
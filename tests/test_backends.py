@@ -0,0 +1,45 @@
+import os
+
+import pytest
+import torch
+
+from emotionplot.backends import export_model_onnx
+from emotionplot.standin import build_model, build_tokenizer
+
+
+@pytest.fixture
+def model(tmp_path):
+    tokenizer = build_tokenizer(["an example sentence to trace the graph."], str(tmp_path / "vocab"))
+    return build_model(len(tokenizer)), tokenizer
+
+
+def test_export_replaces_the_file_once_complete(model, tmp_path, monkeypatch):
+    path = str(tmp_path / "onnx" / "model.onnx")
+    written = []
+
+    def export(model, args, f, **kwargs):
+        assert f != path and not os.path.exists(path)
+        written.append(f)
+        with open(f, "wb") as out:
+            out.write(b"graph")
+
+    monkeypatch.setattr(torch.onnx, "export", export)
+    export_model_onnx(*model, path)
+    with open(path, "rb") as f:
+        assert f.read() == b"graph"
+    assert os.listdir(os.path.dirname(path)) == ["model.onnx"]
+    assert os.path.dirname(written[0]) == os.path.dirname(path)
+
+
+def test_failed_export_leaves_no_file(model, tmp_path, monkeypatch):
+    path = str(tmp_path / "onnx" / "model.onnx")
+
+    def export(model, args, f, **kwargs):
+        with open(f, "wb") as out:
+            out.write(b"gra")
+        raise RuntimeError("export crashed")
+
+    monkeypatch.setattr(torch.onnx, "export", export)
+    with pytest.raises(RuntimeError, match="export crashed"):
+        export_model_onnx(*model, path)
+    assert os.listdir(os.path.dirname(path)) == []
@@ -0,0 +1,86 @@
+import os
+import threading
+
+from emotionplot.cache import MemoryCache, DiskCache, FilesystemStore, TieredCache
+
+
+def disk_usage(directory):
+    return sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+
+def test_memory_cache_counts_entries_and_evicts_least_recently_used():
+    cache = MemoryCache(max_bytes=2_000)
+    for i in range(20):
+        cache.put(f"key-{i}", bytes(100))
+        cache.put(f"key-{i}", bytes(150))  # overwrites are not counted twice
+        if i >= 1:
+            cache.get("key-0")  # kept as most recently used
+        assert cache.size == sum(MemoryCache._entry_size(key, data) for key, data in cache._items.items())
+        assert cache.size <= cache.max_bytes
+    assert cache.get("key-0") is not None
+    assert cache.get("key-1") is None
+
+    cache.put("too-big", bytes(5_000))
+    assert cache.get("too-big") is None
+
+
+def test_disk_cache_size_matches_the_files(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10_000)
+
+    def writer(seed):
+        for i in range(50):
+            cache.put(f"key-{(seed * 7 + i) % 30}", bytes(100 + (seed * 31 + i) % 400))
+
+    threads = [threading.Thread(target=writer, args=(seed,)) for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+    assert cache.size == disk_usage(tmp_path) <= cache.max_bytes
+    # A new instance counts what is on disk
+    assert DiskCache(str(tmp_path), max_bytes=10_000).size == cache.size
+
+
+def test_tiered_cache_promotes_hits_to_faster_tiers(tmp_path):
+    memory, disk = MemoryCache(10_000), DiskCache(str(tmp_path / "disk"), 10_000)
+    remote = FilesystemStore(str(tmp_path / "remote"))
+    remote.put("emotion_results/book.json", b'{"status": "success"}')
+    cache = TieredCache([memory, disk, remote], name="test")
+
+    assert cache.get_json("emotion_results/book.json") == {"status": "success"}
+    assert memory.get("emotion_results/book.json") == disk.get("emotion_results/book.json") == b'{"status": "success"}'
+    assert cache.get("emotion_results/book.json") == b'{"status": "success"}'
+    assert cache.get("emotion_results/missing.json") is None
+
+    stats = cache.stats()
+    assert (stats["memory"]["hits"], stats["memory"]["misses"]) == (1, 2)
+    assert (stats["disk"]["hits"], stats["disk"]["misses"]) == (0, 2)
+    assert (stats["remote"]["hits"], stats["remote"]["misses"]) == (1, 1)
+
+    cache.put_json("emotion_results/other.json", [1, 2])
+    assert all(tier.get("emotion_results/other.json") == b"[1, 2]" for tier in (memory, disk, remote))
+
+
+def test_filesystem_store_never_returns_partial_values(tmp_path):
+    store = FilesystemStore(str(tmp_path))
+    values = [bytes([1]) * 2_000_000, bytes([2]) * 1_000_000]
+    store.put("results/key.json", values[0])
+    stop = threading.Event()
+
+    def writer():
+        i = 0
+        while not stop.is_set():
+            store.put("results/key.json", values[i % 2])
+            i += 1
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(200):
+            assert store.get("results/key.json") in values
+    finally:
+        stop.set()
+        thread.join()
+    assert os.listdir(tmp_path / "results") == ["key.json"]
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from emotionplot import model as model_module
+from emotionplot.cache import MemoryCache, TieredCache
+from emotionplot.chunk_cache import ChunkProbCache
+from emotionplot.model import registry, predict_emotions
+from emotionplot.pipeline import result_blob_name
+
+from tests.conftest import make_book
+
+URL = "https://www.gutenberg.org/ebooks/1661"
+
+
+@pytest.fixture
+def chunk_cache():
+    return ChunkProbCache(TieredCache([MemoryCache(10_000_000)], name="chunk"))
+
+
+@pytest.fixture
+def registered():
+    """Registers the model type 'test-registered' and removes it afterwards."""
+    yield lambda name: registry.register("test-registered", None, None, None, name=name)
+    for mapping in (registry.model_names, registry._tokenizers, registry._configs, registry._factories):
+        mapping.pop("test-registered", None)
+
+
+def test_keys_separate_registered_models_backends_and_texts(registered):
+    registered("org/model-a")
+    key = ChunkProbCache.key("test-registered", "torch", "A chunk.")
+    assert ChunkProbCache.key("test-registered", "torch", "A chunk.") == key
+    assert ChunkProbCache.key("test-registered", "onnx", "A chunk.") != key
+    assert ChunkProbCache.key("test-registered", "torch", "A chunk. ") != key
+
+    # Another model served under the same type (e.g. a stand-in) has its own entries
+    registered("org/model-b")
+    assert ChunkProbCache.key("test-registered", "torch", "A chunk.") != key
+
+
+def test_lookup_returns_stored_rows_at_float16_precision(chunk_cache, registered):
+    registered("org/model-a")
+    probs = np.random.default_rng(0).random((3, 5)).astype(np.float32)
+    chunk_cache.store_many(["one", "two", "three"], "test-registered", "torch", probs)
+
+    cached, missing = chunk_cache.lookup(["two", "four", "one"], "test-registered", "torch")
+    assert missing == [1]
+    np.testing.assert_array_equal(cached[[0, 2]], probs[[1, 0]].astype(np.float16).astype(np.float32))
+    assert chunk_cache.lookup(["one"], "test-registered", "int8") == (None, [0])
+    assert (chunk_cache.stats()["hits"], chunk_cache.stats()["misses"]) == (2, 2)
+
+
+def test_cascade_thresholds_share_model_entries_but_not_results(standin_models, chunk_cache, monkeypatch):
+    sentences = [s + "." for s in make_book(num_sentences=30, seed=3).split(".") if s.strip()]
+    df = pd.DataFrame({"chunk": sentences})
+    # Nothing is escalated, then all of the random stand-ins' uncertain rows
+    settings = [(0.0, 0.0), (0.9, 0.5)]
+
+    results = {}
+    for confidence, margin in settings:
+        kwargs = {"model_type": "cascade", "backend": "torch", "return_probs": True,
+                  "cascade_min_confidence": confidence, "cascade_min_margin": margin}
+        uncached, uncached_probs = predict_emotions(df.copy(), **kwargs)
+        cached, cached_probs = predict_emotions(df.copy(), chunk_cache=chunk_cache, **kwargs)
+        np.testing.assert_allclose(cached_probs, uncached_probs, atol=1e-3)
+        assert cached.attrs["escalated_fraction"] == uncached.attrs["escalated_fraction"]
+        results[confidence, margin] = cached.attrs["escalated_fraction"]
+    assert results[settings[0]] < results[settings[1]]
+
+    # Entries are per model (not per cascade setting): the second setting reused the screening rows
+    _, missing = chunk_cache.lookup(df["chunk"].tolist(), "fast", "torch")
+    assert not missing
+
+    # Whole results depend on the thresholds, so their cache keys do too
+    keys = set()
+    for confidence, margin in settings:
+        monkeypatch.setattr(model_module, "CASCADE_MIN_CONFIDENCE", confidence)
+        monkeypatch.setattr(model_module, "CASCADE_MIN_MARGIN", margin)
+        keys.add(result_blob_name(URL, 3, "cascade", "torch"))
+    assert len(keys) == 2
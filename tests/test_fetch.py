@@ -0,0 +1,121 @@
+import gzip
+
+import pytest
+import requests
+
+from emotionplot import fetch
+from emotionplot.fetch import RawTextStore, fetch_novel, normalize_book_id
+
+URL = "https://www.gutenberg.org/ebooks/1661"
+TEXT_URL = "https://www.gutenberg.org/cache/epub/1661/pg1661.txt"
+
+
+def response(status_code, text="", headers=None):
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp._content = text.encode()
+    resp.headers.update({"Content-Type": "text/plain; charset=utf-8", **(headers or {})})
+    resp.encoding = "utf-8"
+    resp.url = TEXT_URL
+    return resp
+
+
+class FakeSession:
+    """Serves queued responses (or raises queued exceptions) and records the request headers."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.requests.append((url, dict(headers or {})))
+        result = self.responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def session(monkeypatch):
+    def install(*responses):
+        fake = FakeSession(*responses)
+        monkeypatch.setattr(fetch, "get_session", lambda: fake)
+        return fake
+    return install
+
+
+@pytest.fixture
+def store(tmp_path):
+    return RawTextStore(str(tmp_path / "raw"), max_bytes=0)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("1661", "1661"),
+    ("https://www.gutenberg.org/ebooks/1661", "1661"),
+    ("https://www.gutenberg.org/cache/epub/1661/pg1661.txt", "1661"),
+    ("https://www.gutenberg.org/files/1661/1661-0.txt", "1661"),
+    ("https://example.com/book.txt", None),
+])
+def test_normalize_book_id(value, expected):
+    assert normalize_book_id(value) == expected
+
+
+def test_stored_text_is_revalidated(session, store):
+    fake = session(response(200, "Version 1", {"ETag": '"v1"', "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"}),
+                   response(304),
+                   response(200, "Version 2", {"ETag": '"v2"'}))
+
+    assert fetch_novel(URL, store=store, mirror_dir=None, offline=False) == "Version 1"
+    assert fake.requests[0] == (TEXT_URL, {})
+
+    # Unchanged: a 304 answers with the stored copy
+    assert fetch_novel(URL, store=store, mirror_dir=None, offline=False) == "Version 1"
+    assert fake.requests[1][1] == {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+    # Changed: the new text and validators replace the stored ones
+    assert fetch_novel(URL, store=store, mirror_dir=None, offline=False) == "Version 2"
+    text, meta = store.get("1661", TEXT_URL)
+    assert (text, meta["etag"], meta["url"]) == ("Version 2", '"v2"', TEXT_URL)
+
+
+def test_network_errors_fall_back_to_the_stored_copy(session, store):
+    session(response(200, "Stored text", {"ETag": '"v1"'}),
+            requests.ConnectionError("no route to host"),
+            response(503))
+    fetch_novel(URL, store=store, mirror_dir=None, offline=False)
+    assert fetch_novel(URL, store=store, mirror_dir=None, offline=False) == "Stored text"
+    assert fetch_novel(URL, store=store, mirror_dir=None, offline=False) == "Stored text"
+
+
+def test_network_errors_without_a_stored_copy_raise(session, store):
+    session(requests.ConnectionError("no route to host"))
+    with pytest.raises(requests.ConnectionError):
+        fetch_novel(URL, store=store, mirror_dir=None, offline=False)
+
+
+def test_offline_uses_local_copies_only(session, store, tmp_path):
+    fake = session()
+    with pytest.raises(LookupError):
+        fetch_novel(URL, store=store, mirror_dir=None, offline=True)
+
+    store.put("1661", TEXT_URL, "Stored text", {})
+    assert fetch_novel(URL, store=store, mirror_dir=None, offline=True) == "Stored text"
+
+    mirror = tmp_path / "mirror"
+    (mirror / "1661").mkdir(parents=True)
+    with gzip.open(mirror / "1661" / "pg1661.txt.gz", "wt", encoding="utf-8") as f:
+        f.write("Mirrored text")
+    assert fetch_novel(URL, store=store, mirror_dir=str(mirror), offline=True) == "Mirrored text"
+    assert fake.requests == []
+
+
+def test_store_keeps_sources_apart_and_ignores_corrupt_entries(store):
+    store.put("1661", TEXT_URL, "Plain text", {"etag": '"a"'})
+    store.put("1661", URL, "HTML text", {"etag": '"b"'})
+    assert store.get("1661", TEXT_URL)[0] == "Plain text"
+    assert store.get("1661", URL)[0] == "HTML text"
+
+    _, meta_path = store._paths("1661", TEXT_URL)
+    with open(meta_path, "w") as f:
+        f.write("{truncated")
+    assert store.get("1661", TEXT_URL) is None
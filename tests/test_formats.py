@@ -0,0 +1,72 @@
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from emotionplot.formats import negotiate_format, encode_compact, encode_msgpack, decode_msgpack
+
+URL = "https://www.gutenberg.org/ebooks/1661"
+
+
+@pytest.mark.parametrize("accept, requested, expected", [
+    (None, None, "json"),
+    ("", None, "json"),
+    ("application/msgpack", "compact", "compact"),
+    ("application/msgpack", None, "msgpack"),
+    ("application/x-msgpack", None, "msgpack"),
+    ("Application/VND.emotionplot.compact+json", None, "compact"),
+    ("*/*", None, "json"),
+    ("text/html, application/*;q=0.1", None, "json"),
+    ("application/json;q=0.5, application/msgpack;q=0.9", None, "msgpack"),
+    ("application/msgpack;q=0.5, application/vnd.emotionplot.compact+json;q=0.5", None, "msgpack"),
+    ("application/msgpack;q=0, application/json", None, "json"),
+    ("application/msgpack;q=oops, application/json;q=0.1", None, "json"),
+])
+def test_negotiate_format(accept, requested, expected):
+    assert negotiate_format(accept, requested) == expected
+
+
+@pytest.mark.parametrize("accept", ["text/html", "application/msgpack;q=0", "image/*"])
+def test_negotiate_format_without_acceptable_type(accept):
+    assert negotiate_format(accept) is None
+
+
+def test_negotiate_format_rejects_unknown_format():
+    with pytest.raises(ValueError, match="Invalid format"):
+        negotiate_format("application/json", "xml")
+
+
+@pytest.fixture(scope="module")
+def client():
+    from api.api import app
+
+    return TestClient(app)
+
+
+def test_unknown_format_is_a_bad_request(client):
+    response = client.get("/analyze/", params={"url": URL, "format": "xml"})
+    assert response.status_code == 400
+    assert "Invalid format" in response.json()["detail"]
+
+
+def test_unacceptable_media_type_is_not_acceptable(client):
+    response = client.get("/analyze/", params={"url": URL}, headers={"Accept": "text/html"})
+    assert response.status_code == 406
+
+
+def test_compact_and_msgpack_encode_the_same_result():
+    rng = np.random.default_rng(0)
+    probs = rng.dirichlet(np.ones(5), size=7).astype(np.float32)
+    offsets = np.cumsum(rng.integers(1, 50, size=14)).reshape(7, 2)
+    header = {"status": "success", "num_chunks": 7}
+    labels = ["anger", "fear", "joy", "neutral", "sadness"]
+
+    compact = json.loads(encode_compact(header, probs, labels, offsets))
+    decoded = decode_msgpack(encode_msgpack(header, probs, labels, offsets))
+
+    assert compact["labels"] == decoded["labels"] == labels
+    assert decoded["offsets"].tolist() == compact["offsets"] == offsets.tolist()
+    assert decoded["top_ids"].tolist() == compact["top_ids"] == np.argsort(-probs, axis=1)[:, :3].tolist()
+    np.testing.assert_allclose(decoded["top_scores"], np.sort(probs, axis=1)[:, ::-1][:, :3], atol=1e-3)
+    np.testing.assert_allclose(compact["top_scores"], decoded["top_scores"], atol=1e-4)
@@ -0,0 +1,78 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from emotionplot.jobs import JobManager
+
+
+@pytest.fixture
+def manager():
+    manager = JobManager(max_workers=2, max_finished=2)
+    yield manager
+    manager.executor.shutdown()
+
+
+def wait_finished(job, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.status not in ("done", "failed"):
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+
+
+class BlockingPipeline:
+    """A pipeline function that reports progress and waits for `release` before returning."""
+
+    def __init__(self):
+        self.calls = 0
+        self.release = threading.Event()
+
+    def __call__(self, progress, url, model):
+        self.calls += 1
+        progress("inference", 1, 2)
+        assert self.release.wait(5)
+        return {"url": url, "model": model}
+
+
+def test_identical_jobs_in_flight_share_one_run(manager):
+    pipeline = BlockingPipeline()
+    key = ("book", "accurate")
+    with ThreadPoolExecutor(8) as executor:
+        jobs = list(executor.map(lambda _: manager.submit(key, pipeline, url="book", model="accurate"), range(16)))
+    assert len({job.id for job in jobs}) == 1
+
+    other = manager.submit(("book", "fast"), pipeline, url="book", model="fast")
+    assert other.id != jobs[0].id
+
+    pipeline.release.set()
+    wait_finished(jobs[0])
+    wait_finished(other)
+    assert pipeline.calls == 2
+    assert jobs[0].result == {"url": "book", "model": "accurate"}
+    assert jobs[0].progress == {"inference": {"done": 1, "total": 2}}
+
+    # Once finished, the same key starts a new run
+    again = manager.submit(key, pipeline, url="book", model="accurate")
+    assert again.id != jobs[0].id
+    wait_finished(again)
+    assert pipeline.calls == 3
+
+
+def test_failed_jobs_report_the_error_and_free_their_key(manager):
+    def failing(progress, url):
+        raise ValueError("No sentences found.")
+
+    job = manager.submit("book", failing, url="book")
+    wait_finished(job)
+    assert (job.status, job.error, job.result) == ("failed", "No sentences found.", None)
+    assert manager.submit("book", failing, url="book").id != job.id
+
+
+def test_finished_jobs_expire_oldest_first(manager):
+    jobs = []
+    for i in range(4):
+        jobs.append(manager.submit(i, lambda progress, i: i, i=i))
+        wait_finished(jobs[-1])
+    assert [manager.get(job.id) for job in jobs] == [None, None, jobs[2], jobs[3]]
+    assert manager.get("unknown") is None
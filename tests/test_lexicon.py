@@ -0,0 +1,72 @@
+import nltk
+import pytest
+
+from emotionplot.lexicon import LexiconIndex, analyze_sentences, load_nrc_lexicon, nrclex_lemmatizes, regex_words
+
+nrclex = pytest.importorskip("nrclex")
+
+SENTENCES = [
+    "The old captain cried out in fear and anger as the storm broke over the ship.",
+    "What a wonderful, joyful morning!",
+    "Nothing here.",
+    "",
+    "He hated the war, the death and the terrible waste; she loved the music and trusted her friends.",
+    "Abandon hope, all ye who enter here: the abyss awaits the wicked and the innocent alike.",
+    "Happy happy happy birthday to my dear beloved mother.",
+]
+
+
+def _data_installed(*resources):
+    for resource in resources:
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            return False
+    return True
+
+
+@pytest.fixture(scope="module")
+def index():
+    return LexiconIndex(load_nrc_lexicon())
+
+
+def test_lexicon_is_the_one_nrclex_uses(index):
+    emotion = nrclex.NRCLex()
+    assert emotion.__lexicon__ == load_nrc_lexicon()
+
+
+@pytest.mark.skipif(not hasattr(nrclex.NRCLex, "load_token_list"), reason="needs nrclex >= 4")
+def test_counts_match_nrclex_on_the_same_tokens(index):
+    result = index.analyze(SENTENCES, tokenizer="regex", lemmatized=False)
+    for sentence, words, affect_list, counts in zip(SENTENCES, regex_words(SENTENCES), result["affect_lists"],
+                                                    result["counts"]):
+        emotion = nrclex.NRCLex()
+        emotion.load_token_list(words)
+        assert affect_list == emotion.affect_list, sentence
+        assert {e: int(c) for e, c in zip(result["emotions"], counts) if c} == emotion.raw_emotion_scores, sentence
+    assert any(result["affect_lists"])
+
+
+@pytest.mark.skipif(not _data_installed("tokenizers/punkt", "tokenizers/punkt_tab", "corpora/wordnet"),
+                    reason="needs the NLTK punkt and wordnet data")
+def test_default_matches_the_installed_nrclex():
+    result = analyze_sentences(SENTENCES)
+    for sentence, affect_list in zip(SENTENCES, result["affect_lists"]):
+        if nrclex_lemmatizes():
+            emotion = nrclex.NRCLex()
+            emotion.load_raw_text(sentence)
+        else:
+            emotion = nrclex.NRCLex(sentence)
+        assert affect_list == emotion.affect_list, sentence
+
+
+def test_default_lookup_follows_the_installed_nrclex():
+    assert nrclex_lemmatizes() == hasattr(nrclex.NRCLex, "load_raw_text")
+
+
+def test_workers_match_in_process():
+    sentences = SENTENCES * 5
+    expected = analyze_sentences(sentences, tokenizer="regex", lemmatized=False)
+    result = analyze_sentences(sentences, tokenizer="regex", lemmatized=False, workers=2, batch_size=8)
+    assert result["affect_lists"] == expected["affect_lists"]
+    assert (result["counts"] == expected["counts"]).all()
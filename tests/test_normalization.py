@@ -0,0 +1,84 @@
+import random
+import re
+
+import pytest
+
+from emotionplot.normalization import normalize_text, normalize_whitespace, iter_normalized_blocks
+from emotionplot.preprocessing import preprocessing
+
+
+def reference_preprocessing(content):
+    """The original multi-pass emotionplot.preprocessing.preprocessing."""
+    content = content.lower()
+    content = ''.join([char for char in content if not char.isdigit()])
+    punctuation = ['!','"','#','$','%','&','(',')',
+                   '*','+','-','/',':',';','<',
+                   '=','>','@',"\\",'"]"','^','_']
+    for punct in punctuation:
+        content = content.replace(punct, ' ')
+    return ' '.join(content.split())
+
+
+def reference_whitespace(content):
+    """The original whitespace passes of emotionplot.data.clean_gutenberg_text."""
+    content = re.sub(r'\r\n', '\n', content)
+    content = re.sub(r'\n{2,}', '\n\n', content)
+    content = re.sub(r'[ \t]+', ' ', content)
+    return content.strip()
+
+
+FIXED_CASES = [
+    "",
+    "   ",
+    "It was the best of times, it was the worst of times.",
+    "CHAPTER 1.\r\n\r\n\r\nCall me Ishmael.  Some years ago--never mind how long precisely--",
+    '"Well," said he, "I\'ll be back at 10:30 #sharp!" (he wasn\'t) [sic]',
+    "Σίσυφος ΟΔΥΣΣΕΥΣ σσς",
+    "İstanbul İİ i̇",
+    "Numbers: ² ٣ ½ ① 42nd 3.14",
+    "tabs\tand\x0bvertical\x0ctabs\xa0nbsp em space",
+    "émigré — “quoted” ’tis… ¿qué?",
+    "a\\b/c_d^e@f=g<h>i;j:k+l*m)n(o&p%q$r#s\"t!u]",
+    "lone surrogate \ud800 kept",
+]
+
+# Characters that exercise lowercasing, digits, punctuation and whitespace edge cases
+ALPHABET = list('aAbZΣσς \t\n\r\x0b\xa0  1²٣!"]#-_^\\é.,?İ’—') + ['\r\n']
+
+
+def random_cases(count=2000, seed=0):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 60))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("text", FIXED_CASES)
+def test_normalize_text_matches_original(text):
+    assert normalize_text(text) == reference_preprocessing(text)
+    assert preprocessing(text) == reference_preprocessing(text)
+
+
+def test_normalize_text_matches_original_on_random_strings():
+    for text in random_cases():
+        assert normalize_text(text) == reference_preprocessing(text), repr(text)
+
+
+@pytest.mark.parametrize("block_size", [1, 2, 3, 7, 64, 4096])
+def test_streaming_normalization_matches_whole_text(block_size):
+    for text in FIXED_CASES + random_cases(500, seed=block_size):
+        blocks = (text[i:i + block_size] for i in range(0, len(text), block_size))
+        assert " ".join(iter_normalized_blocks(blocks)) == reference_preprocessing(text), repr(text)
+
+
+def test_streaming_normalization_of_no_blocks():
+    assert list(iter_normalized_blocks([])) == []
+    assert list(iter_normalized_blocks(["", "  ", ""])) == []
+
+
+@pytest.mark.parametrize("text", FIXED_CASES + ["\n\n\n\r\n\r\nx", "a\r\n\r\nb", "\r\r\n\n", " \t x \t\n"])
+def test_normalize_whitespace_matches_original(text):
+    assert normalize_whitespace(text) == reference_whitespace(text)
+
+
+def test_normalize_whitespace_matches_original_on_random_strings():
+    for text in random_cases(seed=1):
+        assert normalize_whitespace(text) == reference_whitespace(text), repr(text)
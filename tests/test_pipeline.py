@@ -0,0 +1,40 @@
+import pytest
+
+from emotionplot import pipeline
+from emotionplot.cache import MemoryCache, TieredCache
+
+from tests.conftest import make_book
+
+URL = "https://www.gutenberg.org/ebooks/1661"
+
+
+@pytest.fixture
+def offline_pipeline(standin_models, monkeypatch):
+    """Runs the pipeline on a fixed book, with a fresh in-memory result cache and no other local state."""
+    cache = TieredCache([MemoryCache()])
+    monkeypatch.setattr(pipeline, "get_novel", lambda url: make_book(num_sentences=40, seed=7))
+    monkeypatch.setattr(pipeline, "get_book_store", lambda: None)
+    monkeypatch.setattr(pipeline, "get_chunk_cache", lambda: None)
+    monkeypatch.setattr(pipeline, "get_inference_scheduler", lambda: None)
+    monkeypatch.setattr(pipeline, "get_inference_pool", lambda: None)
+    monkeypatch.setattr(pipeline, "ARTIFACTS_DIR", "")
+    return cache
+
+
+@pytest.mark.parametrize("model", ["fast", "cascade"])
+def test_streamed_result_is_cached_as_the_blocking_result(offline_pipeline, monkeypatch, model):
+    monkeypatch.setattr(pipeline, "get_result_cache", lambda: offline_pipeline)
+    messages = list(pipeline.iter_emotion_pipeline(URL, 3, model, "torch", window=4))
+    assert messages[0]["type"] == "header" and messages[-1]["type"] == "done"
+    assert [row for message in messages[1:-1] for row in message["rows"]]
+
+    cached = pipeline.run_emotion_pipeline(URL, 3, model, "torch")
+    fresh = pipeline.run_emotion_pipeline(URL, 3, model, "torch", use_cache=False)
+    assert cached == fresh
+    if model == "cascade":
+        assert "escalated_fraction" in fresh
+        assert messages[-1]["escalated_fraction"] == fresh["escalated_fraction"]
+
+        # A replay of the cached result ends with the same done message
+        replayed = list(pipeline.iter_emotion_pipeline(URL, 3, model, "torch", window=4))
+        assert replayed[-1] == messages[-1]
@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+import torch
+
+from emotionplot import scheduler
+from emotionplot.scheduler import InferenceScheduler
+
+
+class FakeModel:
+    """Stands in for predict_batch: each row scores as (its first token, its length); batches are recorded."""
+
+    def __init__(self):
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.started = threading.Event()
+
+    def __call__(self, input_ids, model_type, backend=None):
+        self.started.set()
+        self.gate.wait()
+        self.batches.append([len(ids) for ids in input_ids])
+        return torch.tensor([[float(ids[0]), float(len(ids))] for ids in input_ids])
+
+    def hold(self, inference):
+        """Keeps the batcher busy with a one-row request until `gate` is set, so that requests pile up."""
+        self.gate.clear()
+        future = inference.submit([[0]], "test")
+        assert self.started.wait(5)
+        return future
+
+
+@pytest.fixture
+def model(monkeypatch):
+    fake = FakeModel()
+    monkeypatch.setattr(scheduler, "predict_batch", fake)
+    return fake
+
+
+@pytest.fixture
+def inference():
+    inference = InferenceScheduler(max_batch_size=4, max_wait_ms=1, max_tokens=10_000, max_pending=1_000)
+    yield inference
+    inference.shutdown()
+
+
+def make_rows(first_token, lengths):
+    return [[first_token + i] * length for i, length in enumerate(lengths)]
+
+
+def test_concurrent_requests_get_their_rows_in_input_order(model, inference):
+    requests = [make_rows(1000 * (r + 1), [(7 * i + 3 * r) % 40 + 1 for i in range(23)]) for r in range(5)]
+    results = [None] * len(requests)
+
+    def run(r):
+        results[r] = inference.submit(requests[r], "test").result(timeout=10)
+
+    threads = [threading.Thread(target=run, args=(r,)) for r in range(len(requests))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for input_ids, probs in zip(requests, results):
+        assert probs[:, 0].tolist() == [float(ids[0]) for ids in input_ids]
+        assert probs[:, 1].tolist() == [float(len(ids)) for ids in input_ids]
+
+
+def test_batches_group_rows_of_similar_length(model, inference):
+    blocker = model.hold(inference)
+    futures = [inference.submit(make_rows(100 * (r + 1), [5, 300] * 4), "test") for r in range(2)]
+    model.gate.set()
+
+    blocker.result(timeout=5)
+    for future in futures:
+        future.result(timeout=5)
+    assert all(len(set(batch)) == 1 for batch in model.batches[1:])
+    assert sorted(length for batch in model.batches[1:] for length in batch) == [5] * 8 + [300] * 8
+
+
+def test_batches_respect_max_tokens(model):
+    inference = InferenceScheduler(max_batch_size=8, max_wait_ms=1, max_tokens=100, max_pending=1_000)
+    try:
+        inference.submit(make_rows(1, [10, 30, 20, 40, 10, 30, 120]), "test").result(timeout=5)
+    finally:
+        inference.shutdown()
+    for batch in model.batches:
+        assert len(batch) == 1 or max(batch) * len(batch) <= 100
+
+
+def test_shutdown_fails_queued_requests(model, inference):
+    blocker = model.hold(inference)
+    queued = inference.submit(make_rows(1, [5] * 10), "test")
+    threading.Timer(0.1, model.gate.set).start()
+    inference.shutdown()
+
+    assert blocker.result(timeout=5).tolist() == [[0.0, 1.0]]
+    with pytest.raises(RuntimeError, match="shut down"):
+        queued.result(timeout=5)
+    with pytest.raises(RuntimeError, match="shut down"):
+        inference.submit([[1]], "test")
@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from emotionplot.preprocessing import sentence_offsets
+from emotionplot.segmentation import RegexSegmenter, ParallelSegmenter, boundary_agreement, get_segmenter
+
+
+def check_spans(text, spans):
+    """Spans are ordered, non-overlapping, stripped and cover every non-space character."""
+    position = 0
+    for start, end in spans:
+        assert position <= start < end <= len(text)
+        assert text[position:start].strip() == ""
+        assert text[start:end] == text[start:end].strip()
+        position = end
+    assert text[position:].strip() == ""
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("", []),
+    ("   ", []),
+    ("no terminator at all", ["no terminator at all"]),
+    ("  one. two!  three?\n", ["one.", "two!", "three?"]),
+    ("mr. smith met dr. jones at st. paul's. they talked.", ["mr. smith met dr. jones at st. paul's.", "they talked."]),
+    ("j. r. r. tolkien wrote it. i. am. here.", ["j. r. r. tolkien wrote it.", "i.", "am.", "here."]),
+    ('he said "stop!" then left. (really.) yes', ['he said "stop!"', "then left.", "(really.)", "yes"]),
+    ("wait... what?! ok.", ["wait...", "what?!", "ok."]),
+    ("e.g. this, i.e. that. done", ["e.g. this, i.e. that.", "done"]),
+    ("3.14 is pi. end", ["3.14 is pi.", "end"]),
+])
+def test_regex_segmenter(text, expected):
+    segmenter = RegexSegmenter()
+    spans = segmenter.span_tokenize(text)
+    check_spans(text, spans)
+    assert segmenter.split(text) == expected
+
+
+def long_text(paragraphs):
+    sentences = [f"sentence {i} of the text, with mr. smith and some words." for i in range(3000)]
+    separator = "\n\n" if paragraphs else " "
+    return separator.join(" ".join(sentences[i:i + 7]) for i in range(0, len(sentences), 7))
+
+
+@pytest.mark.parametrize("paragraphs", [True, False])
+def test_parallel_segmenter_matches_base(paragraphs):
+    text = long_text(paragraphs)
+    segmenter = ParallelSegmenter("regex", workers=2, min_piece_chars=10_000)
+    assert len(segmenter._cut_points(text)) > 3
+    try:
+        spans = segmenter.span_tokenize(text)
+        # Segmentation runs in request threads: workers must not be forked from them
+        assert segmenter._executor._mp_context.get_start_method() != "fork"
+    finally:
+        if segmenter._executor is not None:
+            segmenter._executor.shutdown()
+    check_spans(text, spans)
+    assert spans == RegexSegmenter().span_tokenize(text)
+
+
+def test_get_segmenter_is_shared_across_threads():
+    with ThreadPoolExecutor(8) as executor:
+        segmenters = list(executor.map(lambda _: get_segmenter("regex", workers=3), range(32)))
+    assert len({id(segmenter) for segmenter in segmenters}) == 1
+
+
+def test_sentence_offsets_map_back_to_text():
+    # Repeated sentences map to successive occurrences
+    text = "  ab cd. ab cd. ef gh!  ab cd."
+    sentences = RegexSegmenter().split(text)
+    offsets = sentence_offsets(text, sentences)
+    assert offsets == [(2, 8), (9, 15), (16, 22), (24, 30)]
+    assert [text[start:end] for start, end in offsets] == sentences
+
+
+def test_sentence_offsets_match_segmenter_spans():
+    text = long_text(paragraphs=True)[:20_000]
+    segmenter = RegexSegmenter()
+    assert sentence_offsets(text, segmenter.split(text)) == segmenter.span_tokenize(text)
+
+
+def test_boundary_agreement():
+    reference = [(0, 4), (5, 9), (10, 14)]
+    assert boundary_agreement(reference, reference) == {"precision": 1.0, "recall": 1.0, "f1": 1.0}
+    scores = boundary_agreement(reference, [(0, 9), (10, 14)])
+    assert scores["precision"] == 1.0
+    assert scores["recall"] == pytest.approx(2 / 3)
+    assert boundary_agreement([], []) == {"precision": 1.0, "recall": 1.0, "f1": 1.0}
@@ -0,0 +1,123 @@
+import os
+import random
+
+import pytest
+from tokenizers import ByteLevelBPETokenizer
+from transformers import RobertaTokenizerFast
+
+from emotionplot import tokenization
+from emotionplot.model import registry
+from emotionplot.preprocessing import chunk_by_sentences
+from emotionplot.segmentation import RegexSegmenter
+from emotionplot.standin import build_tokenizer
+
+WORDS = ("the whale sea ship captain ahab ishmael harpoon deck storm night morning fear joy "
+         "anger sadness wonderful terrible old young man men said cried looked went came").split()
+
+
+def make_text(num_sentences=400, seed=0, long_every=0):
+    rng = random.Random(seed)
+    sentences = []
+    for i in range(num_sentences):
+        length = 300 if long_every and i % long_every == long_every - 1 else rng.randint(3, 25)
+        words = [rng.choice(WORDS) for _ in range(length)]
+        if rng.random() < 0.3:
+            words.insert(rng.randrange(len(words)), ",")
+        sentences.append(" ".join(words).replace(" ,", ",") + rng.choice([".", "!", "?"]))
+    return " ".join(sentences)
+
+
+@pytest.fixture(scope="module")
+def model_types(tmp_path_factory):
+    """Registers a WordPiece tokenizer (like the fast model) and a byte-level BPE one (like the accurate model)."""
+    directory = str(tmp_path_factory.mktemp("tokenizers"))
+    corpus = [make_text(seed=seed) for seed in range(3)]
+    wordpiece = build_tokenizer(corpus, os.path.join(directory, "wordpiece"))
+    bpe = ByteLevelBPETokenizer()
+    bpe.train_from_iterator(corpus, vocab_size=400, special_tokens=["<s>", "<pad>", "</s>", "<unk>", "<mask>"])
+    bpe.save_model(directory)
+    roberta = RobertaTokenizerFast(os.path.join(directory, "vocab.json"), os.path.join(directory, "merges.txt"),
+                                   model_max_length=512)
+
+    types = {"test-wordpiece": wordpiece, "test-bpe": roberta}
+    for model_type, tokenizer in types.items():
+        registry.register(model_type, tokenizer, None, None)
+    yield types
+    for model_type in types:
+        for mapping in (registry.model_names, registry._tokenizers, registry._configs, registry._factories):
+            mapping.pop(model_type, None)
+        for leading_space in (True, False):
+            tokenization._sentence_ids.pop((model_type, leading_space), None)
+
+
+@pytest.fixture(params=["test-wordpiece", "test-bpe"])
+def model_type(request, model_types):
+    return request.param
+
+
+def test_build_chunk_inputs_match_chunk_tokenization(model_type):
+    text = make_text()
+    sentences = RegexSegmenter().split(text)
+    tokenizer = registry.get_tokenizer(model_type)
+    for sentences_per_chunk in (1, 3, 5):
+        chunks = chunk_by_sentences(text, sentences_per_chunk, sentences=sentences)["chunk"].tolist()
+        expected = tokenizer(chunks, truncation=True, max_length=512)["input_ids"]
+        assert tokenization.build_chunk_inputs(sentences, sentences_per_chunk, model_type) == expected
+
+
+@pytest.mark.parametrize("tokens_per_chunk, overlap_sentences", [(512, 0), (64, 0), (64, 2), (128, 1)])
+def test_chunk_by_tokens_offsets_and_budget(model_type, tokens_per_chunk, overlap_sentences):
+    text = make_text(seed=1)
+    sentences = RegexSegmenter().split(text)
+    spans = RegexSegmenter().span_tokenize(text)
+    tokenizer = registry.get_tokenizer(model_type)
+    df = tokenization.chunk_by_tokens(text, sentences, tokens_per_chunk, overlap_sentences, model_type)
+
+    sentence_starts = {start for start, _ in spans}
+    sentence_ends = {end for _, end in spans}
+    previous_start, previous_end = -1, 0
+    for chunk, start, end, input_ids in df[["chunk", "start", "end", "input_ids"]].itertuples(index=False):
+        assert text[start:end] == chunk
+        assert len(input_ids) <= tokens_per_chunk
+        assert start > previous_start
+        if overlap_sentences == 0:
+            # Consecutive chunks leave nothing but whitespace between them
+            assert start >= previous_end and text[previous_end:start].strip() == ""
+        else:
+            assert start <= previous_end or text[previous_end:start].strip() == ""
+        # Chunks start and end on sentence boundaries when no sentence is longer than the budget
+        assert start in sentence_starts and end in sentence_ends
+        # Without cut sentences, the inputs are those of the chunk text
+        assert input_ids == tokenizer(chunk)["input_ids"]
+        previous_start, previous_end = start, end
+    assert df["start"].iloc[0] == spans[0][0] and df["end"].iloc[-1] == spans[-1][1]
+
+
+def test_chunk_by_tokens_cuts_long_sentences(model_type):
+    text = make_text(num_sentences=60, seed=2, long_every=10)
+    sentences = RegexSegmenter().split(text)
+    tokens_per_chunk = 64
+    df = tokenization.chunk_by_tokens(text, sentences, tokens_per_chunk, 0, model_type)
+
+    assert df["input_ids"].map(len).max() <= tokens_per_chunk
+    assert all(text[start:end] == chunk for chunk, start, end in df[["chunk", "start", "end"]].itertuples(index=False))
+    # Every character of the text (but whitespace) is in exactly one chunk
+    covered = [0] * len(text)
+    for start, end in df[["start", "end"]].itertuples(index=False):
+        for i in range(start, end):
+            covered[i] += 1
+    assert all(count == 1 for char, count in zip(text, covered) if not char.isspace())
+
+
+def test_chunk_by_tokens_rejects_budget_without_room(model_type):
+    with pytest.raises(ValueError):
+        tokenization.chunk_by_tokens("a b.", ["a b."], 2, 0, model_type)
+
+
+def test_encode_sentences_cache_is_bounded(model_type, monkeypatch):
+    monkeypatch.setattr(tokenization, "MAX_CACHED_SENTENCES", 10)
+    sentences = [f"the whale {i}." for i in range(30)]
+    ids = tokenization.encode_sentences(sentences, model_type)
+    assert len(ids) == 30
+    assert len(tokenization._sentence_ids[(model_type, True)]) == 10
+    assert [list(a) for a in tokenization.encode_sentences(sentences[:3], model_type)] == [list(a) for a in ids[:3]]
@@ -0,0 +1,27 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from emotionplot import workers
+
+
+class SlowPool:
+    started = 0
+
+    def __init__(self, num_workers, threads_per_worker):
+        SlowPool.started += 1
+        time.sleep(0.05)
+
+
+def test_inference_pool_is_created_once_across_threads(monkeypatch):
+    monkeypatch.setattr(workers, "INFERENCE_WORKERS", 2)
+    monkeypatch.setattr(workers, "InferencePool", SlowPool)
+    monkeypatch.setattr(workers, "_pool", None)
+    with ThreadPoolExecutor(8) as executor:
+        pools = list(executor.map(lambda _: workers.get_inference_pool(), range(16)))
+    assert SlowPool.started == 1
+    assert len({id(pool) for pool in pools}) == 1
+
+
+def test_no_pool_without_workers(monkeypatch):
+    monkeypatch.setattr(workers, "INFERENCE_WORKERS", 0)
+    assert workers.get_inference_pool() is None